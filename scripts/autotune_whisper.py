@@ -0,0 +1,177 @@
+"""
+Autotune cấu hình decode Whisper cho máy hiện tại và ghi profile phần cứng (WHISPER_PROFILE_PATH).
+Chạy benchmark ngắn trên các tổ hợp compute_type, batch_size, beam_size và (trên CPU) cpu_threads/num_workers,
+chọn cấu hình có real-time factor (RTF) thấp nhất; Settings đọc lại mục "settings" của profile khi khởi động.
+
+Đổi phần cứng thì chạy lại:
+    python scripts/autotune_whisper.py
+    python scripts/autotune_whisper.py --audio storage/audio/sample.m4a --beam-sizes 1,3,5 --max-wer 0.03
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from scripts.bench_utils import SR, load_audio, synthetic_speech, word_error_rate
+from src.core.config import settings
+from src.core.hardware import physical_cores, resolve_device, usable_cores, worker_concurrency
+from src.speech_to_text.transcriber import resolve_model_dir
+
+DEFAULT_COMPUTE_TYPES = {"cuda": "float16,int8_float16", "cpu": "int8,int8_float32"}
+
+def decode(pipeline, audio, beam_size, batch_size, use_vad):
+    kwargs = dict(vad_filter=True, vad_parameters=dict(min_silence_duration_ms=500, speech_pad_ms=100))
+    if not use_vad:
+        # Tín hiệu giả lập: cắt cố định 30s để đo thông lượng decode, không phụ thuộc VAD
+        kwargs = dict(vad_filter=False, clip_timestamps=[
+            {"start": i, "end": min(i + 30 * SR, len(audio))} for i in range(0, len(audio), 30 * SR)
+        ])
+    segments, _ = pipeline.transcribe(audio, language="vi", beam_size=beam_size, batch_size=batch_size, **kwargs)
+    return " ".join(s.text.strip() for s in segments)
+
+def measure(model, audio, beam_size, batch_size, num_workers, use_vad, repeat):
+    """
+    RTF hiệu dụng khi num_workers lời gọi transcribe chạy song song trên cùng model:
+    thời gian / (num_workers * độ dài audio). Trả về (rtf, transcript).
+    """
+    pipeline = BatchedInferencePipeline(model=model)
+    duration = len(audio) / SR
+    best, text = None, ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            texts = list(executor.map(lambda _: decode(pipeline, audio, beam_size, batch_size, use_vad), range(num_workers)))
+        elapsed = time.perf_counter() - t0
+        rtf = elapsed / (num_workers * duration)
+        if best is None or rtf < best:
+            best, text = rtf, texts[0]
+    return best, text
+
+def thread_layouts(device: str, cores_per_slot: int, max_workers: int):
+    """Các cặp (cpu_threads, num_workers) không vượt quá số core của một slot Celery."""
+    if device != "cpu":
+        return [(0, w) for w in sorted({1, max(1, max_workers)})]
+    layouts = []
+    for workers in range(1, max(1, min(max_workers, cores_per_slot)) + 1):
+        layouts.append((max(1, cores_per_slot // workers), workers))
+    return layouts
+
+def gpu_name():
+    try:
+        import torch
+        return torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune cấu hình decode Whisper và ghi profile phần cứng")
+    parser.add_argument("--model", default=settings.WHISPER_MODEL)
+    parser.add_argument("--device", default="auto", help="cuda | cpu | auto")
+    parser.add_argument("--audio", default=None, help="File audio mẫu (mặc định: tín hiệu giả lập)")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Độ dài tín hiệu giả lập (giây)")
+    parser.add_argument("--compute-types", default=None, help="Mặc định theo device")
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--beam-sizes", default=str(settings.WHISPER_BEAM_SIZE),
+                        help="Chỉ nên tune beam khi có --audio (đo được WER)")
+    parser.add_argument("--max-workers", type=int, default=4, help="num_workers tối đa thử")
+    parser.add_argument("--concurrency", type=int, default=None, help="Số slot Celery trên máy (mặc định theo WORKER_CONCURRENCY)")
+    parser.add_argument("--max-wer", type=float, default=0.05, help="WER tối đa so với cấu hình tham chiếu (khi có --audio)")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--output", default=settings.WHISPER_PROFILE_PATH)
+    args = parser.parse_args()
+
+    device = resolve_device(args.device)
+    model_dir = resolve_model_dir(args.model)
+    audio = load_audio(args.audio) if args.audio else synthetic_speech(args.seconds)
+    use_vad = args.audio is not None
+    duration = len(audio) / SR
+    concurrency = args.concurrency or worker_concurrency()
+    cores = usable_cores()
+    cores_per_slot = max(1, cores // concurrency)
+    compute_types = [c for c in (args.compute_types or DEFAULT_COMPUTE_TYPES[device]).split(",") if c]
+    batch_sizes = [int(x) for x in args.batch_sizes.split(",") if x.strip()]
+    beam_sizes = sorted({int(x) for x in args.beam_sizes.split(",") if x.strip()}, reverse=True)
+    print(f"[AUTOTUNE] device={device} | model={model_dir} | audio={args.audio or 'synthetic'} ({duration:.0f}s) "
+          f"| cores={cores} | concurrency={concurrency}")
+
+    results = []
+    reference = None
+    for compute_type in compute_types:
+        for cpu_threads, num_workers in thread_layouts(device, cores_per_slot, args.max_workers):
+            try:
+                model = WhisperModel(model_dir, device=device, compute_type=compute_type,
+                                     cpu_threads=cpu_threads, num_workers=num_workers)
+            except Exception as e:
+                print(f"[AUTOTUNE] Bỏ qua compute_type={compute_type}: {e}")
+                break
+            # Warm-up một lần cho mỗi model trước khi đo
+            measure(model, audio[:min(len(audio), 5 * SR)], 1, 1, 1, use_vad, 1)
+            for beam_size in beam_sizes:
+                for batch_size in batch_sizes:
+                    rtf, text = measure(model, audio, beam_size, batch_size, num_workers, use_vad, args.repeat)
+                    if reference is None:
+                        # Cấu hình đầu tiên (beam lớn nhất, compute_type đầu tiên) làm tham chiếu chất lượng
+                        reference = text
+                    wer = word_error_rate(reference, text) if use_vad else None
+                    row = {"compute_type": compute_type, "batch_size": batch_size, "beam_size": beam_size,
+                           "cpu_threads": cpu_threads, "num_workers": num_workers, "rtf": round(rtf, 4),
+                           "wer_vs_reference": None if wer is None else round(wer, 4)}
+                    results.append(row)
+                    print(f"[AUTOTUNE] {row}")
+            del model
+
+    candidates = [r for r in results if r["wer_vs_reference"] is None or r["wer_vs_reference"] <= args.max_wer]
+    if not candidates:
+        print("[AUTOTUNE] Không có cấu hình hợp lệ, không ghi profile")
+        sys.exit(1)
+    best = min(candidates, key=lambda r: r["rtf"])
+    tuned = {
+        "WHISPER_DEVICE": device,
+        "WHISPER_BATCH_SIZE": best["batch_size"],
+        "WHISPER_BEAM_SIZE": best["beam_size"],
+        "WHISPER_NUM_WORKERS": best["num_workers"],
+    }
+    if device == "cpu":
+        tuned["WHISPER_CPU_COMPUTE_TYPE"] = best["compute_type"]
+        tuned["WHISPER_CPU_THREADS"] = best["cpu_threads"]
+    else:
+        tuned["WHISPER_COMPUTE_TYPE"] = best["compute_type"]
+    profile = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "hardware": {
+            "hostname": platform.node(),
+            "device": device,
+            "gpu": gpu_name() if device == "cuda" else None,
+            "physical_cores": physical_cores(),
+            "usable_cores": cores,
+            "concurrency": concurrency,
+        },
+        "model": args.model,
+        "audio": args.audio or "synthetic",
+        "audio_seconds": round(duration, 2),
+        "rtf": best["rtf"],
+        "best": best,
+        "results": results,
+        "settings": tuned,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(".tmp")
+    tmp.write_text(json.dumps(profile, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, output)
+    print(f"[AUTOTUNE] Best: {best} -> {output}")
+
+if __name__ == "__main__":
+    main()
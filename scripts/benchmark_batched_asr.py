@@ -0,0 +1,74 @@
+"""
+Benchmark real-time factor (RTF = thời gian xử lý / độ dài audio) giữa
+pipeline sequential (model.transcribe) và batched (BatchedInferencePipeline).
+
+Ví dụ:
+    python scripts/benchmark_batched_asr.py --audio "storage/audio/sample.m4a" --device cpu --compute-type int8
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from faster_whisper import BatchedInferencePipeline
+from src.speech_to_text.transcriber import load_whisper_model, resolve_model_dir
+
+SR = 16000
+
+def load_audio(path: str) -> np.ndarray:
+    import librosa
+    audio, _ = librosa.load(path, sr=SR, mono=True)
+    return audio.astype(np.float32)
+
+def run_sequential(model, audio, beam_size):
+    segments, _ = model.transcribe(audio, language="vi", beam_size=beam_size, vad_filter=True,
+                                   vad_parameters=dict(min_silence_duration_ms=500, speech_pad_ms=100))
+    return [s.text for s in segments]
+
+def run_batched(model, audio, beam_size, batch_size):
+    pipeline = BatchedInferencePipeline(model=model)
+    segments, _ = pipeline.transcribe(audio, language="vi", beam_size=beam_size, batch_size=batch_size, vad_filter=True,
+                                      vad_parameters=dict(min_silence_duration_ms=500, speech_pad_ms=100))
+    return [s.text for s in segments]
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh RTF sequential vs batched Whisper")
+    parser.add_argument("--audio", required=True, help="File audio để benchmark")
+    parser.add_argument("--model", default="large-v2")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--batch-sizes", default="4,8,16", help="Danh sách batch size, phân tách bằng dấu phẩy")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio)
+    duration = len(audio) / SR
+    model = load_whisper_model(resolve_model_dir(args.model), args.device, args.compute_type)
+    print(f"Audio: {args.audio} | duration={duration:.1f}s | device={args.device} | compute_type={args.compute_type}")
+
+    def timed(fn):
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            texts = fn()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return best, texts
+
+    elapsed, texts = timed(lambda: run_sequential(model, audio, args.beam_size))
+    base_rtf = elapsed / duration
+    print(f"{'sequential':<14} time={elapsed:8.2f}s  RTF={base_rtf:.3f}  segments={len(texts)}")
+    for bs in [int(x) for x in args.batch_sizes.split(",") if x.strip()]:
+        elapsed, texts = timed(lambda: run_batched(model, audio, args.beam_size, bs))
+        rtf = elapsed / duration
+        print(f"{'batched bs=' + str(bs):<14} time={elapsed:8.2f}s  RTF={rtf:.3f}  segments={len(texts)}  speedup={base_rtf / rtf:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+So sánh cascade (bản nháp nhanh + decode lại có chọn lọc) với decode toàn bộ bằng model lớn:
+thời gian, số giây phải escalate và WER của transcript cascade so với transcript model lớn.
+
+Ví dụ:
+    python scripts/benchmark_cascade.py storage/audio/a.mp3 storage/audio/b.m4a
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from scripts.bench_utils import word_error_rate
+from src.audio_processing.processor import AudioProcessor
+from src.speech_to_text.transcriber import Transcriber
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cascade ASR vs model lớn")
+    parser.add_argument("files", nargs="+", help="Các file audio")
+    parser.add_argument("--logprob-threshold", type=float, default=None)
+    parser.add_argument("--no-speech-threshold", type=float, default=None)
+    args = parser.parse_args()
+
+    transcriber = Transcriber()
+    if args.logprob_threshold is not None:
+        transcriber.cascade_logprob_threshold = args.logprob_threshold
+    if args.no_speech_threshold is not None:
+        transcriber.cascade_no_speech_threshold = args.no_speech_threshold
+    processor = AudioProcessor()
+    print(f"{'file':<30} {'dur(s)':>7} {'full(s)':>8} {'cascade(s)':>10} {'speedup':>8} {'escalated':>10} {'WER vs full':>12}")
+    for path in args.files:
+        audio, sr = processor.load_audio(path)
+        duration = len(audio) / sr
+        t0 = time.perf_counter()
+        full = transcriber._transcribe_batched(audio)
+        t_full = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        cascade, stats = transcriber._transcribe_cascade(audio, sr)
+        t_cascade = time.perf_counter() - t0
+        wer = word_error_rate(" ".join(s["text"] for s in full), " ".join(s["text"] for s in cascade))
+        print(f"{Path(path).name[:28]:<30} {duration:7.1f} {t_full:8.2f} {t_cascade:10.2f} {t_full / t_cascade:7.2f}x "
+              f"{stats['escalated_ratio'] * 100:9.1f}% {wer * 100:11.2f}%")
+
+if __name__ == "__main__":
+    main()
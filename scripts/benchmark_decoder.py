@@ -0,0 +1,62 @@
+"""
+So sánh decode audio bằng librosa.load(sr=16000) và ffmpeg pipe (decode_to_buffer / stream_pcm):
+thời gian decode và bộ nhớ đỉnh (tracemalloc) trên các định dạng upload hỗ trợ.
+
+Ví dụ:
+    python scripts/benchmark_decoder.py storage/audio/a.mp3 storage/audio/b.m4a
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.audio_processing.decoder import decode_to_buffer, stream_pcm
+
+SR = 16000
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 ** 2)
+
+def librosa_decode(path):
+    import librosa
+    audio, _ = librosa.load(path, sr=SR, mono=True)
+    return audio
+
+def stream_decode(path):
+    # Chỉ duyệt block, không giữ lại toàn bộ audio: đo bộ nhớ đỉnh của chế độ streaming
+    n = 0
+    for block in stream_pcm(path, sample_rate=SR):
+        n += len(block)
+    return n
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark librosa.load vs ffmpeg pipe decoder")
+    parser.add_argument("files", nargs="+", help="Các file audio (.mp3/.wav/.m4a/.ogg)")
+    args = parser.parse_args()
+    print(f"{'file':<40} {'method':<16} {'time(s)':>8} {'peak(MB)':>9} {'samples':>10}")
+    for path in args.files:
+        name = Path(path).name[:38]
+        ref, t, peak = measure(lambda: librosa_decode(path))
+        print(f"{name:<40} {'librosa.load':<16} {t:8.2f} {peak:9.1f} {len(ref):10d}")
+        buf, t, peak = measure(lambda: decode_to_buffer(path, sample_rate=SR))
+        print(f"{name:<40} {'ffmpeg buffer':<16} {t:8.2f} {peak:9.1f} {len(buf):10d}")
+        n, t, peak = measure(lambda: stream_decode(path))
+        print(f"{name:<40} {'ffmpeg stream':<16} {t:8.2f} {peak:9.1f} {n:10d}")
+        m = min(len(ref), len(buf))
+        print(f"{'':<40} max |librosa - ffmpeg| = {np.abs(ref[:m] - buf[:m]).max():.4f} (khác resampler nên lệch nhỏ)")
+
+if __name__ == "__main__":
+    main()
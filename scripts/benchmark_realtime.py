@@ -0,0 +1,83 @@
+"""
+Đo độ trễ ASR real-time (RealtimeRecognizer): phát audio theo đúng nhịp thời gian thực từng frame 20ms
+(đồng hồ mô phỏng, không sleep) và đo thời gian từ lúc hết câu tới lúc có text final.
+Mục tiêu mặc định: p95 < 1.5s trên node CPU.
+
+Ví dụ:
+    python scripts/benchmark_realtime.py
+    python scripts/benchmark_realtime.py --audio storage/audio/sample.wav --endpoint-ms 400 --target 1.5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from scripts.bench_utils import SR, load_audio, synthetic_speech
+from src.speech_to_text.realtime import RealtimeRecognizer, load_realtime_decoder
+
+def synthetic_dialogue(utterances: int, seed: int = 0) -> np.ndarray:
+    """Các câu giả lập dài 2-8s xen kẽ khoảng lặng 1-2s."""
+    rng = np.random.default_rng(seed)
+    pieces = []
+    for i in range(utterances):
+        pieces.append(np.zeros(int(rng.uniform(1, 2) * SR), dtype=np.float32))
+        pieces.append(synthetic_speech(rng.uniform(2, 8), seed=seed + i))
+    pieces.append(np.zeros(2 * SR, dtype=np.float32))
+    return np.concatenate(pieces)
+
+def replay(recognizer: RealtimeRecognizer, audio: np.ndarray, frame_ms: int):
+    """Phát audio theo nhịp thời gian thực; trả về danh sách (event, thời điểm có kết quả trên đồng hồ mô phỏng)."""
+    frame = int(frame_ms / 1000 * SR)
+    clock = 0.0
+    results = []
+    for i in range(0, len(audio), frame):
+        block = audio[i:i + frame]
+        # Frame chỉ tới server khi đã được thu xong
+        clock = max(clock, (i + len(block)) / SR)
+        t0 = time.perf_counter()
+        events = recognizer.feed(block)
+        clock += time.perf_counter() - t0
+        results += [(event, clock) for event in events]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark độ trễ ASR real-time")
+    parser.add_argument("--audio", default=None, help="File audio (mặc định: hội thoại giả lập)")
+    parser.add_argument("--utterances", type=int, default=10)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--endpoint-ms", type=int, default=None, help="Mặc định REALTIME_ENDPOINT_SILENCE_MS")
+    parser.add_argument("--partial-ms", type=int, default=None, help="Mặc định REALTIME_PARTIAL_INTERVAL_MS")
+    parser.add_argument("--beam-size", type=int, default=None, help="Mặc định REALTIME_BEAM_SIZE")
+    parser.add_argument("--target", type=float, default=1.5, help="Ngưỡng p95 (giây) từ hết câu tới text final")
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio) if args.audio else synthetic_dialogue(args.utterances)
+    decode = load_realtime_decoder(beam_size=args.beam_size)
+    # Warm-up để lần decode đầu không tính thời gian khởi tạo
+    decode(audio[:SR])
+    recognizer = RealtimeRecognizer(decode, SR, endpoint_silence_ms=args.endpoint_ms, partial_interval_ms=args.partial_ms)
+    results = replay(recognizer, audio, args.frame_ms)
+
+    finals = [(e, t) for e, t in results if e["type"] == "final"]
+    partials = [(e, t) for e, t in results if e["type"] == "partial"]
+    if not finals:
+        print("[REALTIME] Không có câu nào được nhận dạng")
+        sys.exit(1)
+    latencies = np.array([t - e["end"] for e, t in finals])
+    decode_times = np.array([e["decode_time"] for e, _ in finals])
+    for e, t in finals:
+        print(f"[REALTIME] {e['start']:7.2f}-{e['end']:7.2f}s | latency={t - e['end']:.2f}s | decode={e['decode_time']:.2f}s | {e['text'][:60]}")
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"[REALTIME] audio={len(audio) / SR:.1f}s | finals={len(finals)} | partials={len(partials)} "
+          f"| endpoint={recognizer.endpoint_silence:.2f}s | decode p50={np.median(decode_times):.2f}s")
+    print(f"[REALTIME] Độ trễ hết câu -> final: p50={p50:.2f}s p95={p95:.2f}s max={latencies.max():.2f}s "
+          f"| target={args.target}s -> {'PASS' if p95 <= args.target else 'FAIL'}")
+
+if __name__ == "__main__":
+    main()
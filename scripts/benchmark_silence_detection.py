@@ -0,0 +1,86 @@
+"""
+So sánh phát hiện khoảng lặng: cách cũ (librosa.feature.rms + vòng lặp Python trên từng frame)
+và bản vector hóa trong src/audio_processing/vad.py. Kiểm tra kết quả giống nhau và in thời gian.
+
+Ví dụ:
+    python scripts/benchmark_silence_detection.py --minutes 60
+    python scripts/benchmark_silence_detection.py storage/audio/a.mp3
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.audio_processing.vad import detect_silence
+
+SR = 16000
+
+def legacy_detect_silence(audio, sr, silence_thresh=-40.0, min_silence_len=1000):
+    # Bản cũ của Transcriber._detect_silence
+    import librosa
+    rms = librosa.feature.rms(y=audio)[0]
+    db = 20 * np.log10(rms + 1e-10)
+    is_silence = db < silence_thresh
+    silence_segments = []
+    start = None
+    for i, silent in enumerate(is_silence):
+        if silent and start is None:
+            start = i
+        elif not silent and start is not None:
+            end = i
+            duration = (end - start) * 512 / sr
+            if duration >= min_silence_len / 1000:
+                silence_segments.append((start * 512 / sr, end * 512 / sr))
+            start = None
+    return silence_segments
+
+def synthetic_speech(minutes: float, seed: int = 0) -> np.ndarray:
+    """Tín hiệu giả lập: các đoạn nói (nhiễu điều biên) xen kẽ khoảng lặng 0.2-2s."""
+    rng = np.random.default_rng(seed)
+    parts, total = [], 0
+    target = int(minutes * 60 * SR)
+    while total < target:
+        speech = rng.normal(0, 0.1, int(rng.uniform(1, 8) * SR)).astype(np.float32)
+        silence = rng.normal(0, 0.001, int(rng.uniform(0.2, 2) * SR)).astype(np.float32)
+        parts += [speech, silence]
+        total += len(speech) + len(silence)
+    return np.concatenate(parts)[:target]
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark phát hiện khoảng lặng: vòng lặp cũ vs numpy")
+    parser.add_argument("files", nargs="*", help="File audio; bỏ trống để dùng tín hiệu giả lập")
+    parser.add_argument("--minutes", type=float, default=30.0, help="Độ dài tín hiệu giả lập (phút)")
+    parser.add_argument("--min-silence-len", type=int, default=300, help="ms")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    inputs = []
+    if args.files:
+        from src.audio_processing.decoder import decode_to_buffer
+        inputs = [(Path(p).name[:30], decode_to_buffer(p, sample_rate=SR)) for p in args.files]
+    else:
+        inputs = [(f"synthetic {args.minutes:g}min", synthetic_speech(args.minutes))]
+
+    print(f"{'input':<32} {'legacy(s)':>10} {'numpy(s)':>10} {'speedup':>8} {'silences':>9} {'match':>6}")
+    for name, audio in inputs:
+        ref, t_legacy = timed(lambda: legacy_detect_silence(audio, SR, min_silence_len=args.min_silence_len), args.repeat)
+        new, t_new = timed(lambda: detect_silence(audio, SR, min_silence_len=args.min_silence_len), args.repeat)
+        match = len(ref) == len(new) and np.allclose(np.array(ref).reshape(-1, 2), np.array(new).reshape(-1, 2))
+        print(f"{name:<32} {t_legacy:10.3f} {t_new:10.3f} {t_legacy / t_new:7.1f}x {len(new):9d} {str(match):>6}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query, Form, Body, Depends, Request
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query, Form, Body, Depends, Request, WebSocket, WebSocketDisconnect
 from typing import List, Dict, Any
 import json
 import os
-from src.services.audio_service import summarize_multi_transcripts, summarize_transcript, save_audio_and_create_task, process_task
+import itertools
+import numpy as np
+from src.services.audio_service import summarize_multi_transcripts, summarize_transcript, save_audio_and_create_task, process_task, process_task_batch, generate_task_caption, get_task_triage, stream_task_transcript
 from src.services.task_service import create_task, get_task, list_tasks, update_task
 from src.core.logging import logger
 import uuid
@@ -10,9 +12,12 @@ from datetime import datetime, timedelta
 from src.database.models.models import Case, AudioFile, Task
 from src.database.config.database import get_db
 from sqlalchemy.orm import Session
-import subprocess
+from src.services.llm_client import ollama_client, OllamaError
 from src.speech_to_text.transcriber import OllamaProcessor
-from fastapi.responses import FileResponse
+from src.speech_to_text.decode_profiles import DECODE_PROFILES
+from src.core.config import settings
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import unquote
@@ -111,9 +116,10 @@ async def summarize_multi(
 def summarize_case(
     case_id: str = Body(...),
     model_name: str = Body("google/mt5-base"),
-    context_analysis: dict = Body(None)
+    context_analysis: dict = Body(None),
+    refresh: bool = Body(False)
 ):
-    """Tóm tắt toàn bộ các file thuộc một case"""
+    """Tóm tắt toàn bộ các file thuộc một case. refresh=true: bỏ qua LLM cache, sinh lại tóm tắt."""
     try:
         tasks = list_tasks(case_id=case_id)
         transcripts = []
@@ -130,7 +136,7 @@ def summarize_case(
             transcript = t.get("result", {}).get("transcription") or t.get("result", {}).get("text")
             if transcript:
                 transcripts.append(transcript)
-        summary = summarize_multi_transcripts(transcripts, context=context, model_name=model_name)
+        summary = summarize_multi_transcripts(transcripts, context=context, model_name=model_name, use_cache=not refresh)
         return {"summary": summary}
     except Exception as e:
         logger.error(f"Error summarizing case: {str(e)}")
@@ -171,20 +177,119 @@ def update_task_context(task_id: str, context_analysis: dict = Body(...)):
 def get_ollama_models():
     """Trả về danh sách các model Ollama đang chạy trên hệ thống"""
     try:
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        models = []
-        for line in result.stdout.splitlines():
-            if line.strip() and not line.startswith("NAME"):
-                parts = line.split()
-                if parts:
-                    models.append(parts[0])
-        return {"models": models}
-    except Exception as e:
+        return {"models": ollama_client.list_models()}
+    except OllamaError as e:
         return {"models": [], "error": str(e)}
 
+@router.get("/tasks/{task_id}/caption")
+def get_task_caption(task_id: str, db: Session = Depends(get_db)):
+    """Trả về caption của task; với caption_mode='lazy' caption được sinh ở lần gọi đầu tiên."""
+    return generate_task_caption(task_id, db)
+
+@router.get("/tasks/{task_id}/stream")
+def stream_task(task_id: str, decode_profile: str = Query(None), db: Session = Depends(get_db)):
+    """
+    Server-Sent Events: transcribe file của task và đẩy từng segment (kèm timestamp) ngay khi decode xong.
+    Event: info -> segment... -> done (hoặc failed/error).
+    """
+    if decode_profile and decode_profile not in DECODE_PROFILES:
+        raise HTTPException(status_code=400, detail=f"decode_profile không hợp lệ: {decode_profile}. Chọn một trong {list(DECODE_PROFILES)}")
+    events = stream_task_transcript(task_id, db, decode_profile=decode_profile)
+    # Lấy event đầu tiên trước khi mở stream để lỗi 404 vẫn trả về HTTP status đúng
+    first = next(events)
+
+    def sse():
+        try:
+            for item in itertools.chain([first], events):
+                yield f"event: {item['event']}\ndata: {json.dumps(item['data'], ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"[STREAM] Lỗi stream task_id={task_id}: {e}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'task_id': task_id, 'error': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/realtime")
+async def realtime_asr(websocket: WebSocket, encoding: str = Query("s16le")):
+    """
+    ASR real-time qua WebSocket: client gửi frame binary PCM mono 16kHz (encoding "s16le" hoặc "f32le",
+    nên 20-100ms mỗi frame), server trả JSON {"type": "partial"|"final", text, start, end, decode_time}.
+    Gửi text "end" để decode nốt câu đang nói rồi đóng kết nối.
+    """
+    from src.speech_to_text.realtime import RealtimeRecognizer, load_realtime_decoder
+    await websocket.accept()
+    if encoding not in ("s16le", "f32le"):
+        await websocket.close(code=1003, reason=f"encoding không hợp lệ: {encoding}")
+        return
+    dtype = np.int16 if encoding == "s16le" else np.float32
+    decode = await run_in_threadpool(load_realtime_decoder)
+    recognizer = RealtimeRecognizer(decode)
+    pending = b""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") == "end":
+                break
+            data = message.get("bytes")
+            if not data:
+                continue
+            data = pending + data
+            cut = len(data) - len(data) % np.dtype(dtype).itemsize
+            pending = data[cut:]
+            block = np.frombuffer(data[:cut], dtype=dtype).astype(np.float32)
+            if dtype == np.int16:
+                block /= 32768.0
+            for event in await run_in_threadpool(recognizer.feed, block):
+                await websocket.send_json(event)
+        for event in await run_in_threadpool(recognizer.flush):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        logger.info(f"[REALTIME] Kết thúc phiên | audio={recognizer.position:.2f}s | utterances={recognizer.utterances}")
+
+@router.get("/model-registry")
+def get_model_registry_stats():
+    """Thống kê model registry trong process API: số lần load, hit, evict và các model đang giữ"""
+    from src.core.model_registry import model_registry
+    return model_registry.stats()
+
+@router.get("/short-clip-batcher")
+def get_short_clip_batcher_stats():
+    """Thống kê batch clip ngắn trong process API (số batch, kích thước batch trung bình, cửa sổ đang chờ)."""
+    from src.worker.batching import short_clip_batcher_stats
+    return short_clip_batcher_stats() or {"batches": 0}
+
+@router.get("/decode-profiles")
+def list_decode_profiles():
+    """Danh sách decode profile có thể chọn theo từng task"""
+    return {"default": settings.WHISPER_DECODE_PROFILE, "profiles": [p.as_dict() for p in DECODE_PROFILES.values()]}
+
+@router.get("/execution-profile")
+def get_execution_profile():
+    """Cấu hình thực thi Whisper đã chọn cho máy: device, compute_type, cpu_threads, num_workers, số core, concurrency và profile autotune"""
+    from src.core.hardware import resolve_execution_profile, tuned_profile_summary
+    return {**resolve_execution_profile().as_dict(), "autotune": tuned_profile_summary()}
+
+@router.get("/pcm-cache")
+def get_pcm_cache_stats():
+    """Thống kê PCM cache: hit/miss, số entry, dung lượng"""
+    from src.audio_processing.pcm_cache import pcm_cache
+    return pcm_cache.stats()
+
+@router.get("/llm-cache")
+def get_llm_cache_stats():
+    """Thống kê LLM response cache: hit/miss, evict, số entry, dung lượng; kèm số lời gọi/thử lại/lỗi của Ollama client"""
+    from src.services.llm_cache import llm_cache
+    return {**llm_cache.stats(), "ollama": ollama_client.stats()}
+
 @router.post("/tasks/{task_id}/resummarize")
-def resummarize_task(task_id: str):
-    """Tóm tắt lại file với user_context_prompt mới (nếu có), luôn ưu tiên model tốt nhất."""
+def resummarize_task(task_id: str, refresh: bool = Query(False)):
+    """Tóm tắt lại file với user_context_prompt mới (nếu có), luôn ưu tiên model tốt nhất.
+    Prompt/context không đổi thì trả lại kết quả trong LLM cache; refresh=true để bắt buộc sinh lại."""
     task = get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -192,11 +297,10 @@ def resummarize_task(task_id: str):
     transcript = result.get("transcription") or result.get("text")
     context = result.get("context_analysis")
     user_context_prompt = result.get("user_context_prompt")
-    # Lấy danh sách model ollama đang chạy
+    # Lấy danh sách model ollama đang chạy (cache trong client dùng chung)
     try:
-        proc = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        models = [line.split()[0] for line in proc.stdout.splitlines() if line.strip() and not line.startswith("NAME")]
-    except Exception:
+        models = ollama_client.list_models()
+    except OllamaError:
         models = []
     # Ưu tiên gemma2:9b, nếu không thì chọn model đầu tiên
     model_name = "gemma2:9b" if "gemma2:9b" in models else (models[0] if models else "gemma2:9b")
@@ -204,11 +308,11 @@ def resummarize_task(task_id: str):
         raise HTTPException(status_code=400, detail="No transcript found")
     # Nếu user_context_prompt thay đổi, phân tích lại context
     if user_context_prompt:
-        context = OllamaProcessor(model_name=model_name).analyze_context(transcript)
+        context = OllamaProcessor(model_name=model_name).analyze_context(transcript, use_cache=not refresh)
     if context is None or not isinstance(context, dict):
         context = {}
     # Tóm tắt với prompt mạnh hơn, tăng max_length
-    summary = summarize_transcript(transcript, context=context, model_name=model_name, user_context_prompt=user_context_prompt, max_length=300, min_length=80)
+    summary = summarize_transcript(transcript, context=context, model_name=model_name, user_context_prompt=user_context_prompt, max_length=300, min_length=80, use_cache=not refresh)
     result["summary"] = summary
     result["context_analysis"] = context
     result["model_name"] = model_name
@@ -228,13 +332,67 @@ from src.worker.tasks import process_task_async
 async def process_uploaded_task(
     task_id: str,
     model_name: str = Body("gemma2:9b", embed=True),
+    caption_mode: str = Body(None, embed=True),
+    decode_profile: str = Body(None, embed=True),
     db: Session = Depends(get_db)
 ):
-    """Xử lý file đã upload: transcribe, summarize, update task/audio_file (bất đồng bộ). Gửi task cho Celery, trả về ngay, frontend polling trạng thái."""
-    logger.info(f"[PROCESS_TASK] [ASYNC] Nhận request xử lý task_id={task_id} với model={model_name}")
-    celery_result = process_task_async.delay(task_id, model_name)
-    logger.info(f"[PROCESS_TASK] [ASYNC] Đã gửi task cho Celery | celery_id={celery_result.id}")
-    return {"task_id": task_id, "celery_id": celery_result.id, "status": "processing"}
+    """Xử lý file đã upload: transcribe, summarize, update task/audio_file (bất đồng bộ). Gửi task cho Celery, trả về ngay, frontend polling trạng thái.
+    caption_mode: "off" | "eager" | "lazy" (mặc định theo cấu hình server).
+    decode_profile: "fast" | "balanced" | "accurate" (mặc định theo cấu hình server)."""
+    if decode_profile and decode_profile not in DECODE_PROFILES:
+        raise HTTPException(status_code=400, detail=f"decode_profile không hợp lệ: {decode_profile}. Chọn một trong {list(DECODE_PROFILES)}")
+    logger.info(f"[PROCESS_TASK] [ASYNC] Nhận request xử lý task_id={task_id} với model={model_name} | caption_mode={caption_mode} | decode_profile={decode_profile}")
+    # Route theo triage lúc upload: file rỗng không gửi Celery, file ngắn/dài vào queue riêng
+    triage = get_task_triage(task_id, db)
+    if triage.get("is_empty"):
+        return {"task_id": task_id, "status": "failed", "error": triage.get("reason"), "triage": triage}
+    celery_result = process_task_async.apply_async(
+        args=(task_id, model_name),
+        kwargs={"caption_mode": caption_mode, "decode_profile": decode_profile},
+        queue=triage.get("queue") or None,
+    )
+    logger.info(f"[PROCESS_TASK] [ASYNC] Đã gửi task cho Celery | celery_id={celery_result.id} | queue={triage.get('queue') or 'default'}")
+    return {"task_id": task_id, "celery_id": celery_result.id, "status": "processing", "queue": triage.get("queue")}
+
+@router.post("/ingest")
+async def ingest_audio(
+    request: Request,
+    filename: str = Query(...),
+    case_id: int = Query(None),
+    model_name: str = Query("gemma2:9b"),
+    caption_mode: str = Query(None),
+    decode_profile: str = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Upload pipelined: body là byte thô của file (application/octet-stream), được decode và cắt chunk ngay trong
+    lúc upload, mỗi chunk giao cho Celery worker transcribe (transcribe_chunk_async). Khi byte cuối tới chỉ còn decode phần đuôi; trả về transcript, phần caption/analysis/summary
+    chạy tiếp trên Celery (không decode lại, dùng transcript đã có). Định dạng không decode được qua pipe (m4a)
+    thì xử lý như /process-task."""
+    from src.services.ingest_service import IngestSession
+    if decode_profile and decode_profile not in DECODE_PROFILES:
+        raise HTTPException(status_code=400, detail=f"decode_profile không hợp lệ: {decode_profile}. Chọn một trong {list(DECODE_PROFILES)}")
+    session = await run_in_threadpool(IngestSession, filename, db, case_id, decode_profile, caption_mode=caption_mode)
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(session.feed, chunk)
+    except Exception as e:
+        logger.error(f"[INGEST] Upload bị ngắt | filename={filename}: {e}", exc_info=True)
+        session.abort()
+        raise
+    result = await run_in_threadpool(session.finish)
+    if result["status"] == "failed":
+        return result
+    triage = result.get("triage") or {}
+    celery_result = process_task_async.apply_async(
+        args=(result["task_id"], model_name),
+        kwargs={"caption_mode": caption_mode, "decode_profile": decode_profile, "segments": result.get("segments"),
+                "caption": result.get("caption")},
+        queue=triage.get("queue") or None,
+    )
+    logger.info(f"[INGEST] Đã gửi task cho Celery | task_id={result['task_id']} | celery_id={celery_result.id} | pipelined={result['pipelined']}")
+    result.update({"celery_id": celery_result.id, "status": "processing", "queue": triage.get("queue")})
+    return result
 
 @router.post("/process-tasks")
 async def process_multiple_tasks(
@@ -242,30 +400,22 @@ async def process_multiple_tasks(
     model_name: str = Body("gemma2:9b", embed=True),
     db: Session = Depends(get_db)
 ):
-    """Xử lý nhiều task (nhiều file/audio) theo batch, tận dụng batch_size và pipeline tối ưu."""
+    """Xử lý nhiều task (nhiều file/audio) theo batch: decode trước audio của task kế tiếp trong process pool
+    (shared memory) trong lúc task trước đang inference, clip ngắn được gom batch qua ShortClipBatcher."""
     import time
-    from src.speech_to_text.transcriber import Transcriber
-    transcriber = Transcriber()
-    batch_size = transcriber.batch_size
-    results = []
+    from src.speech_to_text.transcriber import resolve_batch_size
+    # Chỉ cần batch_size, không khởi tạo Transcriber (tránh load model chỉ để đọc cấu hình)
+    batch_size = resolve_batch_size()
     total_start = time.time()
-    # Chia task_ids thành các batch nhỏ
-    for i in range(0, len(task_ids), batch_size):
-        batch = task_ids[i:i+batch_size]
-        batch_start = time.time()
-        with ThreadPoolExecutor(max_workers=min(batch_size, 8)) as executor:
-            future_to_task = {executor.submit(process_task, tid, model_name, db): tid for tid in batch}
-            for future in as_completed(future_to_task):
-                tid = future_to_task[future]
-                try:
-                    result = future.result()
-                    results.append({"task_id": tid, "status": "success", "result": result})
-                except Exception as e:
-                    results.append({"task_id": tid, "status": "error", "message": str(e)})
-        batch_end = time.time()
-        logger.info(f"[BATCH] Xử lý batch {i//batch_size+1}: {len(batch)} task, thời gian: {batch_end-batch_start:.2f}s")
-    total_end = time.time()
-    logger.info(f"[BATCH] Tổng thời gian xử lý {len(task_ids)} task: {total_end-total_start:.2f}s")
+    outcomes = await run_in_threadpool(process_task_batch, task_ids, model_name, db, max_workers=batch_size)
+    results = []
+    for tid in task_ids:
+        result = outcomes.get(tid) or {}
+        if result.get("status") == "failed":
+            results.append({"task_id": tid, "status": "error", "message": result.get("error")})
+        else:
+            results.append({"task_id": tid, "status": "success", "result": result})
+    logger.info(f"[BATCH] Tổng thời gian xử lý {len(task_ids)} task: {time.time()-total_start:.2f}s")
     return {"results": results}
 
 @router.post("/batch")
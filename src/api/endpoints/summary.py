@@ -45,17 +45,19 @@ def delete_one_summary(summary_id: int, db: Session = Depends(get_db)):
     return {"detail": "Summary deleted"}
 
 @router.post("/analyze")
-def analyze_summary(summary: str = Body(..., embed=True), task_id: str = Body(None), db: Session = Depends(get_db)):
+def analyze_summary(summary: str = Body(..., embed=True), task_id: str = Body(None), refresh: bool = Body(False),
+                    db: Session = Depends(get_db)):
     """
     Phân tích summary bằng rule/memory bank nội bộ (OllamaProcessor.analyze_context).
     Nếu truyền task_id, sẽ tự động lưu context_analysis vào trường result của task tương ứng.
+    Cùng nội dung thì trả lại kết quả trong LLM cache; refresh=true để phân tích lại.
     """
     import logging
     logger = logging.getLogger("summary_analyze")
     logger.info(f"[SUMMARY_ANALYZE] Bắt đầu analyze_summary | summary_len={len(summary) if summary else 0} | task_id={task_id}")
     try:
         processor = OllamaProcessor()
-        context_analysis = processor.analyze_context(summary)
+        context_analysis = processor.analyze_context(summary, use_cache=not refresh)
         logger.info(f"[SUMMARY_ANALYZE] OllamaProcessor.analyze_context result: {context_analysis}")
         if context_analysis:
             if task_id:
@@ -70,15 +72,16 @@ def analyze_summary(summary: str = Body(..., embed=True), task_id: str = Body(No
     return {"error": "Phân tích thất bại với rule/memory bank nội bộ"}
 
 @router.post("/visualize")
-def visualize_summary(summary: str = Body(..., embed=True)):
+def visualize_summary(summary: str = Body(..., embed=True), refresh: bool = Body(False)):
     """
     Trực quan hóa hội thoại: trả về nodes, edges, timeline, entity_types, main_events cho frontend.
+    refresh=true: bỏ qua LLM cache.
     """
     logger = logging.getLogger("summary_visualize")
     logger.info(f"[SUMMARY_VISUALIZE] Bắt đầu visualize_summary | summary_len={len(summary) if summary else 0}")
     try:
         processor = OllamaProcessor()
-        result = processor.visualize_context(summary)
+        result = processor.visualize_context(summary, use_cache=not refresh)
         logger.info(f"[SUMMARY_VISUALIZE] OllamaProcessor.visualize_context result: {result}")
         return result
     except Exception as e:
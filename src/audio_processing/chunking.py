@@ -0,0 +1,98 @@
+from typing import List, Sequence, Tuple
+
+
+def plan_chunks(duration: float,
+                silences: Sequence[Tuple[float, float]],
+                min_len: float = 20.0,
+                max_len: float = 30.0) -> List[Tuple[float, float]]:
+    """
+    Chia audio thành các chunk [start, end) dài min_len..max_len giây, cắt tại khoảng lặng.
+
+    Trong cửa sổ [start + min_len, start + max_len], điểm cắt là giữa khoảng lặng dài nhất
+    (tránh cắt giữa từ). Nếu cửa sổ không có khoảng lặng thì cắt cứng tại start + max_len.
+
+    Args:
+        duration: Độ dài audio (giây)
+        silences: Danh sách (start, end) các khoảng lặng, đơn vị giây, đã sắp xếp
+        min_len: Độ dài tối thiểu của chunk (giây)
+        max_len: Độ dài tối đa của chunk (giây)
+
+    Returns:
+        Danh sách (start, end) của các chunk, phủ kín [0, duration]
+    """
+    chunks = []
+    start = 0.0
+    silences = sorted(silences)
+    idx = 0
+    while duration - start > max_len:
+        lo, hi = start + min_len, start + max_len
+        while idx < len(silences) and (silences[idx][0] + silences[idx][1]) / 2 < lo:
+            idx += 1
+        best = None
+        j = idx
+        while j < len(silences) and (silences[j][0] + silences[j][1]) / 2 <= hi:
+            length = silences[j][1] - silences[j][0]
+            if best is None or length >= best[1] - best[0]:
+                best = silences[j]
+            j += 1
+        cut = (best[0] + best[1]) / 2 if best is not None else hi
+        chunks.append((start, cut))
+        start = cut
+    if duration > start:
+        chunks.append((start, duration))
+    return chunks
+
+
+def _normalize_word(word: str) -> str:
+    return word.strip().lower().strip(".,!?;:\"'")
+
+
+def dedupe_boundary_words(prev_words: List[dict], next_words: List[dict], max_n: int = 5) -> List[dict]:
+    """
+    Bỏ các từ ở đầu next_words trùng với đuôi prev_words (do vùng overlap bị decode hai lần
+    và timestamp lệch nhẹ qua biên). So khớp n-gram dài nhất, tối đa max_n từ.
+    """
+    if not prev_words or not next_words or max_n <= 0:
+        return next_words
+    prev_tail = [_normalize_word(w["word"]) for w in prev_words[-max_n:]]
+    next_head = [_normalize_word(w["word"]) for w in next_words[:max_n]]
+    for n in range(min(len(prev_tail), len(next_head)), 0, -1):
+        if prev_tail[-n:] == next_head[:n]:
+            return next_words[n:]
+    return next_words
+
+
+def merge_chunk_segments(chunk_results: List[Tuple[float, float, List[dict]]], context_window: int = 5) -> List[dict]:
+    """
+    Gộp kết quả decode của các chunk có overlap thành một danh sách segment theo thứ tự thời gian.
+
+    Mỗi phần tử của chunk_results là (core_start, core_end, segments), trong đó segments là
+    các segment của chunk với timestamp tuyệt đối và danh sách words {start, end, word}.
+    Một từ chỉ được giữ ở chunk mà trung điểm của nó nằm trong vùng core [core_start, core_end),
+    sau đó các từ trùng lặp còn sót ở biên được loại bằng dedupe_boundary_words.
+
+    Returns:
+        Danh sách segment {start, end, text, words}
+    """
+    merged = []
+    kept_words: List[dict] = []
+    for core_start, core_end, segments in sorted(chunk_results, key=lambda c: c[0]):
+        chunk_first = True
+        for seg in segments:
+            words = [
+                w for w in seg.get("words") or []
+                if core_start <= (w["start"] + w["end"]) / 2 < core_end
+            ]
+            if chunk_first and words:
+                words = dedupe_boundary_words(kept_words, words, context_window)
+            if not words:
+                continue
+            chunk_first = False
+            kept_words.extend(words)
+            merged.append({
+                "start": round(float(words[0]["start"]), 2),
+                "end": round(float(words[-1]["end"]), 2),
+                "text": "".join(w["word"] for w in words).strip(),
+                "words": words,
+            })
+    return merged
@@ -0,0 +1,130 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from src.core.config import settings
+from src.audio_processing.vad import frame_rms, rms_to_db, silence_runs, HOP_LENGTH
+
+class OffsetMap:
+    """
+    Ánh xạ thời gian trên audio đã nén (chỉ giữ vùng tiếng nói) về thời gian trên audio gốc.
+    Vùng thứ i bắt đầu tại compact_starts[i] trên audio nén và orig_starts[i] trên audio gốc.
+    """
+
+    def __init__(self, compact_starts: np.ndarray, orig_starts: np.ndarray, lengths: np.ndarray):
+        self.compact_starts = np.asarray(compact_starts, dtype=np.float64)
+        self.orig_starts = np.asarray(orig_starts, dtype=np.float64)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+
+    def to_original(self, times) -> np.ndarray:
+        """Đổi (mảng) thời điểm trên audio nén sang audio gốc; thời điểm rơi vào khoảng đệm giữa hai vùng bị kẹp về cuối vùng trước."""
+        t = np.asarray(times, dtype=np.float64)
+        if not len(self.compact_starts):
+            return t
+        idx = np.clip(np.searchsorted(self.compact_starts, t, side="right") - 1, 0, len(self.compact_starts) - 1)
+        offset = np.clip(t - self.compact_starts[idx], 0.0, self.lengths[idx])
+        return self.orig_starts[idx] + offset
+
+@dataclass
+class CompactionResult:
+    audio: np.ndarray
+    offset_map: OffsetMap
+    regions: List[Tuple[float, float]]  # vùng tiếng nói trên audio gốc (giây)
+    original_duration: float
+    compacted_duration: float
+
+    def stats(self) -> dict:
+        saved = max(0.0, self.original_duration - self.compacted_duration)
+        return {
+            "original_duration": round(self.original_duration, 2),
+            "compacted_duration": round(self.compacted_duration, 2),
+            "saved_seconds": round(saved, 2),
+            "saved_ratio": round(saved / self.original_duration, 4) if self.original_duration else 0.0,
+            "regions": len(self.regions),
+        }
+
+def _silero_regions(audio: np.ndarray, sr: int, min_silence_ms: int) -> List[Tuple[float, float]]:
+    # Silero VAD của faster-whisper phân biệt được tiếng nói với nhạc chờ/nhiễu nền, không chỉ theo năng lượng
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    chunks = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=min_silence_ms, speech_pad_ms=0))
+    return [(c["start"] / sr, c["end"] / sr) for c in chunks]
+
+def _energy_regions(audio: np.ndarray, sr: int, min_silence_ms: int) -> List[Tuple[float, float]]:
+    db = rms_to_db(frame_rms(audio))
+    # Cùng ngưỡng năng lượng với bước triage
+    starts, ends = silence_runs(db < settings.TRIAGE_SILENCE_THRESH, include_trailing=True)
+    min_frames = min_silence_ms / 1000 * sr / HOP_LENGTH
+    keep = (ends - starts) >= min_frames
+    duration = len(audio) / sr
+    regions, cursor = [], 0.0
+    for s, e in zip(starts[keep] * HOP_LENGTH / sr, ends[keep] * HOP_LENGTH / sr):
+        if s > cursor:
+            regions.append((cursor, float(s)))
+        cursor = float(e)
+    if cursor < duration:
+        regions.append((cursor, duration))
+    return regions
+
+def speech_regions(audio: np.ndarray, sr: int = 16000, method: Optional[str] = None,
+                   min_silence_ms: Optional[int] = None, pad_ms: Optional[int] = None) -> List[Tuple[float, float]]:
+    """Các vùng tiếng nói (giây) đã nới pad_ms mỗi phía và gộp vùng chồng lấn."""
+    method = method or settings.WHISPER_COMPACTION_VAD
+    min_silence_ms = min_silence_ms if min_silence_ms is not None else settings.WHISPER_COMPACTION_MIN_SILENCE_MS
+    pad = (pad_ms if pad_ms is not None else settings.WHISPER_COMPACTION_PAD_MS) / 1000
+    regions = _silero_regions(audio, sr, min_silence_ms) if method == "silero" else _energy_regions(audio, sr, min_silence_ms)
+    duration = len(audio) / sr
+    merged: List[List[float]] = []
+    for start, end in regions:
+        start, end = max(0.0, start - pad), min(duration, end + pad)
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+def compact_speech(audio: np.ndarray, sr: int = 16000, regions: Optional[List[Tuple[float, float]]] = None,
+                   gap_ms: Optional[int] = None) -> CompactionResult:
+    """
+    Cắt bỏ vùng không có tiếng nói khỏi PCM trước khi decode, chèn gap_ms im lặng giữa các vùng
+    để Whisper vẫn thấy ranh giới câu, và trả về OffsetMap để remap timestamp về audio gốc.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    regions = speech_regions(audio, sr) if regions is None else regions
+    gap = int((gap_ms if gap_ms is not None else settings.WHISPER_COMPACTION_GAP_MS) / 1000 * sr)
+    pieces, compact_starts, orig_starts, lengths = [], [], [], []
+    cursor = 0
+    for start, end in regions:
+        a, b = int(start * sr), int(end * sr)
+        if b <= a:
+            continue
+        if pieces and gap:
+            pieces.append(np.zeros(gap, dtype=np.float32))
+            cursor += gap
+        pieces.append(audio[a:b])
+        compact_starts.append(cursor / sr)
+        orig_starts.append(a / sr)
+        lengths.append((b - a) / sr)
+        cursor += b - a
+    compacted = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    return CompactionResult(
+        audio=compacted,
+        offset_map=OffsetMap(np.array(compact_starts), np.array(orig_starts), np.array(lengths)),
+        regions=regions,
+        original_duration=len(audio) / sr,
+        compacted_duration=len(compacted) / sr,
+    )
+
+def remap_segments(segments: List[dict], offset_map: OffsetMap) -> List[dict]:
+    """Đổi start/end (và words nếu có) của các segment từ thời gian audio nén sang audio gốc."""
+    if not segments:
+        return segments
+    starts = offset_map.to_original([seg["start"] for seg in segments])
+    ends = offset_map.to_original([seg["end"] for seg in segments])
+    remapped = []
+    for seg, start, end in zip(segments, starts, ends):
+        seg = dict(seg, start=round(float(start), 2), end=round(float(end), 2))
+        if seg.get("words"):
+            w_starts = offset_map.to_original([w["start"] for w in seg["words"]])
+            w_ends = offset_map.to_original([w["end"] for w in seg["words"]])
+            seg["words"] = [dict(w, start=float(ws), end=float(we)) for w, ws, we in zip(seg["words"], w_starts, w_ends)]
+        remapped.append(seg)
+    return remapped
@@ -0,0 +1,173 @@
+import shutil
+import logging
+import threading
+import subprocess
+import numpy as np
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 1 block = 1 giây PCM 16kHz
+DEFAULT_BLOCK_SAMPLES = 16000
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+def probe_duration(file_path: Union[str, Path]) -> Optional[float]:
+    """Độ dài audio (giây) theo ffprobe, None nếu không xác định được."""
+    if shutil.which("ffprobe") is None:
+        return None
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(file_path)],
+            capture_output=True, text=True, timeout=30
+        )
+        return float(out.stdout.strip())
+    except (ValueError, subprocess.SubprocessError, OSError):
+        return None
+
+def _ffmpeg_command(source: str, sample_rate: int) -> list:
+    # Decode + downmix + resample trong ffmpeg, xuất PCM s16le mono ra stdout
+    return ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+            "-i", source, "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ac", "1", "-ar", str(sample_rate), "-"]
+
+class _StderrTail:
+    """
+    Đọc stderr của ffmpeg trong thread riêng để pipe không bao giờ đầy (ffmpeg sẽ treo khi ghi log vào pipe đầy
+    trong lúc ta chỉ đọc stdout), chỉ giữ lại tối đa max_chunks khối cuối để báo lỗi.
+    """
+
+    def __init__(self, stream, max_chunks: int = 2, chunk_size: int = 4096):
+        self._chunks = deque(maxlen=max_chunks)
+        self._thread = threading.Thread(target=self._drain, args=(stream, chunk_size), name="ffmpeg-stderr", daemon=True)
+        self._thread.start()
+
+    def _drain(self, stream, chunk_size: int):
+        try:
+            for chunk in iter(lambda: stream.read1(chunk_size), b""):
+                self._chunks.append(chunk)
+        except (OSError, ValueError):
+            pass
+
+    def text(self, timeout: Optional[float] = 5) -> str:
+        self._thread.join(timeout)
+        return b"".join(self._chunks).decode("utf-8", errors="replace").strip()
+
+def _spawn_ffmpeg(source: str, sample_rate: int, stdin=None) -> Tuple[subprocess.Popen, _StderrTail]:
+    proc = subprocess.Popen(_ffmpeg_command(source, sample_rate),
+                            stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return proc, _StderrTail(proc.stderr)
+
+def _check_returncode(proc: subprocess.Popen, stderr: _StderrTail, source: str):
+    returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg decode lỗi ({returncode}) cho {source}: {stderr.text()}")
+
+def stream_pcm(file_path: Union[str, Path], sample_rate: int = 16000,
+               block_samples: int = DEFAULT_BLOCK_SAMPLES) -> Iterator[np.ndarray]:
+    """
+    Decode file qua ffmpeg pipe, yield từng block PCM mono float32 (block_samples mẫu, block cuối có thể ngắn hơn).
+    Bộ nhớ đỉnh chỉ cỡ một block, không phụ thuộc độ dài file.
+    """
+    proc, stderr = _spawn_ffmpeg(str(file_path), sample_rate)
+    block_bytes = block_samples * 2
+    try:
+        while True:
+            raw = proc.stdout.read(block_bytes)
+            if not raw:
+                break
+            # Bỏ byte lẻ (không đủ một mẫu int16) nếu có
+            raw = raw[:len(raw) - len(raw) % 2]
+            yield np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        _check_returncode(proc, stderr, str(file_path))
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+def decode_to_buffer(file_path: Union[str, Path], sample_rate: int = 16000,
+                     block_samples: int = DEFAULT_BLOCK_SAMPLES * 4) -> np.ndarray:
+    """
+    Decode toàn bộ file vào một buffer float32 cấp phát trước (theo độ dài từ ffprobe).
+    Dữ liệu từ pipe được đọc thẳng vào một block int16 dùng lại, rồi convert vào buffer đích,
+    nên không có bản sao trung gian của toàn bộ audio.
+    """
+    duration = probe_duration(file_path)
+    capacity = int(duration * sample_rate) + sample_rate if duration else sample_rate * 60
+    out = np.empty(capacity, dtype=np.float32)
+    block = np.empty(block_samples, dtype=np.int16)
+    block_view = memoryview(block).cast("B")
+    proc, stderr = _spawn_ffmpeg(str(file_path), sample_rate)
+    n = 0
+    try:
+        while True:
+            got = proc.stdout.readinto(block_view)
+            if not got:
+                break
+            samples = got // 2
+            if n + samples > len(out):
+                # ffprobe thiếu/sai duration: nới buffer gấp đôi
+                out = np.resize(out, max(len(out) * 2, n + samples))
+            np.multiply(block[:samples], 1.0 / 32768.0, out=out[n:n + samples], casting="unsafe")
+            n += samples
+        _check_returncode(proc, stderr, str(file_path))
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return out[:n]
+
+class PipeDecoder:
+    """
+    Decode audio đang được ghi dần vào stdin của ffmpeg (ví dụ byte upload đang tới).
+    Một thread đọc PCM s16le từ stdout và gọi on_block(block float32) cho từng block đã decode.
+    Hợp với định dạng stream được (wav, mp3, ogg); m4a/mp4 có moov ở cuối file thì ffmpeg không decode qua pipe được.
+    """
+
+    def __init__(self, on_block: Callable[[np.ndarray], None], sample_rate: int = 16000,
+                 block_samples: int = DEFAULT_BLOCK_SAMPLES):
+        self.on_block = on_block
+        self.block_bytes = block_samples * 2
+        self.proc, self._stderr = _spawn_ffmpeg("pipe:0", sample_rate, stdin=subprocess.PIPE)
+        self.error: Optional[BaseException] = None
+        self._reader = threading.Thread(target=self._read_loop, name="pipe-decoder", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        pending = b""
+        try:
+            while True:
+                raw = self.proc.stdout.read(self.block_bytes)
+                if not raw:
+                    break
+                raw = pending + raw
+                # Giữ lại byte lẻ cho lần đọc sau
+                cut = len(raw) - len(raw) % 2
+                pending = raw[cut:]
+                self.on_block(np.frombuffer(raw[:cut], dtype=np.int16).astype(np.float32) / 32768.0)
+        except BaseException as e:
+            self.error = e
+
+    def write(self, data: bytes):
+        """Ghi thêm byte audio (có thể block nếu ffmpeg chưa decode kịp)."""
+        self.proc.stdin.write(data)
+
+    def close(self, timeout: Optional[float] = None):
+        """Báo hết dữ liệu, chờ ffmpeg decode xong phần còn lại; lỗi decode -> RuntimeError."""
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join(timeout)
+        _check_returncode(self.proc, self._stderr, "pipe:0")
+        if self.error is not None:
+            raise RuntimeError(f"Lỗi xử lý PCM từ ffmpeg pipe: {self.error}") from self.error
+
+    def abort(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
@@ -0,0 +1,160 @@
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hệ số chuyển float32 [-1, 1] <-> int16, dùng cùng một giá trị cho cả ghi và đọc
+INT16_SCALE = 32767.0
+
+class PCMCache:
+    """
+    Cache PCM đã decode trên đĩa, định danh theo nội dung: key = SHA-256 của file audio + sample rate.
+    Lưu dạng .npy (float32 hoặc int16), đọc lại qua np.memmap nên không phải chạy lại ffmpeg/resample.
+    Khi tổng dung lượng vượt max_bytes thì xóa file ít được dùng nhất (LRU theo mtime).
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 0, dtype: str = "float32",
+                 max_digests: int = 10_000):
+        """
+        Args:
+            cache_dir: Thư mục lưu cache
+            max_bytes: Budget dung lượng (bytes), 0 = không giới hạn
+            dtype: "float32" (memmap dùng trực tiếp, không copy) hoặc "int16" (nhỏ gấp đôi, convert khi đọc)
+            max_digests: Số SHA-256 nhớ tối đa theo (path, size, mtime), bỏ cái dùng lâu nhất khi đầy
+        """
+        if dtype not in ("float32", "int16"):
+            raise ValueError(f"PCM cache dtype không hợp lệ: {dtype}")
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.max_digests = max(1, max_digests)
+        self._digests: "OrderedDict[Tuple[str, int, float], str]" = OrderedDict()
+
+    def file_digest(self, file_path: Union[str, Path]) -> str:
+        """SHA-256 của file, nhớ theo (path, size, mtime) để không hash lại file chưa đổi."""
+        stat = os.stat(file_path)
+        memo_key = (str(file_path), stat.st_size, stat.st_mtime)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+            if digest is not None:
+                self._digests.move_to_end(memo_key)
+                return digest
+        h = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._memo_digest(memo_key, digest)
+        return digest
+
+    def _memo_digest(self, memo_key: Tuple[str, int, float], digest: str):
+        with self._lock:
+            self._digests[memo_key] = digest
+            self._digests.move_to_end(memo_key)
+            while len(self._digests) > self.max_digests:
+                self._digests.popitem(last=False)
+
+    def remember_digest(self, file_path: Union[str, Path], digest: str):
+        """Ghi nhớ SHA-256 đã tính sẵn (ví dụ trong lúc nhận upload) để file_digest không phải đọc lại file."""
+        stat = os.stat(file_path)
+        self._memo_digest((str(file_path), stat.st_size, stat.st_mtime), digest)
+
+    def _entry_path(self, digest: str, sample_rate: int) -> Path:
+        return self.cache_dir / f"{digest}_{sample_rate}_{self.dtype}.npy"
+
+    def get(self, digest: str, sample_rate: int) -> Optional[np.ndarray]:
+        """Đọc PCM float32 từ cache (memory-mapped), None nếu chưa có."""
+        path = self._entry_path(digest, sample_rate)
+        if not path.exists():
+            return None
+        try:
+            data = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"[PCM_CACHE] File cache hỏng, xóa: {path} | {e}")
+            path.unlink(missing_ok=True)
+            return None
+        # Cập nhật mtime để LRU eviction biết file vừa được dùng
+        os.utime(path, None)
+        if self.dtype == "int16":
+            return data.astype(np.float32) / INT16_SCALE
+        return data
+
+    def put(self, digest: str, sample_rate: int, audio: np.ndarray) -> Path:
+        """Ghi PCM vào cache (ghi file tạm rồi rename để reader không đọc file dở)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(digest, sample_rate)
+        if self.dtype == "int16":
+            data = (np.clip(audio, -1.0, 1.0) * INT16_SCALE).astype(np.int16)
+        else:
+            data = np.asarray(audio, dtype=np.float32)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp_path, data)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def load(self, file_path: Union[str, Path], sample_rate: int,
+             decode: Callable[[Union[str, Path]], np.ndarray]) -> np.ndarray:
+        """
+        Trả về PCM của file: đọc từ cache nếu có, nếu không thì gọi decode(file_path) rồi lưu cache.
+        """
+        digest = self.file_digest(file_path)
+        audio = self.get(digest, sample_rate)
+        if audio is not None:
+            with self._lock:
+                self.hits += 1
+            logger.info(f"[PCM_CACHE] Hit {file_path} | sha256={digest[:12]} | sr={sample_rate}")
+            return audio
+        with self._lock:
+            self.misses += 1
+        audio = decode(file_path)
+        try:
+            path = self.put(digest, sample_rate, audio)
+            logger.info(f"[PCM_CACHE] Miss {file_path} | đã lưu {path.name}")
+        except OSError as e:
+            logger.warning(f"[PCM_CACHE] Không ghi được cache cho {file_path}: {e}")
+        return audio
+
+    def evict(self):
+        """Xóa các entry cũ nhất (theo mtime) cho tới khi tổng dung lượng <= max_bytes."""
+        if not self.max_bytes or not self.cache_dir.exists():
+            return
+        entries = []
+        for p in self.cache_dir.glob("*.npy"):
+            if p.name.endswith(".tmp.npy"):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"[PCM_CACHE] LRU evicted {p.name}")
+
+    def stats(self) -> dict:
+        files = [p for p in self.cache_dir.glob("*.npy") if not p.name.endswith(".tmp.npy")] if self.cache_dir.exists() else []
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(files),
+            "total_bytes": sum(p.stat().st_size for p in files),
+            "max_bytes": self.max_bytes,
+            "dtype": self.dtype,
+        }
+
+pcm_cache = PCMCache(settings.PCM_CACHE_DIR, max_bytes=settings.PCM_CACHE_MAX_BYTES, dtype=settings.PCM_CACHE_DTYPE)
@@ -3,7 +3,9 @@ import soundfile as sf
 from pydub import AudioSegment
 import numpy as np
 from pathlib import Path
-from typing import Union, Optional
+from typing import Iterator, Union, Optional
+from src.core.config import settings
+from src.audio_processing.decoder import ffmpeg_available, decode_to_buffer, stream_pcm
 
 class AudioProcessor:
     def __init__(self, sample_rate: int = 16000):
@@ -15,18 +17,39 @@ class AudioProcessor:
         """
         self.sample_rate = sample_rate
     
-    def load_audio(self, file_path: Union[str, Path]) -> tuple[np.ndarray, int]:
+    def load_audio(self, file_path: Union[str, Path], use_cache: bool = True) -> tuple[np.ndarray, int]:
         """
         Load audio file and convert to mono
         
         Args:
             file_path: Path to audio file
+            use_cache: Đọc/ghi PCM cache (storage/pcm_cache) để không decode lại cùng một file
             
         Returns:
             tuple: (audio_data, sample_rate)
         """
-        audio, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
-        return audio, sr
+        if use_cache and settings.PCM_CACHE_ENABLED:
+            from src.audio_processing.pcm_cache import pcm_cache
+            audio = pcm_cache.load(file_path, self.sample_rate, self._decode)
+            return audio, self.sample_rate
+        return self._decode(file_path), self.sample_rate
+
+    def _decode(self, file_path: Union[str, Path]) -> np.ndarray:
+        # ffmpeg pipe: decode + resample streaming vào buffer cấp phát trước, fallback librosa nếu thiếu ffmpeg
+        if ffmpeg_available():
+            return decode_to_buffer(file_path, sample_rate=self.sample_rate)
+        audio, _ = librosa.load(file_path, sr=self.sample_rate, mono=True)
+        return audio
+
+    def stream_audio(self, file_path: Union[str, Path], block_samples: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        Decode file theo từng block PCM mono float32 (mặc định 1 giây/block), bộ nhớ đỉnh không phụ thuộc độ dài file.
+        
+        Args:
+            file_path: Path to audio file
+            block_samples: Số mẫu mỗi block
+        """
+        return stream_pcm(file_path, sample_rate=self.sample_rate, block_samples=block_samples or self.sample_rate)
     
     def save_audio(self, audio: np.ndarray, file_path: Union[str, Path], sample_rate: Optional[int] = None):
         """
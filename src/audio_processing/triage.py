@@ -0,0 +1,58 @@
+import numpy as np
+from dataclasses import dataclass, asdict
+from typing import Optional
+from src.core.config import settings
+from src.audio_processing.vad import frame_rms, rms_to_db, HOP_LENGTH
+
+@dataclass
+class TriageResult:
+    """Chỉ số sàng lọc trước ASR của một file audio"""
+    duration: float  # giây
+    rms_db: float  # năng lượng RMS toàn file (dBFS)
+    peak: float  # biên độ tuyệt đối lớn nhất
+    speech_seconds: float  # tổng thời lượng frame có năng lượng trên ngưỡng
+    speech_ratio: float  # speech_seconds / duration
+    is_empty: bool
+    reason: Optional[str]
+    queue: Optional[str]  # queue Celery cho bước ASR, None nếu file rỗng
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+def triage_audio(audio: np.ndarray, sr: int = 16000, silence_thresh: Optional[float] = None) -> TriageResult:
+    """
+    Tính duration, RMS và tỉ lệ tiếng nói (VAD năng lượng vector hóa) rồi quyết định:
+    file rỗng/gần như im lặng thì fail ngay, còn lại route sang queue ngắn/dài theo độ dài.
+    """
+    silence_thresh = settings.TRIAGE_SILENCE_THRESH if silence_thresh is None else silence_thresh
+    audio = np.asarray(audio, dtype=np.float32)
+    duration = len(audio) / sr
+    if len(audio):
+        rms_db = float(rms_to_db(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))))
+        peak = float(np.max(np.abs(audio)))
+        frame_db = rms_to_db(frame_rms(audio))
+        speech_frames = int(np.count_nonzero(frame_db >= silence_thresh))
+        # Mỗi frame (center) đại diện cho hop_length mẫu
+        speech_seconds = min(duration, speech_frames * HOP_LENGTH / sr)
+    else:
+        rms_db, peak, speech_seconds = float(rms_to_db(0.0)), 0.0, 0.0
+    speech_ratio = speech_seconds / duration if duration else 0.0
+
+    reason = None
+    if duration < settings.TRIAGE_MIN_DURATION:
+        reason = f"Audio quá ngắn ({duration:.2f}s)"
+    elif speech_seconds < settings.TRIAGE_MIN_SPEECH_SECONDS:
+        reason = f"Không phát hiện tiếng nói (speech={speech_seconds:.2f}s, rms={rms_db:.1f}dB)"
+    queue = None
+    if reason is None:
+        queue = settings.TRIAGE_SHORT_QUEUE if duration <= settings.TRIAGE_SHORT_MAX_SECONDS else settings.TRIAGE_LONG_QUEUE
+    return TriageResult(
+        duration=round(duration, 3),
+        rms_db=round(rms_db, 2),
+        peak=round(peak, 4),
+        speech_seconds=round(speech_seconds, 3),
+        speech_ratio=round(speech_ratio, 4),
+        is_empty=reason is not None,
+        reason=reason,
+        queue=queue,
+    )
@@ -0,0 +1,131 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+
+
+def frame_rms(audio: np.ndarray, frame_length: int = FRAME_LENGTH, hop_length: int = HOP_LENGTH,
+              center: bool = True) -> np.ndarray:
+    """
+    RMS năng lượng theo frame, tương đương librosa.feature.rms (center=True, pad constant)
+    nhưng tính bằng cumsum trên bình phương tín hiệu thay vì dựng ma trận frame.
+    """
+    y = np.asarray(audio, dtype=np.float64)
+    if center:
+        y = np.pad(y, frame_length // 2, mode="constant")
+    if len(y) < frame_length:
+        return np.zeros(0, dtype=np.float64)
+    n_frames = 1 + (len(y) - frame_length) // hop_length
+    csum = np.concatenate(([0.0], np.cumsum(y * y)))
+    starts = np.arange(n_frames) * hop_length
+    power = (csum[starts + frame_length] - csum[starts]) / frame_length
+    return np.sqrt(np.maximum(power, 0.0))
+
+
+def rms_to_db(rms: np.ndarray) -> np.ndarray:
+    return 20 * np.log10(rms + 1e-10)
+
+
+def silence_runs(is_silent: np.ndarray, min_frames: int = 1, include_trailing: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length các đoạn True liên tiếp trong mask bằng np.diff, lọc theo độ dài tối thiểu.
+
+    Returns:
+        (starts, ends) theo chỉ số frame, end không bao gồm
+    """
+    mask = np.asarray(is_silent, dtype=np.int8)
+    edges = np.diff(np.concatenate(([0], mask, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not include_trailing and len(ends) and ends[-1] == len(mask):
+        # Đoạn lặng kéo dài tới cuối audio không có điểm kết thúc (giữ hành vi cũ)
+        starts, ends = starts[:-1], ends[:-1]
+    keep = (ends - starts) >= min_frames
+    return starts[keep], ends[keep]
+
+
+def detect_silence(audio: np.ndarray, sr: int = 16000, silence_thresh: float = -40.0,
+                   min_silence_len: int = 1000, hop_length: int = HOP_LENGTH,
+                   frame_length: int = FRAME_LENGTH) -> List[Tuple[float, float]]:
+    """
+    Phát hiện các đoạn lặng (dB RMS < silence_thresh) dài ít nhất min_silence_len ms.
+
+    Returns:
+        Danh sách (start, end) theo giây
+    """
+    db = rms_to_db(frame_rms(audio, frame_length, hop_length))
+    starts, ends = silence_runs(db < silence_thresh)
+    # So sánh độ dài theo giây như vòng lặp cũ để kết quả giống hệt
+    keep = (ends - starts) * hop_length / sr >= min_silence_len / 1000
+    return [(s * hop_length / sr, e * hop_length / sr) for s, e in zip(starts[keep].tolist(), ends[keep].tolist())]
+
+
+class StreamingSilenceDetector:
+    """
+    Phát hiện khoảng lặng trên các block PCM liên tiếp (từ decoder streaming hoặc microphone).
+    Frame không center (frame k phủ mẫu [k*hop, k*hop + frame_length)), phần dư giữa các block được giữ lại;
+    mốc thời gian được quy về tâm frame để khớp với detect_silence trên toàn bộ audio.
+    """
+
+    def __init__(self, sr: int = 16000, silence_thresh: float = -40.0, min_silence_len: int = 1000,
+                 frame_length: int = FRAME_LENGTH, hop_length: int = HOP_LENGTH):
+        self.sr = sr
+        self.silence_thresh = silence_thresh
+        self.min_frames = max(1, int(np.ceil(min_silence_len / 1000 * sr / hop_length - 1e-9)))
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._frames_done = 0
+        self._run_start: Optional[int] = None
+
+    @property
+    def position(self) -> float:
+        """Thời điểm (giây) của frame kế tiếp sẽ được xử lý"""
+        return self._frame_time(self._frames_done)
+
+    def _frame_time(self, frame: int) -> float:
+        return (frame * self.hop_length + self.frame_length // 2) / self.sr
+
+    @property
+    def trailing_silence(self) -> float:
+        """Độ dài (giây) đoạn lặng đang kéo dài tới frame cuối cùng đã xử lý"""
+        if self._run_start is None:
+            return 0.0
+        return (self._frames_done - self._run_start) * self.hop_length / self.sr
+
+    def feed(self, block: np.ndarray) -> List[Tuple[float, float]]:
+        """Đưa thêm một block PCM, trả về các đoạn lặng đã kết thúc trong block này (giây)."""
+        y = np.concatenate((self._tail, np.asarray(block, dtype=np.float32)))
+        if len(y) < self.frame_length:
+            self._tail = y
+            return []
+        rms = frame_rms(y, self.frame_length, self.hop_length, center=False)
+        n = len(rms)
+        consumed = n * self.hop_length
+        self._tail = y[consumed:]
+        silent = rms_to_db(rms) < self.silence_thresh
+        base = self._frames_done
+        starts, ends = silence_runs(silent, 1, include_trailing=True)
+        runs = [[int(s) + base, int(e) + base] for s, e in zip(starts, ends)]
+        # Nối với đoạn lặng còn dở từ block trước
+        if self._run_start is not None:
+            if runs and runs[0][0] == base:
+                runs[0][0] = self._run_start
+            else:
+                runs.insert(0, [self._run_start, base])
+        self._frames_done += n
+        self._run_start = None
+        if runs and runs[-1][1] == self._frames_done:
+            self._run_start = runs.pop()[0]
+        return [(self._frame_time(s), self._frame_time(e)) for s, e in runs if e - s >= self.min_frames]
+
+    def flush(self) -> List[Tuple[float, float]]:
+        """Kết thúc stream: trả về đoạn lặng còn dở nếu đủ dài."""
+        if self._run_start is None:
+            return []
+        start, end = self._run_start, self._frames_done
+        self._run_start = None
+        if end - start < self.min_frames:
+            return []
+        return [(self._frame_time(start), self._frame_time(end))]
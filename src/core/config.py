@@ -1,7 +1,52 @@
-from typing import List
-from pydantic_settings import BaseSettings
+import json
+import logging
+from typing import Any, Dict, List, Tuple, Type
+from pydantic_settings import BaseSettings, PydanticBaseSettingsSource
 from pydantic import AnyHttpUrl, validator
 
+DEFAULT_WHISPER_PROFILE_PATH = "storage/whisper_profile.json"
+
+class WhisperProfileSource(PydanticBaseSettingsSource):
+    """
+    Đọc cấu hình decode do scripts/autotune_whisper.py đo trên máy hiện tại (mục "settings" của file profile).
+    Biến môi trường/.env vẫn được ưu tiên hơn profile. Đường dẫn profile (WHISPER_PROFILE_PATH) cũng lấy theo
+    thứ tự init, biến môi trường, .env rồi mới tới mặc định.
+    """
+
+    def _resolve_path(self, path_sources: Tuple[PydanticBaseSettingsSource, ...]) -> str:
+        field = self.settings_cls.model_fields["WHISPER_PROFILE_PATH"]
+        for source in path_sources:
+            value, _, _ = source.get_field_value(field, "WHISPER_PROFILE_PATH")
+            if value:
+                return value
+        return DEFAULT_WHISPER_PROFILE_PATH
+
+    def _load(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f).get("settings", {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            logging.getLogger(__name__).warning(f"[CONFIG] Không đọc được Whisper profile {path}: {e}")
+            return {}
+
+    def __init__(self, settings_cls: Type[BaseSettings], *path_sources: PydanticBaseSettingsSource):
+        super().__init__(settings_cls)
+        self._values = self._load(self._resolve_path(path_sources))
+
+    def get_field_value(self, field, field_name: str) -> Tuple[Any, str, bool]:
+        # Giá trị đo được cho một field, None nếu profile không có field này
+        return self._values.get(field_name), field_name, False
+
+    def __call__(self) -> Dict[str, Any]:
+        values = {}
+        for field_name, field in self.settings_cls.model_fields.items():
+            value, key, _ = self.get_field_value(field, field_name)
+            if value is not None:
+                values[key] = value
+        return values
+
 class Settings(BaseSettings):
     # Backend
     BACKEND_HOST: str = "0.0.0.0"
@@ -44,6 +89,11 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 100_000_000  # 100MB
     ALLOWED_EXTENSIONS: List[str] = ["wav", "mp3", "m4a", "ogg"]
     AUDIO_STORAGE_ROOT: str = "storage/audio"
+    # Cache PCM 16kHz đã decode (content-addressed theo SHA-256 file), đọc lại qua memmap
+    PCM_CACHE_ENABLED: bool = True
+    PCM_CACHE_DIR: str = "storage/pcm_cache"
+    PCM_CACHE_MAX_BYTES: int = 5_000_000_000  # 5GB
+    PCM_CACHE_DTYPE: str = "float32"  # "float32" (đọc zero-copy) hoặc "int16" (nhỏ gấp đôi)
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -64,10 +114,109 @@ class Settings(BaseSettings):
     METRICS_PORT: int = 9090
 
     # Whisper optimization
-    WHISPER_DEVICE: str = "cuda"  # "cuda" hoặc "cpu"
-    WHISPER_COMPUTE_TYPE: str = "float16"  # "float16" cho GPU, "int8" cho CPU
+    WHISPER_DEVICE: str = "cuda"  # "cuda", "cpu" hoặc "auto" (cuda nếu có GPU)
+    WHISPER_COMPUTE_TYPE: str = "float16"  # compute_type khi chạy GPU
+    WHISPER_CPU_COMPUTE_TYPE: str = "int8"  # compute_type khi chạy CPU
+    WHISPER_CPU_THREADS: int = 0  # luồng intra-op mỗi worker CTranslate2, 0 = tự chia theo core vật lý / concurrency
     WHISPER_BATCH_SIZE: int = 8
     WHISPER_BEAM_SIZE: int = 5
+    # "batched": BatchedInferencePipeline decode các chunk VAD theo batch WHISPER_BATCH_SIZE
+    # "chunked": cắt chunk tại khoảng lặng, decode song song các chunk trên thread pool
+    # "cascade": bản nháp nhanh (model nhỏ int8 hoặc greedy), chỉ decode lại bằng model lớn + beam đầy đủ
+    #            các segment không đạt ngưỡng tin cậy
+    WHISPER_INFERENCE_MODE: str = "batched"
+    WHISPER_NUM_WORKERS: int = 2  # số luồng decode song song của WhisperModel (trên CPU bị giới hạn theo core mỗi slot)
+    WHISPER_MIN_SEGMENT_LENGTH: int = 20  # giây, độ dài tối thiểu của chunk
+    WHISPER_MAX_SEGMENT_LENGTH: int = 30  # giây, độ dài tối đa của chunk
+    WHISPER_OVERLAP: float = 1.0  # giây overlap mỗi phía giữa các chunk liền kề
+    WHISPER_CONTEXT_WINDOW: int = 5  # số từ ở biên chunk dùng để loại từ trùng khi merge
+    WHISPER_CHUNK_MIN_SILENCE_MS: int = 300  # khoảng lặng tối thiểu (ms) để làm điểm cắt chunk
+    # Cascade: để trống WHISPER_DRAFT_MODEL (mặc định) thì bản nháp dùng chính model lớn với greedy (beam_size=1),
+    # không load thêm model; đặt vd "small" để nháp bằng model nhỏ int8 (thêm weights trong RAM/VRAM)
+    WHISPER_DRAFT_MODEL: str = ""
+    WHISPER_DRAFT_COMPUTE_TYPE: str = "int8"
+    WHISPER_CASCADE_LOGPROB_THRESHOLD: float = -0.6  # avg_logprob thấp hơn thì decode lại
+    WHISPER_CASCADE_NO_SPEECH_THRESHOLD: float = 0.5  # no_speech_prob cao hơn thì decode lại
+    # Caption (Whisper translate): "off" | "eager" (sinh cùng lúc transcribe, dùng chung encoder output) | "lazy" (sinh khi được yêu cầu)
+    WHISPER_CAPTION_MODE: str = "eager"
+    # Nén audio trước ASR: cắt vùng không có tiếng nói (im lặng, nhạc chờ), remap timestamp về audio gốc
+    WHISPER_COMPACTION_ENABLED: bool = False
+    WHISPER_COMPACTION_VAD: str = "silero"  # "silero" (VAD của faster-whisper) hoặc "energy" (RMS, nhanh hơn)
+    WHISPER_COMPACTION_MIN_SILENCE_MS: int = 1000  # chỉ cắt khoảng không có tiếng nói dài hơn ngưỡng này
+    WHISPER_COMPACTION_PAD_MS: int = 200  # giữ thêm mỗi phía vùng tiếng nói
+    WHISPER_COMPACTION_GAP_MS: int = 200  # im lặng chèn giữa các vùng sau khi nén
+    # Decode profile mặc định: "fast" | "balanced" | "accurate", có thể chọn theo từng task
+    WHISPER_DECODE_PROFILE: str = "balanced"
+    # Profile phần cứng do scripts/autotune_whisper.py ghi ra; giá trị trong profile ghi đè mặc định ở trên
+    WHISPER_PROFILE_PATH: str = DEFAULT_WHISPER_PROFILE_PATH
+
+    # Triage trước ASR: đo duration/RMS/tỉ lệ tiếng nói, fail sớm file rỗng, route theo độ dài
+    TRIAGE_ENABLED: bool = True
+    TRIAGE_ON_UPLOAD: bool = True  # chạy ngay khi upload (PCM decode được lưu vào PCM cache cho bước ASR)
+    TRIAGE_SILENCE_THRESH: float = -40.0  # dB, frame dưới ngưỡng coi là không có tiếng nói
+    TRIAGE_MIN_DURATION: float = 0.5  # giây
+    TRIAGE_MIN_SPEECH_SECONDS: float = 1.0  # tổng thời lượng tiếng nói tối thiểu
+    TRIAGE_SHORT_MAX_SECONDS: float = 120.0  # file <= ngưỡng này vào queue ngắn
+    TRIAGE_SHORT_QUEUE: str = "asr_short"
+    TRIAGE_LONG_QUEUE: str = "asr_long"
+
+    # Ingest pipelined (POST /audio/ingest): API chỉ decode + cắt chunk, PCM từng chunk được ghi vào thư mục dùng chung
+    # với worker rồi giao cho Celery decode Whisper, process API không load model
+    INGEST_CHUNK_DIR: str = "storage/ingest"
+    INGEST_CHUNK_QUEUE: str = "asr_short"  # chunk dài tối đa WHISPER_MAX_SEGMENT_LENGTH + 2 * WHISPER_OVERLAP giây
+    INGEST_CHUNK_TIMEOUT: float = 600.0  # giây chờ kết quả mỗi chunk sau khi upload xong
+
+    # Batch clip ngắn: gom cửa sổ của nhiều task chạy song song trong worker (threads pool) vào một lời gọi batch.
+    # Chỉ bật khi có task khác chạy cùng process; clip được batch decode trực tiếp theo cửa sổ (timestamp theo cửa sổ),
+    # không qua WHISPER_INFERENCE_MODE / compaction / vad_filter. Task đơn lẻ (prefork) luôn đi pipeline thường
+    SHORT_CLIP_BATCHING: bool = True
+    SHORT_CLIP_MAX_SECONDS: float = 30.0  # clip dài hơn đi pipeline thường
+    SHORT_CLIP_BATCH_SIZE: int = 0  # 0 = WHISPER_BATCH_SIZE
+    SHORT_CLIP_MAX_WAIT_MS: int = 200  # thời gian chờ tối đa để gom đủ batch
+
+    # Prefetch khi xử lý nhiều task: process pool decode trước PCM của các task kế tiếp vào shared memory
+    PREFETCH_DECODE_WORKERS: int = 2
+    PREFETCH_LOOKAHEAD: int = 4  # số buffer PCM (đang decode hoặc chờ inference) tối đa cùng lúc
+
+    # ASR real-time (WebSocket /audio/realtime): decode mỗi câu khi VAD thấy kết thúc câu
+    REALTIME_MODEL: str = ""  # trống = dùng chung WHISPER_MODEL đã load trong process
+    REALTIME_BEAM_SIZE: int = 1
+    REALTIME_SILENCE_THRESH: float = -40.0  # dB
+    REALTIME_ENDPOINT_SILENCE_MS: int = 500  # im lặng bao lâu thì coi là hết câu
+    REALTIME_PARTIAL_INTERVAL_MS: int = 1000  # chu kỳ (theo thời lượng audio) gửi kết quả tạm trong lúc nói
+    REALTIME_MAX_UTTERANCE_SECONDS: float = 15.0  # câu dài hơn thì cắt cứng (tối đa 30s, giới hạn cửa sổ Whisper)
+    REALTIME_PREROLL_MS: int = 300  # giữ lại audio trước điểm bắt đầu nói để không mất âm đầu
+
+    # Ollama (tóm tắt/phân tích ngữ cảnh): client dùng chung với connection pool, timeout và giới hạn song song
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_TIMEOUT: float = 300.0  # giây chờ một lời gọi generate, Ollama treo thì task fail sớm thay vì chờ hết time limit
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0
+    OLLAMA_MAX_RETRIES: int = 2  # thử lại khi lỗi kết nối hoặc HTTP 429/5xx (không thử lại khi timeout)
+    OLLAMA_MAX_CONCURRENCY: int = 2  # số generate đang chạy cùng lúc tối đa mỗi process
+    OLLAMA_MODELS_TTL: float = 60.0  # giây cache danh sách model (/api/tags)
+    # Cache response LLM trên đĩa (SQLite), key = hash(model, prompt, options); tắt hoặc bỏ qua theo từng lời gọi
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "storage/llm_cache.sqlite3"
+    LLM_CACHE_MAX_BYTES: int = 500_000_000  # 500MB
+    # Tóm tắt phân cấp (map-reduce) cho transcript dài hơn một prompt: chunk theo ranh giới câu, tóm tắt song song rồi gộp
+    SUMMARY_MAP_REDUCE_ENABLED: bool = True
+    SUMMARY_NUM_CTX: int = 8192  # num_ctx của các prompt tóm tắt qua Ollama
+    SUMMARY_CHUNK_TOKENS: int = 3000  # transcript dài hơn thì map-reduce, cũng là budget mỗi chunk
+    SUMMARY_CHUNK_SUMMARY_TOKENS: int = 400  # num_predict của bản tóm tắt mỗi chunk
+    SUMMARY_CHARS_PER_TOKEN: float = 3.0  # ước lượng token theo ký tự khi không có tokenizer
+    SUMMARY_MAX_REDUCE_PASSES: int = 4
+
+    # Số slot Celery chạy cùng lúc, 0 = mặc định của Celery (số CPU); dùng để chia core cho Whisper trên CPU
+    WORKER_CONCURRENCY: int = 0
+
+    # Worker warm start: preload + warm-up model trước khi worker nhận task
+    WORKER_PRELOAD_MODELS: bool = True
+    WORKER_PRELOAD_SUMMARIZER_MODEL: str = "google/mt5-base"  # để trống nếu không dùng summarizer local
+    WORKER_WARMUP_SECONDS: float = 2.0
+    WORKER_READY_FILE: str = "/tmp/celery_worker_ready"
+
+    # Model registry: mỗi model chỉ load một lần/process, evict LRU khi vượt budget
+    MODEL_REGISTRY_MAX_BYTES: int = 8_000_000_000  # 8GB, 0 = không giới hạn
 
     @validator("CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v: str | List[str]) -> List[str]:
@@ -77,6 +226,18 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
 
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls: Type[BaseSettings],
+        init_settings: PydanticBaseSettingsSource,
+        env_settings: PydanticBaseSettingsSource,
+        dotenv_settings: PydanticBaseSettingsSource,
+        file_secret_settings: PydanticBaseSettingsSource,
+    ) -> Tuple[PydanticBaseSettingsSource, ...]:
+        profile_settings = WhisperProfileSource(settings_cls, init_settings, env_settings, dotenv_settings)
+        return (init_settings, env_settings, dotenv_settings, profile_settings, file_secret_settings)
+
     class Config:
         case_sensitive = True
         env_file = ".env"
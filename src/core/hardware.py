@@ -0,0 +1,140 @@
+import os
+import json
+import math
+import logging
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Optional
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Concurrency thực tế của Celery worker (ghi nhận ở worker_init), None = chưa biết
+_worker_concurrency: Optional[int] = None
+
+@dataclass
+class ExecutionProfile:
+    """Cấu hình thực thi WhisperModel đã chọn cho máy hiện tại"""
+    device: str
+    compute_type: str
+    cpu_threads: int  # số luồng intra-op mỗi worker CTranslate2, 0 = mặc định của CTranslate2
+    num_workers: int  # số lời gọi transcribe chạy song song trên một model
+    cores: int  # số core vật lý dùng được (đã tính affinity + cgroup quota)
+    concurrency: int  # số slot Celery chạy cùng lúc trên máy
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+@lru_cache(maxsize=1)
+def physical_cores() -> int:
+    """Số core vật lý theo /proc/cpuinfo (bỏ qua hyper-thread), fallback os.cpu_count()."""
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":")[1].strip()
+                elif line.startswith("core id"):
+                    core_id = line.split(":")[1].strip()
+                elif not line.strip():
+                    if core_id is not None:
+                        cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+def _cgroup_cpu_limit() -> Optional[int]:
+    """Giới hạn CPU của container theo cgroup v2 (cpu.max) hoặc v1 (cfs_quota_us), None nếu không giới hạn."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", encoding="utf-8") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", encoding="utf-8") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+    return None
+
+def usable_cores() -> int:
+    """Số core vật lý process được phép dùng: min(core vật lý, CPU affinity, cgroup quota)."""
+    cores = physical_cores()
+    if hasattr(os, "sched_getaffinity"):
+        cores = min(cores, len(os.sched_getaffinity(0)))
+    limit = _cgroup_cpu_limit()
+    if limit:
+        cores = min(cores, limit)
+    return max(1, cores)
+
+def cuda_available() -> bool:
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
+
+def set_worker_concurrency(concurrency: Optional[int]):
+    """Ghi nhận concurrency của Celery worker (gọi trong process cha, child prefork kế thừa giá trị)."""
+    global _worker_concurrency
+    _worker_concurrency = int(concurrency) if concurrency else None
+
+def worker_concurrency() -> int:
+    if _worker_concurrency:
+        return _worker_concurrency
+    # Mặc định của Celery prefork: một slot cho mỗi CPU logic
+    return settings.WORKER_CONCURRENCY or os.cpu_count() or 1
+
+def resolve_device(device: Optional[str] = None) -> str:
+    device = device or settings.WHISPER_DEVICE
+    if device == "auto":
+        return "cuda" if cuda_available() else "cpu"
+    if device == "cuda" and not cuda_available():
+        logger.warning("[HARDWARE] WHISPER_DEVICE=cuda nhưng không tìm thấy GPU, chuyển sang CPU")
+        return "cpu"
+    return device
+
+def resolve_execution_profile(device: Optional[str] = None) -> ExecutionProfile:
+    """
+    Chọn device, compute_type, cpu_threads và num_workers cho WhisperModel.
+    Trên CPU: chia đều core vật lý cho các slot Celery, mỗi slot chạy num_workers lời gọi song song
+    với cpu_threads luồng, sao cho num_workers * cpu_threads * concurrency <= số core (không oversubscribe).
+    """
+    device = resolve_device(device)
+    cores = usable_cores()
+    concurrency = worker_concurrency()
+    if device != "cpu":
+        return ExecutionProfile(device, settings.WHISPER_COMPUTE_TYPE, settings.WHISPER_CPU_THREADS,
+                                max(1, settings.WHISPER_NUM_WORKERS), cores, concurrency)
+    cores_per_slot = max(1, cores // concurrency)
+    num_workers = max(1, min(settings.WHISPER_NUM_WORKERS, cores_per_slot))
+    cpu_threads = settings.WHISPER_CPU_THREADS or max(1, cores_per_slot // num_workers)
+    return ExecutionProfile("cpu", settings.WHISPER_CPU_COMPUTE_TYPE, cpu_threads, num_workers, cores, concurrency)
+
+def tuned_profile_summary() -> Optional[dict]:
+    """Tóm tắt profile autotune đang dùng (thời điểm đo, RTF, cấu hình), None nếu chưa chạy autotune."""
+    try:
+        with open(settings.WHISPER_PROFILE_PATH, encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {
+        "path": settings.WHISPER_PROFILE_PATH,
+        "created_at": profile.get("created_at"),
+        "hardware": profile.get("hardware"),
+        "rtf": profile.get("rtf"),
+        "settings": profile.get("settings"),
+    }
@@ -0,0 +1,154 @@
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _RegistryEntry:
+    """Một model đã load, kèm kích thước ước lượng (bytes) để tính budget"""
+    value: Any
+    size_bytes: int
+    hits: int = 0
+
+
+def estimate_path_size(path: str) -> int:
+    """Ước lượng dung lượng model theo tổng kích thước file trên đĩa (bytes)."""
+    if not path or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ModelRegistry:
+    """
+    Registry dùng chung trong process: mỗi model (theo key model/device/compute_type)
+    chỉ load một lần, các lần sau trả về instance đã cache.
+    Khi tổng dung lượng vượt max_bytes thì evict theo LRU.
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        """
+        Args:
+            max_bytes: Memory budget cho toàn bộ model (bytes). 0 = không giới hạn.
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, _RegistryEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any], size_bytes: Optional[int] = None) -> Any:
+        """
+        Trả về model đã cache theo key, nếu chưa có thì gọi loader() để load.
+
+        Args:
+            key: Khóa định danh model, ví dụ (model, device, compute_type)
+            loader: Hàm không tham số trả về model đã load
+            size_bytes: Dung lượng ước lượng của model, dùng cho LRU budget
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self.hits += 1
+                logger.debug(f"[MODEL_REGISTRY] Hit {key} | hits={self.hits}")
+                return entry.value
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # Chỉ một thread load model cho mỗi key, các thread khác chờ rồi dùng lại kết quả
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry.value
+            logger.info(f"[MODEL_REGISTRY] Loading {key}")
+            value = loader()
+            with self._lock:
+                self._entries[key] = _RegistryEntry(value=value, size_bytes=int(size_bytes or 0))
+                self.loads += 1
+                self._evict_over_budget(keep=key)
+                self._load_locks.pop(key, None)
+                logger.info(f"[MODEL_REGISTRY] Loaded {key} | loads={self.loads} | total_bytes={self.total_bytes}")
+            return value
+
+    def peek(self, key: Hashable) -> Any:
+        """Trả về model nếu đã load, không load mới, không tính hit"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def evict(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.evictions += 1
+        logger.info(f"[MODEL_REGISTRY] Evicted {key}")
+        del entry
+        gc.collect()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        gc.collect()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(e.size_bytes for e in self._entries.values())
+
+    def _evict_over_budget(self, keep: Hashable):
+        if not self.max_bytes:
+            return
+        evicted = False
+        while self.total_bytes > self.max_bytes:
+            oldest = next((k for k in self._entries if k != keep), None)
+            if oldest is None:
+                logger.warning(f"[MODEL_REGISTRY] Model {keep} vượt memory budget ({self.max_bytes} bytes) nhưng vẫn được giữ lại")
+                break
+            self._entries.pop(oldest)
+            self.evictions += 1
+            evicted = True
+            logger.info(f"[MODEL_REGISTRY] LRU evicted {oldest} | budget={self.max_bytes}")
+        if evicted:
+            gc.collect()
+
+    def stats(self) -> dict:
+        """Thống kê số lần load/hit/evict và các model đang giữ trong registry"""
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "total_bytes": sum(e.size_bytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "models": [
+                    {"key": [str(k) for k in key] if isinstance(key, tuple) else str(key), "size_bytes": e.size_bytes, "hits": e.hits}
+                    for key, e in self._entries.items()
+                ],
+            }
+
+
+model_registry = ModelRegistry(max_bytes=settings.MODEL_REGISTRY_MAX_BYTES)
@@ -1,6 +1,8 @@
 import os
+import time
 import shutil
 import json
+from typing import Iterator
 from fastapi import UploadFile, HTTPException
 from pathlib import Path
 from src.core.logging import logger
@@ -8,58 +10,145 @@ from src.database.models.models import AudioFile
 from src.services.task_service import create_task, update_task, get_task
 from src.speech_to_text.transcriber import Transcriber, OllamaProcessor
 from src.audio_processing.processor import AudioProcessor
+from src.audio_processing.triage import TriageResult, triage_audio
+from src.services.llm_client import ollama_client, OllamaError
+from src.summarization.map_reduce import condense_transcript
+from src.core.config import settings
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".ogg")
+
+def audio_storage_path_for(filename: str) -> Path:
+    """
+    Đường dẫn lưu file upload trong storage/audio (kiểm tra định dạng, tạo thư mục nếu chưa có).
+    filename chỉ được là tên file: có dấu phân cách thư mục hoặc ".." thì từ chối (chống path traversal).
+    """
+    if not filename or not filename.lower().endswith(AUDIO_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Invalid or missing file format")
+    if any(c in filename for c in ("/", "\\", "\x00")) or Path(filename).name != filename:
+        raise HTTPException(status_code=400, detail="Tên file không hợp lệ")
+    audio_storage_dir = Path("storage/audio")
+    audio_storage_dir.mkdir(parents=True, exist_ok=True)
+    return audio_storage_dir / filename
+
+def create_audio_task(filename: str, file_path, db, case_id: int = None):
+    """Tạo Task và AudioFile (status: pending) cho file đã ghi xong trên storage. Trả về (task, audio_file)."""
+    if case_id is not None and not isinstance(case_id, int):
+        try:
+            case_id = int(case_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="case_id phải là số nguyên")
+    task = create_task(filename, case_id=case_id, db=db)
+    if not task:
+        raise HTTPException(status_code=400, detail="Case ID không tồn tại hoặc không thể tạo task")
+    audio_file = AudioFile(
+        filename=filename,
+        case_id=case_id,
+        task_id=task["id"],
+        file_path=str(file_path),
+        status="pending",
+        language_id=1,
+        uploaded_by=1,
+        file_size=os.path.getsize(file_path),
+        duration=None,
+        audio_status_id=None,
+        processed_at=None,
+        error_message=None,
+        updated_at=None,
+        is_archived=False,
+        archive_reason=None,
+        storage_type='local',
+        storage_config='{}',
+        extra_metadata='{}'
+    )
+    db.add(audio_file)
+    db.commit()
+    db.refresh(audio_file)
+    logger.info(f"[AUDIO_SERVICE] Đã lưu file: {filename} | task_id={task['id']} | audio_file_id={audio_file.id}")
+    return task, audio_file
 
 def save_audio_and_create_task(file: UploadFile, db, case_id: int = None) -> dict:
     """Lưu file audio vào storage/audio, tạo AudioFile và Task (status: pending). Trả về task_id, audio_file_id."""
     logger.info(f"[AUDIO_SERVICE] Bắt đầu lưu file: {file.filename if file else 'None'} | case_id={case_id}")
     try:
-        if not file.filename or not file.filename.lower().endswith((".mp3", ".wav", ".m4a", ".ogg")):
-            raise HTTPException(status_code=400, detail="Invalid or missing file format")
-        audio_storage_dir = Path("storage/audio")
-        audio_storage_dir.mkdir(parents=True, exist_ok=True)
-        audio_storage_path = audio_storage_dir / file.filename
+        audio_storage_path = audio_storage_path_for(file.filename)
         with open(audio_storage_path, "wb") as out_file:
             shutil.copyfileobj(file.file, out_file)
-        if case_id is not None and not isinstance(case_id, int):
+        task, audio_file = create_audio_task(file.filename, audio_storage_path, db, case_id=case_id)
+        status = "pending"
+        triage = None
+        if settings.TRIAGE_ENABLED and settings.TRIAGE_ON_UPLOAD:
             try:
-                case_id = int(case_id)
-            except Exception:
-                raise HTTPException(status_code=400, detail="case_id phải là số nguyên")
-        task = create_task(file.filename, case_id=case_id, db=db)
-        if not task:
-            raise HTTPException(status_code=400, detail="Case ID không tồn tại hoặc không thể tạo task")
-        audio_file = AudioFile(
-            filename=file.filename,
-            case_id=case_id,
-            task_id=task["id"],
-            file_path=str(audio_storage_path),
-            status="pending",
-            language_id=1,
-            uploaded_by=1,
-            file_size=os.path.getsize(audio_storage_path),
-            duration=None,
-            audio_status_id=None,
-            processed_at=None,
-            error_message=None,
-            updated_at=None,
-            is_archived=False,
-            archive_reason=None,
-            storage_type='local',
-            storage_config='{}',
-            extra_metadata='{}'
-        )
-        db.add(audio_file)
-        db.commit()
-        db.refresh(audio_file)
-        logger.info(f"[AUDIO_SERVICE] Đã lưu file: {file.filename if file else 'None'} | task_id={task['id']} | audio_file_id={audio_file.id}")
-        return {"task_id": task["id"], "audio_file_id": audio_file.id, "status": "pending"}
+                triage = run_triage(audio_file, db)
+            except Exception as e:
+                # Không decode được lúc upload: để process_task xử lý/báo lỗi
+                logger.warning(f"[TRIAGE] Không triage được khi upload {file.filename}: {e}")
+            if triage and triage.is_empty:
+                update_task(task["id"], {"status": "failed", "error": triage.reason})
+                status = "failed"
+        return {"task_id": task["id"], "audio_file_id": audio_file.id, "status": status,
+                "triage": triage.as_dict() if triage else None}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving audio and creating task: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-def process_task(task_id: str, model_name: str, db) -> dict:
-    """Xử lý task: transcribe, summarize, update DB. Trả về kết quả gọn."""
-    logger.info(f"[AUDIO_SERVICE] Bắt đầu process_task | task_id={task_id} | model_name={model_name}")
+def _audio_metadata(audio_file) -> dict:
+    meta = audio_file.extra_metadata
+    if isinstance(meta, str):
+        try:
+            meta = json.loads(meta or "{}")
+        except ValueError:
+            meta = {}
+    return dict(meta) if isinstance(meta, dict) else {}
+
+def run_triage(audio_file, db, audio=None, sr: int = 16000) -> TriageResult:
+    """
+    Triage trước ASR: tính duration, RMS, tỉ lệ tiếng nói và queue, lưu vào audio_files
+    (duration + extra_metadata["triage"]). File rỗng được đánh dấu failed ngay.
+    """
+    if audio is None:
+        audio, sr = AudioProcessor().load_audio(audio_file.file_path)
+    triage = triage_audio(audio, sr)
+    audio_file.duration = triage.duration
+    meta = _audio_metadata(audio_file)
+    meta["triage"] = triage.as_dict()
+    audio_file.extra_metadata = meta
+    if triage.is_empty:
+        audio_file.status = "failed"
+        audio_file.error_message = triage.reason
+    db.commit()
+    logger.info(f"[TRIAGE] {audio_file.filename} | {triage.as_dict()}")
+    return triage
+
+def get_stored_triage(audio_file) -> dict:
+    return _audio_metadata(audio_file).get("triage") or {}
+
+def get_task_triage(task_id: str, db) -> dict:
+    """Kết quả triage đã lưu của task ({} nếu chưa triage), dùng để chọn queue Celery."""
+    audio_file = db.query(AudioFile).filter(AudioFile.task_id == task_id).first()
+    if not audio_file:
+        return {}
+    return get_stored_triage(audio_file)
+
+def process_task(task_id: str, model_name: str, db, caption_mode: str = None, decode_profile: str = None,
+                 segments: list = None, audio=None, sr: int = 16000, caption: str = None) -> dict:
+    """Xử lý task: transcribe, summarize, update DB. Trả về kết quả gọn.
+    caption_mode: "off" | "eager" | "lazy" (mặc định theo decode profile / WHISPER_CAPTION_MODE).
+    decode_profile: "fast" | "balanced" | "accurate" (mặc định WHISPER_DECODE_PROFILE).
+    segments: transcript đã decode trong lúc upload (ingest pipelined), có thì bỏ qua bước ASR.
+    caption: caption decode cùng segments lúc ingest (eager), None = chưa có.
+    audio, sr: PCM đã decode sẵn (prefetch), None = decode từ file."""
+    if not settings.SHORT_CLIP_BATCHING:
+        return _process_task(task_id, model_name, db, caption_mode, decode_profile, segments, audio, sr, caption)
+    from src.worker.batching import short_clip_task
+    # Batcher clip ngắn chỉ chờ gom batch khi còn task khác đang chạy trong process
+    with short_clip_task():
+        return _process_task(task_id, model_name, db, caption_mode, decode_profile, segments, audio, sr, caption)
+
+def _process_task(task_id: str, model_name: str, db, caption_mode: str = None, decode_profile: str = None,
+                  segments: list = None, audio=None, sr: int = 16000, caption: str = None) -> dict:
+    logger.info(f"[AUDIO_SERVICE] Bắt đầu process_task | task_id={task_id} | model_name={model_name} | caption_mode={caption_mode} | decode_profile={decode_profile} | precomputed_segments={segments is not None}")
     try:
         task = get_task(task_id)
         if not task:
@@ -67,15 +156,41 @@ def process_task(task_id: str, model_name: str, db) -> dict:
         audio_file = db.query(AudioFile).filter(AudioFile.task_id == task_id).first()
         if not audio_file:
             raise HTTPException(status_code=404, detail="Audio file not found")
+        # Decode file một lần, PCM được truyền qua tất cả các bước phía sau
         audio_processor = AudioProcessor()
-        audio, sr = audio_processor.load_audio(audio_file.file_path)
+        if audio is None:
+            audio, sr = audio_processor.load_audio(audio_file.file_path)
+        triage = None
+        if settings.TRIAGE_ENABLED:
+            # Dùng lại kết quả triage lúc upload nếu có, file rỗng thì dừng trước khi load Whisper/gọi Ollama
+            triage = get_stored_triage(audio_file) or run_triage(audio_file, db, audio, sr).as_dict()
+            if triage.get("is_empty"):
+                logger.warning(f"[AUDIO_SERVICE] Triage: bỏ qua ASR | task_id={task_id} | {triage.get('reason')}")
+                update_task(task_id, {"status": "failed", "error": triage.get("reason")})
+                audio_file.status = "failed"
+                db.commit()
+                return {"status": "failed", "error": triage.get("reason"), "triage": triage}
         # Tự động enhance nếu phát hiện nhiễu (placeholder)
         # if audio_processor.normalize_audio(audio).std() < 0.01:  # Giả lập phát hiện nhiễu
         audio = audio_processor.enhance_speech_llase(audio)
         # Có thể thêm các bước robust khác ở đây
-        # Sửa: chỉ khởi tạo Transcriber không truyền tham số
+        # Transcriber lấy WhisperModel từ model registry, không load lại weights mỗi task
         transcriber = Transcriber()
-        result = transcriber.transcribe(audio_file.file_path)
+        batched_caption = caption
+        if settings.SHORT_CLIP_BATCHING:
+            from src.worker.batching import release_short_clip_task, short_clip_concurrent, transcribe_short_clip
+            # Clip ngắn: decode chung một batch với clip của các task khác đang chạy trong worker. Task đơn lẻ
+            # (prefork) không có gì để gom nên đi pipeline thường, giữ timestamp theo segment
+            if segments is None and len(audio) / sr <= settings.SHORT_CLIP_MAX_SECONDS and short_clip_concurrent():
+                profile = transcriber.set_decode_profile(decode_profile)
+                with_caption = (caption_mode or profile.caption_mode or transcriber.caption_mode) == "eager"
+                segments, batched_caption = transcribe_short_clip(transcriber, audio, sr, with_caption=with_caption)
+            # Task không gửi thêm clip nào nữa, batcher không cần chờ nó
+            release_short_clip_task()
+        result = transcriber.transcribe_pcm(audio, sr, source=audio_file.file_path, caption_mode=caption_mode,
+                                            decode_profile=decode_profile, precomputed_segments=segments,
+                                            precomputed_caption=batched_caption, triage=triage)
+        del audio
         logger.info(f"[AUDIO_SERVICE] Kết quả transcribe | task_id={task_id} | result={result}")
         # Benchmark tự động (placeholder)
         wer, cer, noise_score = benchmark_asr(result.get("transcription"), audio_file.file_path)
@@ -105,10 +220,16 @@ def process_task(task_id: str, model_name: str, db) -> dict:
                 "duration": result.get("duration"),
                 "transcription": transcript,
                 "caption": caption,
+                "caption_mode": result.get("caption_mode"),
+                # eager đã sinh caption (kể cả rỗng khi không có tiếng nói); lazy để generate_task_caption sinh sau
+                "caption_generated": result.get("caption_mode") == "eager",
                 "summary": summary,
                 "language": result.get("language"),
                 "confidence": result.get("confidence"),
                 "processing_time": result.get("processing_time"),
+                "decode_profile": result.get("decode_profile"),
+                "cascade": result.get("cascade"),
+                "compaction": result.get("compaction"),
                 "context_analysis": context_analysis,
                 "audio_url": f"/storage/audio/{audio_file.filename}"
             }
@@ -150,19 +271,140 @@ def process_task(task_id: str, model_name: str, db) -> dict:
             f.write(f"Task {task_id} error: {str(e)}\n")
         return {"status": "failed", "error": str(e)}
 
-def summarize_transcript(transcript: str, context: dict = None, model_name: str = "gemma2:9b", user_context_prompt: str = None, max_length: int = 150, min_length: int = 50) -> str:
+def process_task_batch(task_ids: list, model_name: str, db, caption_mode: str = None, decode_profile: str = None,
+                       max_workers: int = None) -> dict:
+    """
+    Xử lý nhiều task theo kiểu producer/consumer: process pool decode trước PCM của các task kế tiếp vào
+    shared memory (AudioPrefetcher) trong lúc các task trước đang inference/gọi LLM, task nào cũng nhận
+    buffer đã sẵn sàng thay vì tự decode. Trả về {task_id: kết quả process_task}.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy.orm import sessionmaker
+    from src.worker.prefetch import AudioPrefetcher
+    paths = dict(db.query(AudioFile.task_id, AudioFile.file_path).filter(AudioFile.task_id.in_(task_ids)).all())
+    # Session SQLAlchemy không thread-safe: mỗi task mở session riêng trên cùng engine với db
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+    def run(task_id):
+        prefetched = None
+        if task_id in paths:
+            try:
+                prefetched = prefetcher.take(task_id)
+            except Exception as e:
+                logger.warning(f"[AUDIO_SERVICE] Prefetch lỗi, decode lại trong task | task_id={task_id}: {e}")
+        task_db = session_factory()
+        try:
+            return process_task(task_id, model_name, task_db, caption_mode=caption_mode, decode_profile=decode_profile,
+                                audio=prefetched.audio if prefetched else None)
+        finally:
+            task_db.close()
+            if prefetched:
+                prefetched.release()
+
+    t0 = time.time()
+    results = {}
+    with AudioPrefetcher() as prefetcher:
+        prefetcher.schedule([(tid, paths[tid]) for tid in task_ids if tid in paths])
+        # Nhiều task chạy song song để clip ngắn được gom batch và bước LLM của task này chồng lên ASR của task khác
+        with ThreadPoolExecutor(max_workers=max(1, max_workers or len(task_ids))) as executor:
+            futures = {tid: executor.submit(run, tid) for tid in task_ids}
+            for tid, future in futures.items():
+                try:
+                    results[tid] = future.result()
+                except Exception as e:
+                    results[tid] = {"status": "failed", "error": str(e)}
+    logger.info(f"[AUDIO_SERVICE] process_task_batch | tasks={len(task_ids)} | time={time.time() - t0:.2f}s")
+    return results
+
+def generate_task_caption(task_id: str, db) -> dict:
+    """
+    Sinh caption cho task theo yêu cầu (caption_mode='lazy'), lưu vào result. Caption đã sinh (caption_generated,
+    kể cả rỗng) thì trả về luôn; task chạy với caption_mode='off' thì không sinh.
+    """
+    task = get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    result = task.get("result") or {}
+    if result.get("caption_generated") or result.get("caption"):
+        return {"task_id": task_id, "caption": result.get("caption") or ""}
+    if result.get("caption_mode") == "off":
+        logger.info(f"[AUDIO_SERVICE] Task chạy với caption_mode=off, không sinh caption | task_id={task_id}")
+        return {"task_id": task_id, "caption": ""}
+    audio_file = db.query(AudioFile).filter(AudioFile.task_id == task_id).first()
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    audio, sr = AudioProcessor().load_audio(audio_file.file_path)
+    # Sinh caption với cùng decode profile đã dùng khi transcribe task
+    caption = Transcriber().generate_caption(audio, sr, decode_profile=result.get("decode_profile"))
+    result["caption"] = caption
+    result["caption_generated"] = True
+    update_task(task_id, {"result": result})
+    logger.info(f"[AUDIO_SERVICE] Đã sinh caption (lazy) | task_id={task_id} | caption_len={len(caption)}")
+    return {"task_id": task_id, "caption": caption}
+
+def stream_task_transcript(task_id: str, db, decode_profile: str = None) -> Iterator[dict]:
+    """
+    Transcribe file của task và yield event ngay khi có từng segment: "info" (độ dài), "segment", rồi "done"
+    (hoặc "failed" nếu triage thấy file rỗng). Chỉ đọc, không cập nhật task; pipeline đầy đủ vẫn chạy qua Celery.
+    """
+    audio_file = db.query(AudioFile).filter(AudioFile.task_id == task_id).first()
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    t0 = time.time()
+    audio, sr = AudioProcessor().load_audio(audio_file.file_path)
+    if settings.TRIAGE_ENABLED:
+        triage = get_stored_triage(audio_file) or triage_audio(audio, sr).as_dict()
+        if triage.get("is_empty"):
+            yield {"event": "failed", "data": {"task_id": task_id, "error": triage.get("reason")}}
+            return
+    yield {"event": "info", "data": {"task_id": task_id, "duration": round(len(audio) / sr, 2)}}
+    texts = []
+    first_segment_at = None
+    for segment in Transcriber().transcribe_stream(audio, sr, decode_profile=decode_profile):
+        if first_segment_at is None:
+            first_segment_at = time.time() - t0
+        texts.append(segment["text"])
+        yield {"event": "segment", "data": segment}
+    elapsed = time.time() - t0
+    logger.info(f"[STREAM] task_id={task_id} | segments={len(texts)} | first_segment={first_segment_at}s | total={elapsed:.2f}s")
+    yield {"event": "done", "data": {"task_id": task_id, "text": " ".join(texts), "segments": len(texts),
+                                     "first_segment_seconds": round(first_segment_at, 2) if first_segment_at is not None else None,
+                                     "processing_time": round(elapsed, 2)}}
+
+# Tham số sinh cho các prompt tóm tắt qua Ollama
+SUMMARY_OPTIONS = {"temperature": 0.3, "top_p": 0.9, "top_k": 40, "num_ctx": settings.SUMMARY_NUM_CTX}
+
+def _resolve_context(text: str, context: dict, use_cache: bool = True) -> dict:
+    """context_analysis truyền vào, nếu chưa có thì phân tích bằng Ollama."""
+    if context is None:
+        context = OllamaProcessor(model_name="gemma2:9b").analyze_context(text, use_cache=use_cache)
+    return context if context is not None else {}
+
+def _conversation_material(text: str, model: str, use_cache: bool = True) -> str:
+    """Nội dung hội thoại đưa vào prompt: nguyên văn, hoặc ghi chú map-reduce nếu transcript dài hơn một prompt."""
+    notes = condense_transcript(text, model, use_cache=use_cache)
+    if notes is text:
+        return f"Nội dung hội thoại: {text}"
+    return f"Ghi chú theo trình tự của hội thoại (hội thoại dài, đã tóm tắt theo từng phần): {notes}"
+
+def summarize_transcript(transcript: str, context: dict = None, model_name: str = "gemma2:9b", user_context_prompt: str = None, max_length: int = 150, min_length: int = 50, use_cache: bool = True) -> str:
     if not transcript:
         return "Không có tóm tắt."
-    if context is None:
-        context = OllamaProcessor(model_name="gemma2:9b").analyze_context(transcript)
-    if context is None:
-        context = {}
     if model_name.startswith("ollama:"):
         model = model_name.split(":", 1)[1]
     else:
         model = model_name
     user_prompt = (user_context_prompt + "\n") if user_context_prompt else ""
     if model in ["gemma2:9b", "deepseek-r1:7b", "mistral:7b-instruct", "llama3.2:3b"]:
+        material = _conversation_material(transcript, model, use_cache)
+        main_prompt = (
+            user_prompt +
+            "Hãy tóm tắt tổng quan hội thoại dưới đây trong 5-6 dòng, nêu rõ bối cảnh, mục đích, các bên tham gia, diễn biến chính, kết quả, cảm xúc tổng thể. Không liệt kê chi tiết, chỉ trình bày tổng quan sâu sắc.\n"
+            + material
+        )
+        # Tóm tắt tổng quan chỉ cần transcript: gửi trước, chạy song song với phân tích ngữ cảnh và tóm tắt chi tiết
+        main_future = ollama_client.submit(model, main_prompt, options={**SUMMARY_OPTIONS, "max_tokens": 120}, use_cache=use_cache)
+        context = _resolve_context(transcript, context, use_cache)
         prompt = (
             user_prompt +
             """
@@ -198,59 +440,25 @@ Nếu có context_analysis, hãy ưu tiên sử dụng để làm rõ tóm tắt
             prompt += f"\nThực thể: {json.dumps(context['entities'], ensure_ascii=False)}"
         if context and 'privacy_summary' in context:
             prompt += f"\nThông tin nhạy cảm: {context['privacy_summary']}"
-        prompt += f"\nNội dung hội thoại: {transcript}"
-        import requests
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "top_k": 40,
-                    "num_ctx": 4096,
-                    "max_tokens": max_length
-                }
-            }
-        )
-        if response.status_code == 200:
-            result = response.json()
-            deep_summary = result.get("response", "Không có tóm tắt.")
-        else:
+        prompt += f"\n{material}"
+        try:
+            deep_summary = ollama_client.generate(model, prompt, options={**SUMMARY_OPTIONS, "max_tokens": max_length}, use_cache=use_cache) or "Không có tóm tắt."
+        except OllamaError as e:
+            logger.error(f"[SUMMARY] Ollama lỗi khi tóm tắt chi tiết: {e}")
             deep_summary = "Không thể tóm tắt (Ollama lỗi)."
-        main_prompt = (
-            user_prompt +
-            "Hãy tóm tắt tổng quan hội thoại dưới đây trong 5-6 dòng, nêu rõ bối cảnh, mục đích, các bên tham gia, diễn biến chính, kết quả, cảm xúc tổng thể. Không liệt kê chi tiết, chỉ trình bày tổng quan sâu sắc.\n"
-            f"Nội dung hội thoại: {transcript}"
-        )
-        response_main = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": model,
-                "prompt": main_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "top_k": 40,
-                    "num_ctx": 4096,
-                    "max_tokens": 120
-                }
-            }
-        )
-        if response_main.status_code == 200:
-            main_summary = response_main.json().get("response", "")
-        else:
+        try:
+            main_summary = main_future.result()
+        except OllamaError as e:
+            logger.error(f"[SUMMARY] Ollama lỗi khi tóm tắt tổng quan: {e}")
             main_summary = ""
         if main_summary:
             return f"Nội dung tổng quan: {main_summary.strip()}\n\n{deep_summary.strip()}"
         else:
             return deep_summary.strip()
     else:
-        from src.summarization.summarizer import Summarizer
-        summarizer = Summarizer(model_name=model)
+        context = _resolve_context(transcript, context, use_cache)
+        from src.summarization.summarizer import get_summarizer
+        summarizer = get_summarizer(model_name=model)
         if context:
             prompt = (
                 user_prompt +
@@ -279,13 +487,10 @@ Nếu có context_analysis, hãy ưu tiên sử dụng để làm rõ tóm tắt
         else:
             return deep_summary.strip()
 
-def summarize_multi_transcripts(transcripts: list[str], context: dict = None, model_name: str = "gemma2:9b") -> str:
+def summarize_multi_transcripts(transcripts: list[str], context: dict = None, model_name: str = "gemma2:9b", use_cache: bool = True) -> str:
     if not transcripts:
         return "Không có transcript nào để tóm tắt."
-    if context is None and transcripts:
-        context = OllamaProcessor(model_name="gemma2:9b").analyze_context('\n'.join(transcripts))
-    if context is None:
-        context = {}
+    context = _resolve_context('\n'.join(transcripts), context, use_cache)
     if model_name.startswith("ollama:"):
         model = model_name.split(":", 1)[1]
     else:
@@ -301,28 +506,14 @@ def summarize_multi_transcripts(transcripts: list[str], context: dict = None, mo
             prompt += f"\nThực thể: {json.dumps(context['entities'], ensure_ascii=False)}"
         if 'privacy_summary' in context:
             prompt += f"\nThông tin nhạy cảm: {context['privacy_summary']}"
-        prompt += f"\nNội dung hội thoại: {joined}"
-        import requests
+        prompt += f"\n{_conversation_material(joined, model, use_cache)}"
         try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {"temperature": 0.3, "top_p": 0.9, "top_k": 40, "num_ctx": 4096}
-                }
-            )
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("response", "")
-            else:
-                return f"[Ollama error {response.status_code}]"
-        except Exception as e:
+            return ollama_client.generate(model, prompt, options=SUMMARY_OPTIONS, use_cache=use_cache)
+        except OllamaError as e:
             return f"[Ollama error: {e}]"
     else:
-        from src.summarization.summarizer import Summarizer
-        summarizer = Summarizer(model_name=model_name)
+        from src.summarization.summarizer import get_summarizer
+        summarizer = get_summarizer(model_name=model_name)
         return summarizer.summarize(joined, context=context)
 
 def benchmark_asr(transcription: str, audio_path: str):
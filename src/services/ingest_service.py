@@ -0,0 +1,246 @@
+import time
+import uuid
+import shutil
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import List, Optional, Tuple
+from src.core.logging import logger
+from src.core.config import settings
+from src.audio_processing.chunking import plan_chunks, merge_chunk_segments
+from src.audio_processing.decoder import PipeDecoder
+from src.audio_processing.pcm_cache import pcm_cache
+from src.audio_processing.vad import StreamingSilenceDetector
+from src.services.audio_service import audio_storage_path_for, create_audio_task, run_triage
+from src.services.task_service import update_task
+from src.speech_to_text.decode_profiles import get_decode_profile
+from src.worker.worker import celery_app
+from src.worker.tasks import transcribe_chunk_async
+
+class IngestSession:
+    """
+    Ingest pipelined cho một upload: byte nhận được vừa ghi ra storage/audio vừa đưa vào ffmpeg pipe (PipeDecoder).
+    VAD streaming tìm khoảng lặng trên PCM tăng dần; chunk nào đã nhận đủ max_segment_length + overlap giây
+    thì được cắt (cùng quy tắc plan_chunks với _segment_audio), ghi PCM ra INGEST_CHUNK_DIR và giao cho Celery worker
+    decode ngay (transcribe_chunk_async), không chờ hết upload. Process API không load Whisper.
+    Khi byte cuối tới chỉ còn phần đuôi (tối đa một chunk) phải decode rồi merge vùng overlap.
+    """
+
+    def __init__(self, filename: str, db, case_id: int = None, decode_profile: Optional[str] = None, sr: int = 16000,
+                 caption_mode: Optional[str] = None):
+        self.filename = filename
+        self.db = db
+        self.case_id = case_id
+        self.sr = sr
+        self.path = audio_storage_path_for(filename)
+        self.profile = get_decode_profile(decode_profile)
+        # Eager: worker decode caption của mỗi chunk trên cùng encoder output với transcript
+        self.with_caption = (caption_mode or self.profile.caption_mode or settings.WHISPER_CAPTION_MODE) == "eager"
+        # Cùng tham số cắt chunk với Transcriber._segment_audio
+        self.min_segment_length = settings.WHISPER_MIN_SEGMENT_LENGTH or 10
+        self.max_segment_length = settings.WHISPER_MAX_SEGMENT_LENGTH or 30
+        self.overlap = settings.WHISPER_OVERLAP or 0.5
+        self.context_window = settings.WHISPER_CONTEXT_WINDOW or 5
+        self.chunk_min_silence_len = settings.WHISPER_CHUNK_MIN_SILENCE_MS
+        self.pipe_error: Optional[str] = None
+        self.started_at = time.time()
+        self._file = open(self.path, "wb")
+        self._sha256 = hashlib.sha256()
+        self._bytes = 0
+        # PCM đã decode, cấp phát gấp đôi khi đầy
+        self._buf = np.zeros(60 * sr, dtype=np.float32)
+        self._samples = 0
+        self._vad = StreamingSilenceDetector(sr, silence_thresh=getattr(settings, 'WHISPER_SILENCE_THRESH', None) or -40.0,
+                                             min_silence_len=self.chunk_min_silence_len)
+        self._silences: List[Tuple[float, float]] = []
+        self._next_start = 0.0  # đầu vùng core của chunk kế tiếp (giây)
+        # Thư mục PCM các chunk của upload này, dùng chung với worker (cùng volume storage)
+        self._chunk_dir = Path(settings.INGEST_CHUNK_DIR) / uuid.uuid4().hex
+        self._chunk_dir.mkdir(parents=True, exist_ok=True)
+        self._futures = []
+        try:
+            self._decoder = PipeDecoder(self._on_block, sample_rate=sr)
+        except OSError as e:
+            self._decoder = None
+            self.pipe_error = str(e)
+        logger.info(f"[INGEST] Bắt đầu nhận {filename} | case_id={case_id} | decode_profile={self.profile.name}")
+
+    def _on_block(self, block: np.ndarray):
+        # Chạy trên thread đọc của PipeDecoder
+        end = self._samples + len(block)
+        if end > len(self._buf):
+            grown = np.zeros(max(end, 2 * len(self._buf)), dtype=np.float32)
+            grown[:self._samples] = self._buf[:self._samples]
+            self._buf = grown
+        self._buf[self._samples:end] = block
+        self._samples = end
+        self._silences.extend(self._vad.feed(block))
+        self._schedule(final=False)
+
+    def _pending_silences(self) -> List[Tuple[float, float]]:
+        """Khoảng lặng sau _next_start (tính cả đoạn lặng đang kéo dài), theo thời gian tương đối."""
+        silences = list(self._silences)
+        trailing = self._vad.trailing_silence
+        if trailing * 1000 >= self.chunk_min_silence_len:
+            silences.append((self._vad.position - trailing, self._vad.position))
+        base = self._next_start
+        return [(max(0.0, s - base), e - base) for s, e in silences if e > base]
+
+    def _schedule(self, final: bool):
+        available = self._samples / self.sr
+        while True:
+            remaining = available - self._next_start
+            if final:
+                spans = plan_chunks(remaining, self._pending_silences(), min_len=self.min_segment_length,
+                                    max_len=self.max_segment_length) if remaining > 0 else []
+            elif remaining >= self.max_segment_length + self.overlap:
+                # Chỉ chốt chunk đầu: overlap phía sau điểm cắt đã có đủ dữ liệu
+                spans = plan_chunks(remaining, self._pending_silences(), min_len=self.min_segment_length,
+                                    max_len=self.max_segment_length)[:1]
+            else:
+                return
+            if not spans:
+                return
+            base = self._next_start
+            for core_start, core_end in spans:
+                self._submit(base + core_start, base + core_end, available)
+            self._next_start = base + spans[-1][1]
+            if final:
+                return
+
+    def _submit(self, core_start: float, core_end: float, available: float):
+        start = max(0.0, core_start - self.overlap)
+        end = min(available, core_end + self.overlap)
+        data = self._buf[int(start * self.sr):int(end * self.sr)]
+        # Bỏ chunk quá ngắn (<0.5s) như _segment_audio
+        if len(data) < int(0.5 * self.sr):
+            return
+        chunk_path = self._chunk_dir / f"{len(self._futures):05d}.npy"
+        np.save(chunk_path, data)
+        self._futures.append(transcribe_chunk_async.apply_async(
+            args=(str(chunk_path), start, end, core_start, core_end),
+            kwargs={"decode_profile": self.profile.name, "with_caption": self.with_caption},
+            queue=settings.INGEST_CHUNK_QUEUE,
+        ))
+        logger.debug(f"[INGEST] Gửi chunk core={core_start:.2f}-{core_end:.2f}s | đã nhận {available:.2f}s")
+
+    def feed(self, data: bytes):
+        """Nhận thêm byte của file đang upload."""
+        self._file.write(data)
+        self._sha256.update(data)
+        self._bytes += len(data)
+        if self._decoder is None or self.pipe_error is not None:
+            return
+        try:
+            self._decoder.write(data)
+        except OSError as e:
+            # ffmpeg không decode được qua pipe (vd m4a có moov ở cuối): vẫn nhận hết file rồi xử lý như upload thường
+            self.pipe_error = str(e)
+            self._decoder.abort()
+            logger.warning(f"[INGEST] Không decode được {self.filename} qua pipe, chuyển sang xử lý sau upload: {e}")
+
+    def finish(self) -> dict:
+        """
+        Upload xong: decode phần đuôi, merge transcript, tạo Task/AudioFile, ghi PCM cache và triage.
+        Trả về task_id, transcript, segments; pipelined=False (không kèm segments) nếu phải transcribe lại cả file,
+        vd ffmpeg pipe lỗi hoặc có chunk decode lỗi/quá hạn.
+        """
+        self._file.close()
+        upload_time = time.time() - self.started_at
+        chunks_during_upload = len(self._futures)
+        if self._decoder is not None and self.pipe_error is None:
+            try:
+                self._decoder.close()
+            except RuntimeError as e:
+                self.pipe_error = str(e)
+                logger.warning(f"[INGEST] ffmpeg pipe lỗi với {self.filename}, chuyển sang xử lý sau upload: {e}")
+        task, audio_file = create_audio_task(self.filename, self.path, self.db, case_id=self.case_id)
+        digest = self._sha256.hexdigest()
+        pcm_cache.remember_digest(self.path, digest)
+        info = {"task_id": task["id"], "audio_file_id": audio_file.id, "status": "pending", "pipelined": False,
+                "upload_time": round(upload_time, 2), "triage": None, "transcript": None, "segments": None,
+                "caption": None}
+        if self.pipe_error is not None:
+            self._discard_chunks()
+            # Xử lý như upload thường: triage từ file trên đĩa để vẫn route đúng queue ngắn/dài
+            if settings.TRIAGE_ENABLED and settings.TRIAGE_ON_UPLOAD:
+                try:
+                    triage = run_triage(audio_file, self.db)
+                except Exception as e:
+                    logger.warning(f"[TRIAGE] Không triage được khi upload {self.filename}: {e}")
+                else:
+                    info["triage"] = triage.as_dict()
+                    if triage.is_empty:
+                        update_task(task["id"], {"status": "failed", "error": triage.reason})
+                        info["status"] = "failed"
+            return info
+
+        t0 = time.time()
+        self._silences.extend(self._vad.flush())
+        self._schedule(final=True)
+        chunk_results = []
+        captions = []
+        chunk_error = None
+        for idx, result in enumerate(self._futures):
+            try:
+                core_start, core_end, segments, caption = result.get(timeout=settings.INGEST_CHUNK_TIMEOUT)
+            except Exception as e:
+                chunk_error = e
+                logger.error(f"[INGEST] Lỗi decode chunk {idx+1}/{len(self._futures)}, transcribe lại cả file trên worker: {e}")
+                break
+            chunk_results.append((core_start, core_end, segments))
+            captions.append(caption)
+        if chunk_error is not None:
+            # Transcript thiếu một đoạn: bỏ hết kết quả chunk, các chunk còn lại không cần chạy nữa
+            self._discard_chunks()
+        else:
+            shutil.rmtree(self._chunk_dir, ignore_errors=True)
+        audio = self._buf[:self._samples]
+        # process_task (Celery) đọc lại PCM từ cache, không decode file lần nữa
+        try:
+            pcm_cache.put(digest, self.sr, audio)
+        except OSError as e:
+            logger.warning(f"[INGEST] Không ghi được PCM cache cho {self.path}: {e}")
+        if settings.TRIAGE_ENABLED:
+            triage = run_triage(audio_file, self.db, audio, self.sr)
+            info["triage"] = triage.as_dict()
+            if triage.is_empty:
+                update_task(task["id"], {"status": "failed", "error": triage.reason})
+                info["status"] = "failed"
+                return info
+        if chunk_error is not None:
+            # pipelined=False, không kèm segments: process_task chạy ASR đầy đủ trên PCM cache
+            info["duration"] = round(len(audio) / self.sr, 2)
+            return info
+        merged = merge_chunk_segments(chunk_results, context_window=self.context_window)
+        segments = [{"start": seg["start"], "end": seg["end"], "text": seg["text"]} for seg in merged]
+        tail_time = time.time() - t0
+        info.update({
+            "pipelined": True,
+            "transcript": " ".join(seg["text"].strip() for seg in segments),
+            "segments": segments,
+            # Chunk đã theo thứ tự thời gian; None nếu không sinh caption lúc ingest
+            "caption": " ".join(c for c in captions if c) if self.with_caption else None,
+            "duration": round(len(audio) / self.sr, 2),
+            "chunks": len(chunk_results),
+            "chunks_during_upload": chunks_during_upload,
+            "tail_time": round(tail_time, 2),
+        })
+        logger.info(f"[INGEST] {self.filename} | bytes={self._bytes} | duration={info['duration']}s | upload={upload_time:.2f}s "
+                    f"| chunks={len(chunk_results)} (trong lúc upload: {chunks_during_upload}) | decode sau upload={tail_time:.2f}s")
+        return info
+
+    def _discard_chunks(self):
+        """Thu hồi các chunk đã giao cho worker (chưa chạy thì không chạy nữa) và xóa PCM của chúng."""
+        if self._futures:
+            celery_app.control.revoke([result.id for result in self._futures])
+        shutil.rmtree(self._chunk_dir, ignore_errors=True)
+
+    def abort(self):
+        """Client ngắt kết nối/lỗi giữa chừng: dừng ffmpeg, bỏ các chunk chưa decode và xóa file dở."""
+        if self._decoder is not None:
+            self._decoder.abort()
+        self._discard_chunks()
+        if not self._file.closed:
+            self._file.close()
+        self.path.unlink(missing_ok=True)
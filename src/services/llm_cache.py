@@ -0,0 +1,145 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Union
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    Cache response của LLM trên đĩa (SQLite), key = SHA-256 của (model, prompt đã render, options).
+    Cùng transcript + prompt + options thì trả lại response đã sinh thay vì gọi Ollama lần nữa.
+    Khi tổng dung lượng response vượt max_bytes thì xóa entry ít được dùng nhất (LRU theo last_access).
+    File SQLite (WAL) dùng chung được giữa process API và các Celery worker.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 0, enabled: bool = True):
+        """
+        Args:
+            path: File SQLite
+            max_bytes: Budget tổng dung lượng response (bytes), 0 = không giới hạn
+            enabled: False thì get luôn miss và put không ghi
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Mỗi lần dùng một connection: an toàn giữa các thread và sau khi Celery fork worker
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, created_at REAL, last_access REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Optional[dict] = None, **extra) -> str:
+        """SHA-256 của (model, prompt, options, tham số khác của request) dạng JSON sort_keys."""
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options or {}, **extra},
+                             ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Response đã cache theo key, None nếu chưa có (hoặc cache tắt)."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    # Cập nhật last_access để LRU eviction biết entry vừa được dùng
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"[LLM_CACHE] Không đọc được cache {self.path}: {e}")
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key: str, model: str, response: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model, response, len(response.encode("utf-8")), now, now))
+                conn.commit()
+                self._evict(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"[LLM_CACHE] Không ghi được cache {self.path}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        if self.max_bytes <= 0:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        conn.commit()
+        with self._lock:
+            self.evictions += evicted
+        logger.info(f"[LLM_CACHE] LRU evicted {evicted} response")
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        entries, total = 0, 0
+        if self.path.exists():
+            try:
+                conn = self._connect()
+                try:
+                    entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"[LLM_CACHE] Không đọc được cache {self.path}: {e}")
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "total_bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+llm_cache = LLMCache(settings.LLM_CACHE_PATH, max_bytes=settings.LLM_CACHE_MAX_BYTES, enabled=settings.LLM_CACHE_ENABLED)
@@ -0,0 +1,159 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Sequence
+import requests
+from requests.adapters import HTTPAdapter
+from src.core.config import settings
+from src.services.llm_cache import llm_cache
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự ưu tiên khi tự chọn model Ollama
+MODEL_PRIORITY = ["gemma2:9b", "deepseek-r1:7b", "mistral:7b-instruct", "llama3.2:3b"]
+DEFAULT_MODEL = "gemma2:9b"
+
+# Lỗi tạm thời phía Ollama (đang load model, quá tải) thì thử lại
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class OllamaError(RuntimeError):
+    """Ollama không trả được kết quả (không kết nối được, timeout, HTTP lỗi hoặc hết lượt thử lại)."""
+
+class OllamaClient:
+    """
+    Client HTTP dùng chung cho Ollama trong process: một requests.Session giữ connection pool (keep-alive),
+    cache danh sách model từ /api/tags theo TTL thay cho subprocess `ollama list`, timeout cho mọi lời gọi,
+    thử lại có giới hạn khi lỗi kết nối/5xx, semaphore giới hạn số generate đang chạy cùng lúc
+    và cache response trên đĩa (llm_cache). Các prompt độc lập gửi song song qua submit().
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: Optional[float] = None,
+                 connect_timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, models_ttl: Optional[float] = None):
+        """
+        Args:
+            base_url: Địa chỉ Ollama, vd http://localhost:11434
+            timeout: Timeout đọc (giây) của một lời gọi generate
+            connect_timeout: Timeout kết nối (giây)
+            max_retries: Số lần thử lại tối đa khi lỗi kết nối hoặc HTTP 429/5xx (không thử lại khi timeout đọc)
+            max_concurrency: Số generate tối đa đang chạy cùng lúc trong process
+            models_ttl: Thời gian (giây) giữ cache danh sách model
+        """
+        self.base_url = (base_url or settings.OLLAMA_BASE_URL).rstrip("/")
+        self.timeout = timeout or settings.OLLAMA_TIMEOUT
+        self.connect_timeout = connect_timeout or settings.OLLAMA_CONNECT_TIMEOUT
+        self.max_retries = max(0, max_retries if max_retries is not None else settings.OLLAMA_MAX_RETRIES)
+        self.max_concurrency = max(1, max_concurrency or settings.OLLAMA_MAX_CONCURRENCY)
+        self.models_ttl = models_ttl if models_ttl is not None else settings.OLLAMA_MODELS_TTL
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        # Thread gửi các lời gọi submit(); số request thực sự tới Ollama vẫn bị chặn bởi semaphore
+        self._executor = ThreadPoolExecutor(max_workers=2 * self.max_concurrency, thread_name_prefix="ollama")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency + 2)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._models: Optional[List[str]] = None
+        self._models_at = 0.0
+        self._models_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _post(self, path: str, payload: dict, timeout: float) -> dict:
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._session.post(url, json=payload, timeout=(self.connect_timeout, timeout))
+            except requests.Timeout as e:
+                # Ollama treo: không thử lại để thời gian chờ tối đa của task luôn bị chặn bởi timeout
+                raise OllamaError(f"Ollama timeout sau {timeout}s: {e}") from e
+            except requests.ConnectionError as e:
+                error = OllamaError(f"Không kết nối được Ollama tại {self.base_url}: {e}")
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                error = OllamaError(f"Ollama API error: {response.status_code}")
+                if response.status_code not in RETRY_STATUS:
+                    raise error
+            if attempt < self.max_retries:
+                self.retries += 1
+                delay = 0.5 * 2 ** attempt
+                logger.warning(f"[OLLAMA] {error} | thử lại lần {attempt + 1}/{self.max_retries} sau {delay:.1f}s")
+                time.sleep(delay)
+        raise error
+
+    def generate(self, model: str, prompt: str, options: Optional[dict] = None, timeout: Optional[float] = None,
+                 use_cache: bool = True, **extra) -> str:
+        """
+        Gọi /api/generate (stream=False) và trả về text "response".
+        Response được cache trên đĩa theo (model, prompt, options); use_cache=False để bỏ qua cache và sinh lại
+        (kết quả mới vẫn được ghi đè vào cache).
+        Chờ slot trong semaphore tối đa bằng timeout; raise OllamaError nếu không có kết quả.
+        """
+        key = llm_cache.make_key(model, prompt, options, **extra)
+        if use_cache:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                logger.info(f"[OLLAMA] cache hit model={model} | prompt={len(prompt)} ký tự")
+                return cached
+        timeout = timeout or self.timeout
+        if not self._slots.acquire(timeout=timeout):
+            self.failures += 1
+            raise OllamaError(f"Hết {timeout}s chờ slot Ollama ({self.max_concurrency} lời gọi đang chạy)")
+        t0 = time.time()
+        try:
+            self.calls += 1
+            payload = {"model": model, "prompt": prompt, "stream": False, **extra}
+            if options:
+                payload["options"] = options
+            result = self._post("/api/generate", payload, timeout)
+        except OllamaError:
+            self.failures += 1
+            raise
+        finally:
+            self._slots.release()
+        logger.info(f"[OLLAMA] generate model={model} | prompt={len(prompt)} ký tự | {time.time() - t0:.2f}s")
+        response = result.get("response", "")
+        if response:
+            llm_cache.put(key, model, response)
+        return response
+
+    def submit(self, model: str, prompt: str, **kwargs) -> Future:
+        """generate chạy nền: Future trả về text hoặc raise OllamaError. Dùng để gửi song song các prompt độc lập."""
+        return self._executor.submit(self.generate, model, prompt, **kwargs)
+
+    def list_models(self, refresh: bool = False) -> List[str]:
+        """Tên các model đã pull trên Ollama (/api/tags), cache models_ttl giây. Raise OllamaError nếu không lấy được."""
+        with self._models_lock:
+            if not refresh and self._models is not None and time.monotonic() - self._models_at < self.models_ttl:
+                return list(self._models)
+            try:
+                response = self._session.get(f"{self.base_url}/api/tags", timeout=(self.connect_timeout, self.connect_timeout))
+                response.raise_for_status()
+                models = [m.get("name") or m.get("model") for m in response.json().get("models", [])]
+            except (requests.RequestException, ValueError) as e:
+                raise OllamaError(f"Không lấy được danh sách model Ollama: {e}") from e
+            self._models = [m for m in models if m]
+            self._models_at = time.monotonic()
+            return list(self._models)
+
+    def pick_model(self, priority: Sequence[str] = MODEL_PRIORITY, default: str = DEFAULT_MODEL) -> str:
+        """Model đầu tiên theo thứ tự ưu tiên đang có trên Ollama; không lấy được danh sách thì dùng default."""
+        try:
+            models = self.list_models()
+        except OllamaError as e:
+            logger.warning(f"[OLLAMA] {e}")
+            return default
+        return next((m for m in priority if m in models), default)
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+ollama_client = OllamaClient()
@@ -0,0 +1,45 @@
+from typing import List, Tuple
+
+
+def needs_escalation(segment: dict, logprob_threshold: float, no_speech_threshold: float) -> bool:
+    """Segment bản nháp có độ tin cậy thấp (avg_logprob thấp hoặc no_speech_prob cao) cần decode lại."""
+    return (segment.get("avg_logprob", 0.0) < logprob_threshold
+            or segment.get("no_speech_prob", 0.0) > no_speech_threshold)
+
+
+def escalation_spans(segments: List[dict], logprob_threshold: float, no_speech_threshold: float,
+                     duration: float, pad: float = 0.2, merge_gap: float = 1.0) -> List[Tuple[float, float]]:
+    """
+    Các khoảng thời gian cần decode lại bằng model lớn: segment không đạt ngưỡng, nới thêm pad giây
+    mỗi phía, các khoảng cách nhau < merge_gap được gộp để model lớn có đủ ngữ cảnh.
+    """
+    spans: List[List[float]] = []
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        if not needs_escalation(seg, logprob_threshold, no_speech_threshold):
+            continue
+        start = max(0.0, seg["start"] - pad)
+        end = min(duration, seg["end"] + pad)
+        if spans and start - spans[-1][1] < merge_gap:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return [(start, end) for start, end in spans]
+
+
+def replace_spans(draft: List[dict], redecoded: List[Tuple[float, float, List[dict]]]) -> List[dict]:
+    """
+    Thay các segment bản nháp có tâm nằm trong khoảng đã decode lại bằng kết quả của model lớn.
+
+    Args:
+        draft: Segment bản nháp {start, end, text, ...}
+        redecoded: (span_start, span_end, segments) với segments theo thời gian tuyệt đối
+    """
+    def covered(seg):
+        mid = (seg["start"] + seg["end"]) / 2
+        return any(start <= mid < end for start, end, _ in redecoded)
+
+    merged = [seg for seg in draft if not covered(seg)]
+    for _, _, segments in redecoded:
+        merged.extend(segments)
+    merged.sort(key=lambda seg: seg["start"])
+    return merged
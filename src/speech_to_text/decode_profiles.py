@@ -0,0 +1,43 @@
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+from src.core.config import settings
+
+
+@dataclass(frozen=True)
+class DecodeProfile:
+    """
+    Tùy chọn decode áp dụng trên model đã load (không cần _reload_model):
+    beam search, tham số VAD của faster-whisper và chế độ caption mặc định.
+    """
+    name: str
+    beam_size: int
+    patience: float = 1.0
+    vad_min_silence_ms: int = 500
+    vad_speech_pad_ms: int = 100
+    caption_mode: Optional[str] = None  # None = theo WHISPER_CAPTION_MODE
+
+    @property
+    def vad_parameters(self) -> dict:
+        return dict(min_silence_duration_ms=self.vad_min_silence_ms, speech_pad_ms=self.vad_speech_pad_ms)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+DECODE_PROFILES: Dict[str, DecodeProfile] = {
+    # Sàng lọc nhanh: greedy, VAD cắt chặt, không sinh caption
+    "fast": DecodeProfile("fast", beam_size=1, vad_min_silence_ms=300, vad_speech_pad_ms=50, caption_mode="off"),
+    # Mặc định: cùng tham số với pipeline trước đây
+    "balanced": DecodeProfile("balanced", beam_size=settings.WHISPER_BEAM_SIZE),
+    # Phục vụ làm chứng cứ: beam rộng hơn, VAD giữ thêm biên để không mất từ
+    "accurate": DecodeProfile("accurate", beam_size=max(8, settings.WHISPER_BEAM_SIZE), patience=1.5,
+                              vad_min_silence_ms=1000, vad_speech_pad_ms=300),
+}
+
+
+def get_decode_profile(name: Optional[str] = None) -> DecodeProfile:
+    """Lấy decode profile theo tên, None = WHISPER_DECODE_PROFILE. Tên không hợp lệ -> ValueError."""
+    name = name or settings.WHISPER_DECODE_PROFILE
+    if name not in DECODE_PROFILES:
+        raise ValueError(f"decode_profile không hợp lệ: {name}. Chọn một trong {list(DECODE_PROFILES)}")
+    return DECODE_PROFILES[name]
@@ -0,0 +1,143 @@
+import time
+import numpy as np
+from typing import Callable, List, Optional
+from src.core.config import settings
+from src.audio_processing.vad import StreamingSilenceDetector, rms_to_db
+
+# decode(audio) -> {text, avg_logprob, no_speech_prob} cho một cửa sổ <= 30s
+DecodeFn = Callable[[np.ndarray], dict]
+
+# Cùng ngưỡng lọc "không có tiếng nói" với faster-whisper
+NO_SPEECH_THRESHOLD = 0.6
+
+def load_realtime_decoder(beam_size: Optional[int] = None) -> DecodeFn:
+    """
+    Hàm decode một câu bằng WindowDecoder (encode + generate trực tiếp, không VAD/timestamp của faster-whisper).
+    Model lấy từ model registry: REALTIME_MODEL trống thì dùng chung WhisperModel của Transcriber.
+    """
+    from src.core.hardware import resolve_execution_profile
+    from src.speech_to_text.transcriber import load_whisper_model, resolve_model_dir
+    from src.speech_to_text.window_decoder import WindowDecoder
+    profile = resolve_execution_profile()
+    model_dir = resolve_model_dir(settings.REALTIME_MODEL or settings.WHISPER_MODEL)
+    model = load_whisper_model(model_dir, profile.device, profile.compute_type,
+                               num_workers=profile.num_workers, cpu_threads=profile.cpu_threads)
+    decoder = WindowDecoder(model, language="vi")
+    beam_size = beam_size or settings.REALTIME_BEAM_SIZE
+
+    def decode(audio: np.ndarray) -> dict:
+        return decoder.generate(decoder.encode([audio]), beam_size=beam_size)[0]
+    return decode
+
+class RealtimeRecognizer:
+    """
+    Nhận dạng liên tục trên các frame PCM 16kHz (microphone): giữ buffer của câu đang nói, gửi kết quả tạm
+    (partial) theo chu kỳ và decode bản cuối (final) ngay khi VAD năng lượng thấy im lặng đủ endpoint_silence_ms.
+    Độ trễ từ lúc hết câu tới lúc có text ~ endpoint_silence_ms + thời gian decode một cửa sổ.
+    """
+
+    def __init__(self, decode: DecodeFn, sr: int = 16000, silence_thresh: Optional[float] = None,
+                 endpoint_silence_ms: Optional[int] = None, partial_interval_ms: Optional[int] = None,
+                 max_utterance_seconds: Optional[float] = None, preroll_ms: Optional[int] = None):
+        self.decode = decode
+        self.sr = sr
+        self.silence_thresh = settings.REALTIME_SILENCE_THRESH if silence_thresh is None else silence_thresh
+        self.endpoint_silence = (endpoint_silence_ms if endpoint_silence_ms is not None else settings.REALTIME_ENDPOINT_SILENCE_MS) / 1000
+        self.partial_interval = (partial_interval_ms if partial_interval_ms is not None else settings.REALTIME_PARTIAL_INTERVAL_MS) / 1000
+        self.max_utterance = min(30.0, max_utterance_seconds or settings.REALTIME_MAX_UTTERANCE_SECONDS)
+        self.preroll = int((preroll_ms if preroll_ms is not None else settings.REALTIME_PREROLL_MS) / 1000 * sr)
+        self._vad = StreamingSilenceDetector(sr, silence_thresh=self.silence_thresh,
+                                             min_silence_len=int(self.endpoint_silence * 1000))
+        self._blocks: List[np.ndarray] = []
+        self._buffered = 0  # số mẫu trong buffer câu hiện tại
+        self._received = 0  # tổng số mẫu đã nhận
+        self._speaking = False
+        self._speech_at = 0.0  # thời điểm (giây) bắt đầu nói của câu hiện tại
+        self._last_partial = 0.0  # độ dài buffer (giây) ở lần partial gần nhất
+        self._decode_cost = 0.0  # thời gian decode gần nhất, giãn chu kỳ partial khi máy chậm
+        self.utterances = 0
+
+    @property
+    def position(self) -> float:
+        return self._received / self.sr
+
+    def _buffer(self) -> np.ndarray:
+        if len(self._blocks) > 1:
+            self._blocks = [np.concatenate(self._blocks)]
+        return self._blocks[0] if self._blocks else np.zeros(0, dtype=np.float32)
+
+    def _reset(self, keep: int = 0):
+        audio = self._buffer()
+        self._blocks = [audio[len(audio) - keep:]] if keep and len(audio) else []
+        self._buffered = len(self._blocks[0]) if self._blocks else 0
+        self._last_partial = 0.0
+
+    def _run_decode(self, audio: np.ndarray) -> dict:
+        t0 = time.perf_counter()
+        result = self.decode(audio)
+        self._decode_cost = time.perf_counter() - t0
+        return result
+
+    def _partial(self) -> Optional[dict]:
+        self._last_partial = self._buffered / self.sr
+        result = self._run_decode(self._buffer())
+        if not result.get("text"):
+            return None
+        return {"type": "partial", "text": result["text"], "start": round(self.position - self._buffered / self.sr, 2),
+                "end": round(self.position, 2), "decode_time": round(self._decode_cost, 3)}
+
+    def _final(self, trailing: float) -> Optional[dict]:
+        audio = self._buffer()
+        # Bỏ phần im lặng cuối câu, giữ lại một chút đệm
+        keep = len(audio) - int(max(0.0, trailing - 0.2) * self.sr)
+        start = self.position - len(audio) / self.sr
+        result = self._run_decode(audio[:keep])
+        self.utterances += 1
+        if not result.get("text") or result.get("no_speech_prob", 0.0) > NO_SPEECH_THRESHOLD:
+            return None
+        return {"type": "final", "text": result["text"], "start": round(start, 2),
+                "end": round(self.position - trailing, 2), "decode_time": round(self._decode_cost, 3),
+                "avg_logprob": result.get("avg_logprob"), "no_speech_prob": result.get("no_speech_prob")}
+
+    def feed(self, block: np.ndarray) -> List[dict]:
+        """Đưa thêm một frame PCM float32, trả về các event {"type": "partial"|"final", text, start, end, ...}."""
+        block = np.asarray(block, dtype=np.float32)
+        if not len(block):
+            return []
+        self._vad.feed(block)
+        self._blocks.append(block)
+        self._buffered += len(block)
+        self._received += len(block)
+        if not self._speaking:
+            if rms_to_db(np.sqrt(np.mean(np.square(block, dtype=np.float64)))) < self.silence_thresh:
+                # Chưa nói: chỉ giữ pre-roll
+                if self._buffered > self.preroll:
+                    self._reset(keep=self.preroll)
+                return []
+            self._speaking = True
+            self._speech_at = self.position - len(block) / self.sr
+        trailing = self._vad.trailing_silence
+        # Chỉ tính đoạn lặng bắt đầu sau khi đã nói (VAD theo frame nên trễ hơn block vài chục ms)
+        ended = trailing >= self.endpoint_silence and self._vad.position - trailing > self._speech_at
+        event = None
+        if ended:
+            event = self._final(trailing)
+            self._speaking = False
+            self._reset(keep=self.preroll)
+        elif self._buffered / self.sr >= self.max_utterance:
+            # Câu quá dài: chốt phần đã có, câu tiếp theo bắt đầu ngay tại đây
+            event = self._final(0.0)
+            self._speech_at = self.position
+            self._reset()
+        elif self._buffered / self.sr - self._last_partial >= max(self.partial_interval, 2 * self._decode_cost):
+            event = self._partial()
+        return [event] if event else []
+
+    def flush(self) -> List[dict]:
+        """Kết thúc stream: decode nốt câu đang nói dở."""
+        if not self._speaking or not self._buffered:
+            return []
+        event = self._final(self._vad.trailing_silence)
+        self._speaking = False
+        self._reset()
+        return [event] if event else []
@@ -16,16 +16,26 @@ from pathlib import Path
 from faster_whisper import WhisperModel
 import torch
 from dataclasses import dataclass
-from typing import List, Optional, Tuple, Union
+from typing import Iterator, List, Optional, Tuple, Union
 import json
 import time
 import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 import gc
-import requests
-import librosa
+from src.services.llm_client import ollama_client
+from src.summarization.map_reduce import condense_transcript
 from src.audio_processing.processor import AudioProcessor
+from src.audio_processing.chunking import plan_chunks, merge_chunk_segments
+from src.audio_processing.vad import detect_silence
+from src.audio_processing.triage import triage_audio
+from src.audio_processing.compaction import compact_speech, remap_segments
+from src.speech_to_text.cascade import escalation_spans, replace_spans
+from src.speech_to_text.decode_profiles import DecodeProfile, get_decode_profile
+from src.speech_to_text.window_decoder import CaptioningPipeline, is_no_speech
 from src.core.config import settings
+from src.core.model_registry import model_registry, estimate_path_size
+from src.core.hardware import resolve_device, resolve_execution_profile
 
 @dataclass
 class AudioSegment:
@@ -34,6 +44,57 @@ class AudioSegment:
     start_time: float
     end_time: float
     context: Optional[np.ndarray] = None
+    # Vùng core của chunk (không tính overlap), dùng khi merge kết quả các chunk
+    core_start: Optional[float] = None
+    core_end: Optional[float] = None
+
+# Tham số sinh cho các prompt phân tích (trả về JSON); num_ctx đủ cho transcript + output gộp phân tích và trực quan hóa
+ANALYSIS_OPTIONS = {"temperature": 0.2, "top_p": 0.9, "top_k": 40, "num_ctx": 8192}
+
+def _json_object(properties: dict) -> dict:
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+def _json_list(item: dict) -> dict:
+    return {"type": "array", "items": item}
+
+_STRING = {"type": "string"}
+_SENSITIVITY = {"is_sensitive": {"type": "boolean"}, "sensitivity_reason": _STRING, "context": _STRING}
+
+# JSON schema cho Ollama `format`: một lần generate trả về cả phân tích nghiệp vụ và dữ liệu trực quan hóa
+CONVERSATION_ANALYSIS_SCHEMA = _json_object({
+    "analysis": _json_object({
+        "summary": _STRING,
+        "key_points": _json_list(_STRING),
+        "entities": _json_object({
+            "people": _json_list(_json_object({"name": _STRING, "role": _STRING, **_SENSITIVITY})),
+            "locations": _json_list(_json_object({"name": _STRING, "type": _STRING, "address": _STRING, **_SENSITIVITY})),
+            "time": _json_list(_json_object({"value": _STRING, "type": _STRING, **_SENSITIVITY})),
+            "contact": _json_object({
+                "phone": _json_object({"value": _STRING, **_SENSITIVITY}),
+                "email": _json_object({"value": _STRING, **_SENSITIVITY}),
+                "id": _json_object({"value": _STRING, "type": _STRING, **_SENSITIVITY}),
+            }),
+        }),
+        "context": _json_object({
+            "topic": _STRING, "purpose": _STRING, "tone": _STRING, "domain": _STRING,
+            "privacy_level": _STRING, "relationships": _STRING,
+        }),
+        "details": _json_object({
+            "requirements": _json_list(_json_object({"content": _STRING, **_SENSITIVITY})),
+            "decisions": _json_list(_json_object({"content": _STRING, **_SENSITIVITY})),
+            "actions": _json_list(_json_object({"content": _STRING, **_SENSITIVITY})),
+        }),
+        "sentiment": {"type": "string", "enum": ["positive", "negative", "neutral"]},
+        "notes": _STRING,
+        "privacy_summary": _STRING,
+    }),
+    "visualization": _json_object({
+        "nodes": _json_list(_json_object({"id": _STRING, "type": _STRING, "label": _STRING, **_SENSITIVITY})),
+        "edges": _json_list(_json_object({"source": _STRING, "target": _STRING, "label": _STRING, "context": _STRING})),
+        "timeline": _json_list(_json_object({"time": _STRING, "description": _STRING})),
+        "main_events": _json_list(_STRING),
+    }),
+})
 
 class OllamaProcessor:
     def __init__(self, model_name: str = "gemma2:9b"):
@@ -50,7 +111,6 @@ class OllamaProcessor:
             model_name = "gemma2:9b"
             
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/generate"
         logger.info(f"Initialized Ollama processor with model: {model_name}")
         
     def get_available_models(self) -> dict:
@@ -95,19 +155,18 @@ class OllamaProcessor:
             result['insight'] = ['Không phát hiện thông tin đáng chú ý. Lý do: hội thoại thiếu dữ liệu, nội dung không rõ ràng, hoặc chất lượng âm thanh thấp. Đề xuất: thu thập thêm dữ liệu hoặc kiểm tra lại bản ghi.']
         return result
 
-    def analyze_context(self, text: str) -> dict:
-        """Analyze conversation context using Ollama. Luôn phân tích sâu nghiệp vụ, insight, mối quan hệ, hành động, quyết định, dấu hiệu bất thường, nguy cơ, hành vi nghi vấn..."""
+    def analyze_conversation(self, text: str, use_cache: bool = True) -> dict:
+        """
+        Một lần generate duy nhất (Ollama `format` = CONVERSATION_ANALYSIS_SCHEMA) trả về cả phân tích nghiệp vụ
+        lẫn dữ liệu trực quan hóa: {"analysis": {...}, "visualization": {...}}.
+        analyze_context và visualize_context đều lấy từ kết quả này; cùng text thì lần gọi thứ hai lấy từ LLM cache.
+        Lỗi thì trả về {}.
+        """
         try:
-            # Lấy danh sách model tốt nhất đang chạy trên Ollama
-            import subprocess
-            try:
-                proc = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-                models = [line.split()[0] for line in proc.stdout.splitlines() if line.strip() and not line.startswith("NAME")]
-            except Exception:
-                models = []
-            priority = ["gemma2:9b", "deepseek-r1:7b", "mistral:7b-instruct", "llama3.2:3b"]
-            model_name = next((m for m in priority if m in models), "gemma2:9b")
-            self.model_name = model_name
+            # Model tốt nhất đang có trên Ollama (danh sách model được cache trong client)
+            self.model_name = ollama_client.pick_model()
+            # Transcript dài hơn một prompt: phân tích trên ghi chú map-reduce thay vì để num_ctx cắt ngầm
+            text = condense_transcript(text, self.model_name, use_cache=use_cache)
 
             # Prompt mặc định: tổng quát + nghiệp vụ công an + hướng dẫn cho trường hợp không insight, tiếng lóng, mật ngữ
             prompt = f"""
@@ -120,306 +179,135 @@ Bạn là một trợ lý AI chuyên phân tích, trích xuất và trực quan
 
 {text}
 
-Hãy trả về kết quả dưới dạng JSON với cấu trúc sau:
-{{
-  "summary": "Tóm tắt ngắn gọn cuộc hội thoại, tập trung vào thông tin quan trọng nhất và mối quan hệ giữa các thông tin",
-  "key_points": [
-    "Các điểm chính được đề cập trong cuộc hội thoại",
-    "Các thông tin quan trọng về yêu cầu, mục đích hoặc vấn đề",
-    "Các quyết định hoặc thỏa thuận quan trọng"
-  ],
-  "entities": {{
-    "people": [{{
-      "name": "Tên đầy đủ của người được đề cập",
-      "role": "Vai trò hoặc mối quan hệ trong cuộc hội thoại",
-      "is_sensitive": "Đánh dấu nếu là thông tin nhạy cảm (true/false)",
-      "sensitivity_reason": "Lý do nếu là thông tin nhạy cảm",
-      "context": "Ngữ cảnh xuất hiện của người này trong cuộc hội thoại"
-    }}],
-    "locations": [{{
-      "name": "Tên địa điểm",
-      "type": "Loại địa điểm (nhà riêng/công ty/cơ quan...)",
-      "address": "Địa chỉ chi tiết nếu có",
-      "is_sensitive": "Đánh dấu nếu là địa điểm nhạy cảm (true/false)",
-      "sensitivity_reason": "Lý do nếu là địa điểm nhạy cảm",
-      "context": "Ngữ cảnh xuất hiện của địa điểm này trong cuộc hội thoại"
-    }}],
-    "time": [{{
-      "value": "Thời gian cụ thể",
-      "type": "Loại thời gian (hẹn/lịch trình/deadline...)",
-      "is_sensitive": "Đánh dấu nếu là thời gian nhạy cảm (true/false)",
-      "sensitivity_reason": "Lý do nếu là thời gian nhạy cảm",
-      "context": "Ngữ cảnh xuất hiện của thời gian này trong cuộc hội thoại"
-    }}],
-    "contact": {{
-      "phone": {{
-        "value": "Số điện thoại nếu có",
-        "is_sensitive": "Đánh dấu nếu là số điện thoại nhạy cảm (true/false)",
-        "sensitivity_reason": "Lý do nếu là số điện thoại nhạy cảm",
-        "context": "Ngữ cảnh xuất hiện của số điện thoại này trong cuộc hội thoại"
-      }},
-      "email": {{
-        "value": "Email nếu có",
-        "is_sensitive": "Đánh dấu nếu là email nhạy cảm (true/false)",
-        "sensitivity_reason": "Lý do nếu là email nhạy cảm",
-        "context": "Ngữ cảnh xuất hiện của email này trong cuộc hội thoại"
-      }},
-      "id": {{
-        "value": "Số định danh nếu có",
-        "type": "Loại định danh (CCCD/CMND/hộ chiếu...)",
-        "is_sensitive": "Đánh dấu nếu là định danh nhạy cảm (true/false)",
-        "sensitivity_reason": "Lý do nếu là định danh nhạy cảm",
-        "context": "Ngữ cảnh xuất hiện của định danh này trong cuộc hội thoại"
-      }}
-    }}
-  }},
-  "context": {{
-    "topic": "Chủ đề chính của cuộc hội thoại",
-    "purpose": "Mục đích của cuộc hội thoại",
-    "tone": "Giọng điệu của cuộc hội thoại (formal/informal/business/casual)",
-    "domain": "Lĩnh vực liên quan (nếu có thể xác định)",
-    "privacy_level": "Mức độ bảo mật của cuộc hội thoại (public/private/confidential)",
-    "relationships": "Mối quan hệ giữa các thông tin trong cuộc hội thoại"
-  }},
-  "details": {{
-    "requirements": [{{
-      "content": "Nội dung yêu cầu",
-      "is_sensitive": "Đánh dấu nếu là yêu cầu nhạy cảm (true/false)",
-      "sensitivity_reason": "Lý do nếu là yêu cầu nhạy cảm",
-      "context": "Ngữ cảnh xuất hiện của yêu cầu này trong cuộc hội thoại"
-    }}],
-    "decisions": [{{
-      "content": "Nội dung quyết định",
-      "is_sensitive": "Đánh dấu nếu là quyết định nhạy cảm (true/false)",
-      "sensitivity_reason": "Lý do nếu là quyết định nhạy cảm",
-      "context": "Ngữ cảnh xuất hiện của quyết định này trong cuộc hội thoại"
-    }}],
-    "actions": [{{
-      "content": "Nội dung hành động",
-      "is_sensitive": "Đánh dấu nếu là hành động nhạy cảm (true/false)",
-      "sensitivity_reason": "Lý do nếu là hành động nhạy cảm",
-      "context": "Ngữ cảnh xuất hiện của hành động này trong cuộc hội thoại"
-    }}]
-  }},
-  "sentiment": "Cảm xúc chung của cuộc hội thoại (positive/negative/neutral)",
-  "notes": "Các ghi chú đặc biệt hoặc thông tin bổ sung quan trọng",
-  "privacy_summary": "Tóm tắt về các thông tin nhạy cảm được đề cập và mức độ bảo mật cần thiết"
-}}
+Trả về một object JSON theo schema đã cho, gồm hai phần:
+- "analysis": phân tích nghiệp vụ
+  * summary: tóm tắt ngắn gọn, tập trung vào thông tin quan trọng nhất và mối quan hệ giữa các thông tin
+  * key_points: các điểm chính, yêu cầu/mục đích/vấn đề, quyết định hoặc thỏa thuận quan trọng
+  * entities: người (tên, vai trò), địa điểm (tên, loại, địa chỉ), thời gian (giá trị, loại), liên hệ (điện thoại, email, định danh CCCD/CMND/hộ chiếu); mỗi mục đánh dấu is_sensitive, sensitivity_reason và ngữ cảnh xuất hiện
+  * context: chủ đề, mục đích, giọng điệu (formal/informal/business/casual), lĩnh vực, mức độ bảo mật (public/private/confidential), mối quan hệ giữa các thông tin
+  * details: yêu cầu, quyết định, hành động (nội dung, is_sensitive, sensitivity_reason, ngữ cảnh)
+  * sentiment (positive/negative/neutral), notes, privacy_summary (tóm tắt thông tin nhạy cảm và mức độ bảo mật cần thiết)
+- "visualization": dữ liệu trực quan hóa
+  * nodes: các thực thể (người, tổ chức, địa điểm, thời gian, liên hệ, sự kiện) với id duy nhất, type, label
+  * edges: mối quan hệ giữa các node (source/target là id của node), label mô tả quan hệ hoặc hành động
+  * timeline: các mốc thời gian, sự kiện chính theo thứ tự
+  * main_events: danh sách sự kiện chính
 
 Lưu ý:
 - Nếu hội thoại không có insight, các trường liên quan để trống hoặc ghi rõ "không có".
 - Nếu phát hiện hội thoại dùng tiếng lóng, mật ngữ, hoặc có dấu hiệu bất thường, hãy đánh dấu rõ, giải thích hoặc cảnh báo trong các trường thích hợp (notes, key_points, risk, ...).
 - Luôn phân tích sâu, kể cả khi hội thoại tưởng như bình thường.
-- Chỉ trả về JSON, không thêm text khác.
 """
-
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.2,
-                        "top_p": 0.9,
-                        "top_k": 40,
-                        "num_ctx": 4096
-                    }
-                }
-            )
-            if response.status_code == 200:
-                result = response.json()
-                try:
-                    analysis = json.loads(result["response"])
-                    analysis = self.ensure_analysis_fields(analysis)
-                    return analysis
-                except json.JSONDecodeError:
-                    return {"summary": result["response"], "error": "JSON parse error"}
-            else:
-                raise Exception(f"Ollama API error: {response.status_code}")
+            response = ollama_client.generate(self.model_name, prompt, options=ANALYSIS_OPTIONS,
+                                              format=CONVERSATION_ANALYSIS_SCHEMA, use_cache=use_cache)
+            try:
+                result = json.loads(response)
+            except json.JSONDecodeError:
+                # Ollama cũ không hỗ trợ JSON schema có thể vẫn trả text
+                logger.error(f"[ANALYSIS] Response không phải JSON: {response[:200]}")
+                return {"analysis": {"summary": response, "error": "JSON parse error"}, "visualization": {}}
+            visualization = self.ensure_visualization_fields(result.get("visualization") or {})
+            analysis = result.get("analysis") or {}
+            # Tab phân tích (đồ thị quan hệ, timeline) dùng chung dữ liệu trực quan hóa của cùng lần generate
+            analysis.setdefault("relationships", visualization["edges"])
+            analysis.setdefault("timeline", visualization["timeline"])
+            analysis = self.ensure_analysis_fields(analysis)
+            return {"analysis": analysis, "visualization": visualization}
         except Exception as e:
-            logger.error(f"Error analyzing context with Ollama: {str(e)}")
+            logger.error(f"Error analyzing conversation with Ollama: {str(e)}")
             return {}
 
-    def visualize_context(self, text: str) -> dict:
-        """Phân tích hội thoại để trả về dữ liệu phù hợp cho trực quan hóa (graph, timeline, entity map...)."""
-        import re
-        try:
-            # Lấy danh sách model tốt nhất đang chạy trên Ollama
-            import subprocess
-            try:
-                proc = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-                models = [line.split()[0] for line in proc.stdout.splitlines() if line.strip() and not line.startswith("NAME")]
-            except Exception:
-                models = []
-            priority = ["gemma2:9b", "deepseek-r1:7b", "mistral:7b-instruct", "llama3.2:3b"]
-            model_name = next((m for m in priority if m in models), "gemma2:9b")
-            self.model_name = model_name
+    def ensure_visualization_fields(self, visualization: dict) -> dict:
+        for k in ["timeline", "nodes", "edges", "main_events"]:
+            if not isinstance(visualization.get(k), list):
+                visualization[k] = []
+        visualization["entity_types"] = sorted({n["type"] for n in visualization["nodes"] if isinstance(n, dict) and n.get("type")})
+        return visualization
 
-            prompt = f"""
-Bạn là AI chuyên trực quan hóa hội thoại. Hãy trích xuất các thành phần sau từ hội thoại:
-- nodes: danh sách thực thể (người, tổ chức, địa điểm, sự kiện, ...)
-- edges: mối quan hệ giữa các thực thể (ai liên hệ ai, ai thực hiện hành động gì với ai, ...)
-- timeline: các mốc thời gian, sự kiện chính
-- entity_types: loại thực thể (person, org, location, event, ...)
-- main_events: danh sách sự kiện chính
+    def analyze_context(self, text: str, use_cache: bool = True) -> dict:
+        """Analyze conversation context using Ollama. Luôn phân tích sâu nghiệp vụ, insight, mối quan hệ, hành động, quyết định, dấu hiệu bất thường, nguy cơ, hành vi nghi vấn...
+        use_cache=False: bỏ qua LLM cache, phân tích lại."""
+        return self.analyze_conversation(text, use_cache=use_cache).get("analysis", {})
 
-Chỉ trả về object JSON với các trường trên, không bọc trong markdown, không thêm ```json.
+    def visualize_context(self, text: str, use_cache: bool = True) -> dict:
+        """Phân tích hội thoại để trả về dữ liệu phù hợp cho trực quan hóa (graph, timeline, entity map...).
+        use_cache=False: bỏ qua LLM cache, phân tích lại."""
+        visualization = self.analyze_conversation(text, use_cache=use_cache).get("visualization", {})
+        logger.info(f"[visualize_context] Final analysis: {visualization}")
+        return visualization
 
-Hội thoại:
-{text}
-"""
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.2,
-                        "top_p": 0.9,
-                        "top_k": 40,
-                        "num_ctx": 4096
-                    }
-                }
-            )
-            if response.status_code == 200:
-                result = response.json()
-                try:
-                    analysis = json.loads(result["response"])
-                except json.JSONDecodeError:
-                    match = re.search(r"```(?:json)?\\n([\s\S]*?)```", result["response"], re.DOTALL)
-                    if match:
-                        json_str = match.group(1)
-                        try:
-                            analysis = json.loads(json_str)
-                        except Exception:
-                            analysis = {"error": "JSON parse error", "raw": result["response"]}
-                    else:
-                        analysis = {"error": "JSON parse error", "raw": result["response"]}
-                # --- Bắt đầu enrich kết quả cho trực quan hóa ---
-                # timeline
-                if "timeline" not in analysis or not isinstance(analysis["timeline"], list):
-                    timeline = []
-                    if "events" in analysis and isinstance(analysis["events"], list):
-                        for ev in analysis["events"]:
-                            timeline.append({"time": ev.get("time"), "description": ev.get("description") or ev.get("action") or ev.get("event")})
-                    elif "entities" in analysis and isinstance(analysis["entities"], dict) and "time" in analysis["entities"]:
-                        for t in analysis["entities"]["time"]:
-                            timeline.append({"time": t.get("value"), "description": t.get("context")})
-                    analysis["timeline"] = timeline
-                # nodes
-                if "nodes" not in analysis or not isinstance(analysis["nodes"], list):
-                    nodes = []
-                    ents = analysis.get("entities", {})
-                    if "people" in ents:
-                        for p in ents["people"]:
-                            nodes.append({"id": p.get("name"), "type": "person", "label": p.get("name"), "context": p.get("context"), "is_sensitive": p.get("is_sensitive")})
-                    if "locations" in ents:
-                        for l in ents["locations"]:
-                            nodes.append({"id": l.get("name"), "type": "location", "label": l.get("name"), "context": l.get("context"), "is_sensitive": l.get("is_sensitive")})
-                    if "time" in ents:
-                        for t in ents["time"]:
-                            nodes.append({"id": t.get("value"), "type": "time", "label": t.get("value"), "context": t.get("context"), "is_sensitive": t.get("is_sensitive")})
-                    if "contact" in ents:
-                        for k in ["phone", "email", "id"]:
-                            c = ents["contact"].get(k)
-                            if c and c.get("value"):
-                                nodes.append({"id": c["value"], "type": k, "label": c["value"], "context": c.get("context"), "is_sensitive": c.get("is_sensitive")})
-                    # events as nodes
-                    if "events" in analysis and isinstance(analysis["events"], list):
-                        for ev in analysis["events"]:
-                            nodes.append({"id": ev.get("description") or ev.get("event"), "type": "event", "label": ev.get("description") or ev.get("event"), "context": ev.get("time")})
-                    analysis["nodes"] = nodes
-                # edges
-                if "edges" not in analysis or not isinstance(analysis["edges"], list):
-                    edges = []
-                    if "relationships" in analysis and isinstance(analysis["relationships"], list):
-                        for r in analysis["relationships"]:
-                            edges.append({"source": r.get("source"), "target": r.get("target"), "label": r.get("label") or r.get("type"), "context": r.get("context")})
-                    analysis["edges"] = edges
-                # entity_types
-                if "entity_types" not in analysis or not isinstance(analysis["entity_types"], list):
-                    types = set()
-                    for n in analysis.get("nodes", []):
-                        if n.get("type"): types.add(n["type"])
-                    analysis["entity_types"] = list(types)
-                # main_events
-                if "main_events" not in analysis or not isinstance(analysis["main_events"], list):
-                    main_events = []
-                    if "events" in analysis and isinstance(analysis["events"], list):
-                        for ev in analysis["events"]:
-                            main_events.append(ev.get("description") or ev.get("event"))
-                    elif "timeline" in analysis:
-                        for t in analysis["timeline"]:
-                            main_events.append(t.get("description"))
-                    analysis["main_events"] = main_events
-                # Đảm bảo luôn trả về đủ các trường
-                for k in ["timeline", "nodes", "edges", "entity_types", "main_events"]:
-                    if k not in analysis:
-                        analysis[k] = []
-                logger.info(f"[visualize_context] Final analysis: {analysis}")
-                return analysis
-            else:
-                raise Exception(f"Ollama API error: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Error visualizing context with Ollama: {str(e)}")
-            return {}
+def resolve_batch_size() -> int:
+    """
+    batch_size cho batched inference: WHISPER_BATCH_SIZE, đã được scripts/autotune_whisper.py đo
+    trên máy hiện tại nếu có profile (xem WHISPER_PROFILE_PATH).
+    """
+    return max(1, settings.WHISPER_BATCH_SIZE)
+
+def resolve_model_dir(model_name: str) -> str:
+    """Chỉ cho phép load model từ local path"""
+    if os.path.isdir(model_name):
+        model_dir = model_name
+    else:
+        # Map tên model sang thư mục local
+        model_dir = os.path.join("models", f"faster-whisper-{model_name}")
+    if not os.path.exists(model_dir):
+        raise RuntimeError(f"Model path {model_dir} does not exist. Please download the model manually for offline use.")
+    return model_dir
+
+def load_whisper_model(model_dir: str, device: str, compute_type: str, num_workers: int = None, cpu_threads: int = 0) -> WhisperModel:
+    """Lấy WhisperModel từ model registry, chỉ load từ đĩa lần đầu trong process."""
+    # num_workers > 1 cho phép nhiều thread gọi model.transcribe song song (mỗi chunk một thread)
+    num_workers = num_workers or settings.WHISPER_NUM_WORKERS
+    return model_registry.get(
+        (str(model_dir), device, compute_type),
+        lambda: WhisperModel(str(model_dir), device=device, compute_type=compute_type,
+                             cpu_threads=cpu_threads, num_workers=num_workers),
+        size_bytes=estimate_path_size(str(model_dir)),
+    )
+
+CAPTION_MODES = ("off", "eager", "lazy")
 
 class Transcriber:
     def __init__(self):
-        device = settings.WHISPER_DEVICE
-        compute_type = settings.WHISPER_COMPUTE_TYPE
+        # device/compute_type/cpu_threads/num_workers theo phần cứng thực tế (GPU hoặc profile CPU)
+        profile = resolve_execution_profile()
+        device = profile.device
+        compute_type = profile.compute_type
         model_name = settings.WHISPER_MODEL
-        # --- Tự động điều chỉnh batch_size theo VRAM GPU ---
-        batch_size = settings.WHISPER_BATCH_SIZE
-        if device == "cuda":
-            try:
-                import torch
-                vram = torch.cuda.get_device_properties(0).total_memory // (1024 ** 3)  # GB
-                if vram >= 12:
-                    auto_bs = 16
-                elif vram >= 8:
-                    auto_bs = 8
-                elif vram >= 4:
-                    auto_bs = 4
-                else:
-                    auto_bs = 2
-                if batch_size < auto_bs:
-                    logger.info(f"[AUTO-BATCH] batch_size giữ nguyên theo settings: {batch_size}")
-                else:
-                    batch_size = auto_bs
-                    logger.info(f"[AUTO-BATCH] batch_size tự động điều chỉnh theo VRAM: {batch_size}")
-            except Exception as e:
-                logger.warning(f"[AUTO-BATCH] Không thể kiểm tra VRAM, dùng batch_size mặc định: {batch_size}. Lỗi: {e}")
-        # Chỉ cho phép load model từ local path
-        model_dir = None
-        if os.path.isdir(model_name):
-            model_dir = model_name
-        else:
-            # Map tên model sang thư mục local
-            model_dir = os.path.join("models", f"faster-whisper-{model_name}")
-        if not os.path.exists(model_dir):
-            raise RuntimeError(f"Model path {model_dir} does not exist. Please download the model manually for offline use.")
-        self.model = WhisperModel(model_dir, device=device, compute_type=compute_type)
+        batch_size = resolve_batch_size()
+        model_dir = resolve_model_dir(model_name)
+        self.model = load_whisper_model(model_dir, device, compute_type,
+                                        num_workers=profile.num_workers, cpu_threads=profile.cpu_threads)
+        self.execution_profile = profile
         self.device = device
         self.compute_type = compute_type
         self.model_name = model_name
         self.batch_size = batch_size
-        self.beam_size = settings.WHISPER_BEAM_SIZE
+        self.decode_profile = get_decode_profile()
+        self.beam_size = self.decode_profile.beam_size
+        self.num_workers = profile.num_workers
         self.min_segment_length = getattr(settings, 'WHISPER_MIN_SEGMENT_LENGTH', None) or 10
         self.max_segment_length = getattr(settings, 'WHISPER_MAX_SEGMENT_LENGTH', None) or 30
         self.context_window = getattr(settings, 'WHISPER_CONTEXT_WINDOW', None) or 5
         self.overlap = getattr(settings, 'WHISPER_OVERLAP', None) or 0.5
         self._set_segmentation_params(self.min_segment_length, self.max_segment_length, self.context_window, self.overlap)
         self.min_silence_len = getattr(settings, 'WHISPER_MIN_SILENCE_LEN', None) or 1000  # ms
+        self.chunk_min_silence_len = settings.WHISPER_CHUNK_MIN_SILENCE_MS  # ms, khoảng lặng tối thiểu để cắt chunk
         self.silence_thresh = getattr(settings, 'WHISPER_SILENCE_THRESH', None) or -40.0
         self.keep_silence = 100  # ms
         self.llm_processor = OllamaProcessor()
         self.speaker_pipeline = None
         self.pipeline = self.model
+        self.inference_mode = settings.WHISPER_INFERENCE_MODE
+        self.batched_pipeline = CaptioningPipeline(self.model, language="vi")
+        self.window_decoder = self.batched_pipeline.window_decoder
+        self.caption_mode = settings.WHISPER_CAPTION_MODE
+        self.draft_model_name = settings.WHISPER_DRAFT_MODEL
+        self.cascade_logprob_threshold = settings.WHISPER_CASCADE_LOGPROB_THRESHOLD
+        self.cascade_no_speech_threshold = settings.WHISPER_CASCADE_NO_SPEECH_THRESHOLD
+        self._draft_pipeline = None
         self.audio_processor = AudioProcessor()
-        logger.info(f"Loaded WhisperModel {model_dir} on {device} with {compute_type}")
+        logger.info(f"Loaded WhisperModel {model_dir} on {device} with {compute_type} | execution_profile={profile.as_dict()}")
         
     def _set_segmentation_params(self, min_segment_length, max_segment_length, context_window, overlap):
         # Ưu tiên giá trị truyền vào, nếu None thì lấy từ instance, nếu vẫn None thì lấy mặc định, ép kiểu an toàn
@@ -429,11 +317,19 @@ class Transcriber:
         self.overlap = float(overlap) if overlap is not None else getattr(self, 'overlap', 0.5) or 0.5
         logger.info(f"Segmentation params: min_segment_length={self.min_segment_length}, max_segment_length={self.max_segment_length}, context_window={self.context_window}, overlap={self.overlap}")
 
+    def set_decode_profile(self, profile: Optional[Union[str, DecodeProfile]] = None) -> DecodeProfile:
+        """Đổi decode profile (beam, VAD, caption mặc định) trên model đang load, không reload weights."""
+        if not isinstance(profile, DecodeProfile):
+            profile = get_decode_profile(profile)
+        self.decode_profile = profile
+        self.beam_size = profile.beam_size
+        return profile
+
     def _reload_model(self, model_path, device=None, compute_type=None):
-        from faster_whisper import WhisperModel
         device = device or self.device
         compute_type = compute_type or self.compute_type
-        self.model = WhisperModel(str(model_path), device=device, compute_type=compute_type)
+        self.model = load_whisper_model(model_path, device, compute_type, num_workers=self.num_workers,
+                                        cpu_threads=self.execution_profile.cpu_threads)
         # Luôn gán lại segmentation params từ giá trị hiện tại của instance
         self._set_segmentation_params(
             self.min_segment_length,
@@ -442,19 +338,22 @@ class Transcriber:
             self.overlap
         )
         self.pipeline = self.model
+        self.batched_pipeline = CaptioningPipeline(self.model, language="vi")
+        self.window_decoder = self.batched_pipeline.window_decoder
+        self._draft_pipeline = None
         logger.info(f"Reloaded model successfully on device={self.device}, compute_type={self.compute_type}, batch_size={self.batch_size}, beam_size={self.beam_size}")
 
     def _load_audio(self, audio_path: str) -> Tuple[np.ndarray, int]:
         """Load and preprocess audio file"""
         try:
-            audio, sr = librosa.load(audio_path, sr=16000)
-            return audio, sr
+            # Qua AudioProcessor để dùng chung PCM cache
+            return self.audio_processor.load_audio(audio_path)
         except Exception as e:
             logger.error(f"Error loading audio: {str(e)}")
             raise
     
-    def _detect_silence(self, audio: np.ndarray, sr: int = 16000) -> List[Tuple[float, float]]:
-        """Detect silence segments in audio"""
+    def _detect_silence(self, audio: np.ndarray, sr: int = 16000, min_silence_len: Optional[int] = None) -> List[Tuple[float, float]]:
+        """Detect silence segments in audio (min_silence_len tính bằng ms, mặc định self.min_silence_len)"""
         try:
             import logging
             logging.info(f"[SILENCE-THRESH] self.silence_thresh={self.silence_thresh}, self.min_silence_len={self.min_silence_len}")
@@ -464,71 +363,91 @@ class Transcriber:
             if self.min_silence_len is None:
                 self.min_silence_len = 1000
                 logging.warning("self.min_silence_len bị None, gán mặc định 1000")
-            # Calculate RMS energy
-            rms = librosa.feature.rms(y=audio)[0]
-            # Convert to dB
-            db = 20 * np.log10(rms + 1e-10)
-            
-            # Find silence segments
-            is_silence = db < self.silence_thresh
-            silence_segments = []
-            
-            start = None
-            for i, silent in enumerate(is_silence):
-                if silent and start is None:
-                    start = i
-                elif not silent and start is not None:
-                    end = i
-                    duration = (end - start) * 512 / sr  # Convert frames to seconds
-                    if duration >= self.min_silence_len / 1000:
-                        silence_segments.append((start * 512 / sr, end * 512 / sr))
-                    start = None
-            
-            return silence_segments
+            min_silence_len = min_silence_len if min_silence_len is not None else self.min_silence_len
+            # RMS theo frame + run-length bằng numpy (xem src/audio_processing/vad.py)
+            return detect_silence(audio, sr, silence_thresh=self.silence_thresh, min_silence_len=min_silence_len)
             
         except Exception as e:
             logger.error(f"Error detecting silence: {str(e)}")
             return []
     
     def _segment_audio(self, audio: np.ndarray, sr: int = 16000) -> List[AudioSegment]:
-        """Segment audio: truyền toàn bộ audio vào model, không tách đoạn theo silence. Nếu audio > 30 phút thì chia đều."""
+        """
+        Chia audio thành các chunk min_segment_length..max_segment_length giây, cắt tại khoảng lặng (VAD năng lượng).
+        Mỗi chunk được mở rộng thêm self.overlap giây về hai phía để không mất ngữ cảnh ở biên;
+        phần trùng lặp được loại khi merge (merge_chunk_segments).
+        """
         try:
             audio_len = len(audio) / sr
-            max_segment_sec = 1800  # 30 phút
+            silences = self._detect_silence(audio, sr, min_silence_len=self.chunk_min_silence_len)
+            spans = plan_chunks(audio_len, silences, min_len=self.min_segment_length, max_len=self.max_segment_length)
             segments = []
-            if audio_len <= max_segment_sec:
-                # Truyền toàn bộ audio vào model, không tách đoạn
+            for core_start, core_end in spans:
+                start = max(0.0, core_start - self.overlap)
+                end = min(audio_len, core_end + self.overlap)
                 segments.append(AudioSegment(
-                    data=audio,
-                    start_time=0.0,
-                    end_time=audio_len,
-                    context=None
+                    data=audio[int(start * sr):int(end * sr)],
+                    start_time=start,
+                    end_time=end,
+                    context=None,
+                    core_start=core_start,
+                    core_end=core_end
                 ))
-                logger.info(f"[SEGMENT-LOG] start=0.00s, end={audio_len:.2f}s (full audio, no split)")
-            else:
-                # Nếu quá lớn, chia đều thành các đoạn 30 phút
-                samples_per_segment = int(max_segment_sec * sr)
-                i = 0
-                while i < len(audio):
-                    end = min(i + samples_per_segment, len(audio))
-                    segments.append(AudioSegment(
-                        data=audio[i:end],
-                        start_time=i/sr,
-                        end_time=end/sr,
-                        context=None
-                    ))
-                    logger.info(f"[SEGMENT-LOG] start={i/sr:.2f}s, end={end/sr:.2f}s (split 30min)")
-                    i += samples_per_segment
+                logger.debug(f"[SEGMENT-LOG] core={core_start:.2f}-{core_end:.2f}s, decode={start:.2f}-{end:.2f}s")
             # Loại bỏ các segment quá ngắn (<0.5s)
             min_len = int(0.5 * sr)
             segments = [seg for seg in segments if len(seg.data) >= min_len]
+            logger.info(f"[SEGMENT-LOG] {len(segments)} chunks | audio={audio_len:.2f}s | silences={len(silences)} | overlap={self.overlap}s")
             if len(segments) == 0:
                 logger.warning("[SEGMENT-LOG] Không có segment nào đủ dài để nhận diện!")
             return segments
         except Exception as e:
             logger.error(f"Error segmenting audio: {str(e)}")
             return []
-    
+
+    def _decode_chunk(self, segment: AudioSegment, captions: Optional[List[str]] = None) -> Tuple[float, float, List[dict]]:
+        """
+        Decode một chunk với word timestamps, trả về (core_start, core_end, segments) theo thời gian tuyệt đối.
+        captions: list nhận caption của chunk, decode trên cùng encoder output (qua CaptioningPipeline riêng cho
+        lời gọi này vì pipeline giữ trạng thái word timestamp), None = không sinh caption.
+        """
+        if captions is None:
+            pipeline, sink = self.pipeline, nullcontext([])
+            kwargs = {}
+        else:
+            pipeline = CaptioningPipeline(self.model, language="vi")
+            sink = pipeline.collect_captions(self.beam_size, self.decode_profile.patience)
+            kwargs = {"batch_size": self.batch_size}
+        with sink as collected:
+            segments, info = pipeline.transcribe(
+                segment.data,
+                language="vi",
+                beam_size=self.beam_size,
+                patience=self.decode_profile.patience,
+                word_timestamps=True,
+                vad_filter=True,
+                vad_parameters=self.decode_profile.vad_parameters,
+                **kwargs
+            )
+            offset = segment.start_time
+            results = []
+            for s in segments:
+                words = [
+                    {"start": offset + w.start, "end": offset + w.end, "word": w.word}
+                    for w in (s.words or [])
+                ]
+                results.append({
+                    "start": offset + s.start,
+                    "end": offset + s.end,
+                    "text": s.text,
+                    "words": words,
+                })
+        if captions is not None:
+            captions.extend(collected)
+        core_start = segment.core_start if segment.core_start is not None else segment.start_time
+        core_end = segment.core_end if segment.core_end is not None else segment.end_time
+        return core_start, core_end, results
+
     def _process_segment(self, segment: AudioSegment) -> str:
         """Process a single audio segment."""
         try:
@@ -546,11 +465,9 @@ class Transcriber:
                 audio,
                 language="vi",
                 beam_size=self.beam_size,
+                patience=self.decode_profile.patience,
                 vad_filter=True,
-                vad_parameters=dict(
-                    min_silence_duration_ms=500,
-                    speech_pad_ms=100
-                )
+                vad_parameters=self.decode_profile.vad_parameters
             )
             if segments is None or info is None:
                 logger.error(f"pipeline.transcribe trả về None: segments={segments}, info={info}")
@@ -562,6 +479,147 @@ class Transcriber:
             logger.error(f"Error processing segment: {str(e)}")
             return ""
     
+    def _transcribe_batched(self, audio: np.ndarray, pipeline: Optional[CaptioningPipeline] = None,
+                            beam_size: Optional[int] = None, captions: Optional[List[str]] = None) -> List[dict]:
+        """
+        Batched inference: VAD của faster-whisper cắt audio thành các chunk speech (<=30s),
+        decode theo batch WHISPER_BATCH_SIZE, trả về segment đã sắp xếp theo thời gian.
+        captions: list nhận caption (translate) decode trên cùng encoder output của từng batch, None = không sinh caption.
+        """
+        pipeline = pipeline or self.batched_pipeline
+        with pipeline.collect_captions(self.beam_size, self.decode_profile.patience) if captions is not None \
+                else nullcontext([]) as collected:
+            segments, info = pipeline.transcribe(
+                audio,
+                language="vi",
+                beam_size=beam_size or self.beam_size,
+                patience=self.decode_profile.patience,
+                batch_size=self.batch_size,
+                vad_filter=True,
+                vad_parameters=self.decode_profile.vad_parameters
+            )
+            # segments là generator: encode/decode (cả caption) chạy khi duyệt, phải nằm trong collect_captions
+            results = [
+                {
+                    "start": round(float(s.start), 2),
+                    "end": round(float(s.end), 2),
+                    "text": s.text.strip(),
+                    "avg_logprob": float(s.avg_logprob),
+                    "no_speech_prob": float(s.no_speech_prob),
+                }
+                for s in segments if s.text and s.text.strip()
+            ]
+        if captions is not None:
+            captions.extend(collected)
+        results.sort(key=lambda seg: seg["start"])
+        return results
+
+    def _get_draft_pipeline(self) -> Tuple[CaptioningPipeline, int]:
+        """
+        Pipeline bản nháp cho cascade: model nhỏ (WHISPER_DRAFT_MODEL, WHISPER_DRAFT_COMPUTE_TYPE) với greedy,
+        hoặc chính model lớn với greedy nếu không cấu hình/không tìm thấy model nháp. Trả về (pipeline, beam_size).
+        """
+        if self._draft_pipeline is None:
+            draft = None
+            if self.draft_model_name:
+                try:
+                    draft_dir = resolve_model_dir(self.draft_model_name)
+                    draft = load_whisper_model(draft_dir, self.device, settings.WHISPER_DRAFT_COMPUTE_TYPE,
+                                               num_workers=self.num_workers, cpu_threads=self.execution_profile.cpu_threads)
+                    logger.info(f"[CASCADE] Draft model {draft_dir} ({settings.WHISPER_DRAFT_COMPUTE_TYPE})")
+                except Exception as e:
+                    logger.warning(f"[CASCADE] Không load được draft model {self.draft_model_name}, dùng greedy trên model chính: {e}")
+            self._draft_pipeline = CaptioningPipeline(draft, language="vi") if draft is not None else self.batched_pipeline
+        return self._draft_pipeline, 1
+
+    def _redecode_span(self, audio: np.ndarray, sr: int, span: Tuple[float, float]) -> Tuple[float, float, List[dict]]:
+        """Decode lại một khoảng bằng model lớn với beam đầy đủ, trả về segment theo thời gian tuyệt đối."""
+        start, end = span
+        segments, info = self.pipeline.transcribe(
+            audio[int(start * sr):int(end * sr)],
+            language="vi",
+            beam_size=self.beam_size,
+            patience=self.decode_profile.patience,
+            vad_filter=True,
+            vad_parameters=self.decode_profile.vad_parameters
+        )
+        results = [
+            {
+                "start": round(start + float(s.start), 2),
+                "end": round(start + float(s.end), 2),
+                "text": s.text.strip(),
+                "avg_logprob": float(s.avg_logprob),
+                "no_speech_prob": float(s.no_speech_prob),
+            }
+            for s in segments if s.text and s.text.strip()
+        ]
+        return start, end, results
+
+    def _transcribe_cascade(self, audio: np.ndarray, sr: int = 16000,
+                            captions: Optional[List[str]] = None) -> Tuple[List[dict], dict]:
+        """
+        Cascade hai tầng: transcribe toàn bộ bằng bản nháp nhanh, rồi chỉ decode lại bằng model lớn
+        (beam_size đầy đủ) các segment có avg_logprob/no_speech_prob không đạt ngưỡng.
+        Trả về (segments, stats) với stats ghi số giây đã escalate.
+        captions: nhận caption decode trên encoder output của lượt nháp (lượt duy nhất encode toàn bộ audio).
+        """
+        duration = len(audio) / sr
+        t0 = time.time()
+        draft_pipeline, draft_beam = self._get_draft_pipeline()
+        draft = self._transcribe_batched(audio, pipeline=draft_pipeline, beam_size=draft_beam, captions=captions)
+        draft_time = time.time() - t0
+        spans = escalation_spans(draft, self.cascade_logprob_threshold, self.cascade_no_speech_threshold, duration)
+        t1 = time.time()
+        redecoded = []
+        if spans:
+            with ThreadPoolExecutor(max_workers=max(1, self.num_workers)) as executor:
+                futures = [executor.submit(self._redecode_span, audio, sr, span) for span in spans]
+                for span, future in zip(spans, futures):
+                    try:
+                        redecoded.append(future.result())
+                    except Exception as e:
+                        # Giữ bản nháp cho khoảng này nếu decode lại lỗi
+                        logger.error(f"[CASCADE] Lỗi decode lại {span[0]:.2f}-{span[1]:.2f}s: {e}")
+        segments = replace_spans(draft, redecoded)
+        escalated_seconds = sum(end - start for start, end, _ in redecoded)
+        stats = {
+            "draft_model": self.draft_model_name if draft_pipeline is not self.batched_pipeline else f"{self.model_name} (greedy)",
+            "draft_segments": len(draft),
+            "escalated_spans": len(redecoded),
+            "escalated_seconds": round(escalated_seconds, 2),
+            "escalated_ratio": round(escalated_seconds / duration, 4) if duration else 0.0,
+            "draft_time": round(draft_time, 2),
+            "redecode_time": round(time.time() - t1, 2),
+        }
+        logger.info(f"[CASCADE] {stats}")
+        return segments, stats
+
+    def _transcribe_segments(self, segments: List[AudioSegment], captions: Optional[List[str]] = None) -> List[dict]:
+        """
+        Decode song song các chunk (mỗi chunk một thread, model chạy num_workers luồng) rồi merge vùng overlap.
+        captions: nhận caption của các chunk theo thứ tự thời gian (cùng encoder output với transcript).
+        """
+        # num_workers theo execution profile (profile autotune hoặc chia core CPU)
+        max_workers = max(1, self.num_workers)
+        t0 = time.time()
+        chunk_results = []
+        chunk_captions = [[] if captions is not None else None for _ in segments]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._decode_chunk, segment, sink) for segment, sink in zip(segments, chunk_captions)]
+            for idx, future in enumerate(futures):
+                try:
+                    chunk_results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Error processing segment {idx+1}/{len(futures)}: {str(e)}")
+        if captions is not None:
+            captions.extend(text for sink in chunk_captions for text in sink)
+        merged = merge_chunk_segments(chunk_results, context_window=self.context_window)
+        logger.info(f"[TRANSCRIBE] Decode {len(segments)} chunks với {max_workers} workers trong {time.time()-t0:.2f}s | merged_segments={len(merged)}")
+        return [
+            {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+            for seg in merged
+        ]
+
     def _post_process_text(self, text: str) -> str:
         """Post-process transcribed text: loại filler, chuẩn hóa dấu câu, kiểm tra ngôn ngữ."""
         try:
@@ -591,38 +649,148 @@ class Transcriber:
         # TODO: Tích hợp model phát hiện nhiễu
         return False
     
+    def _caption_windows(self, audio: np.ndarray, sr: int = 16000) -> List[Tuple[float, float, np.ndarray]]:
+        """Cắt audio thành các cửa sổ <= 30s tại khoảng lặng để decode trực tiếp trên encoder output."""
+        duration = len(audio) / sr
+        silences = self._detect_silence(audio, sr, min_silence_len=self.chunk_min_silence_len)
+        spans = plan_chunks(duration, silences, min_len=min(self.min_segment_length, 30), max_len=min(self.max_segment_length, 30))
+        min_len = int(0.5 * sr)
+        windows = []
+        for start, end in spans:
+            data = audio[int(start * sr):int(end * sr)]
+            if len(data) >= min_len:
+                windows.append((start, end, data))
+        return windows
+
     def _generate_caption(self, audio: np.ndarray, sr: int = 16000) -> str:
-        """Sinh caption mô tả toàn bộ nội dung audio bằng Whisper (nếu hỗ trợ)."""
+        """Sinh caption (Whisper task='translate') cho toàn bộ audio, decode trực tiếp trên encoder output từng cửa sổ."""
         try:
-            # Nếu model hỗ trợ captioning (Whisper >= large-v3), dùng transcribe với task='translate' để sinh mô tả
-            if hasattr(self.model, 'transcribe'):
-                segments, info = self.model.transcribe(
-                    audio,
-                    language="vi",
-                    beam_size=self.beam_size,
-                    vad_filter=True,
-                    vad_parameters=dict(
-                        min_silence_duration_ms=500,
-                        speech_pad_ms=100
-                    ),
-                    task="translate"  # Whisper hỗ trợ mô tả audio qua task này
-                )
-                caption = " ".join([s.text for s in segments if hasattr(s, 'text') and s.text])
-                return caption
-            else:
-                return ""
+            captions = []
+            windows = self._caption_windows(audio, sr)
+            for i in range(0, len(windows), max(1, self.batch_size)):
+                batch = windows[i:i + max(1, self.batch_size)]
+                encoder_output = self.window_decoder.encode([w[2] for w in batch])
+                for cap in self.window_decoder.generate(encoder_output, task="translate", beam_size=self.beam_size,
+                                                        patience=self.decode_profile.patience):
+                    if cap["text"] and not is_no_speech(cap):
+                        captions.append(cap["text"])
+            return " ".join(captions)
         except Exception as e:
             logger.error(f"Error generating caption: {str(e)}")
             return ""
-    
-    def transcribe(self, audio_path: str) -> dict:
-        """Transcribe audio file to text with parallel processing và context analysis"""
-        logger.info(f"[TRANSCRIBER] Bắt đầu transcribe | audio_path={audio_path}")
+
+    def generate_caption(self, audio: np.ndarray, sr: int = 16000, decode_profile: Optional[str] = None) -> str:
+        """Sinh caption theo yêu cầu (caption_mode='lazy')."""
+        if decode_profile:
+            self.set_decode_profile(decode_profile)
+        return self._generate_caption(audio, sr)
+
+    def transcribe(self, audio_path: str, caption_mode: Optional[str] = None, decode_profile: Optional[str] = None,
+                   compact: Optional[bool] = None) -> dict:
+        """Transcribe audio file to text: decode file rồi chuyển sang transcribe_pcm"""
+        audio, sr = self._load_audio(audio_path)
+        logger.info(f"[TRANSCRIBER] Đã load audio | path={audio_path} | shape={audio.shape if hasattr(audio, 'shape') else 'N/A'} | sr={sr}")
+        return self.transcribe_pcm(audio, sr, source=audio_path, caption_mode=caption_mode, decode_profile=decode_profile,
+                                   compact=compact)
+
+    def transcribe_stream(self, audio: np.ndarray, sr: int = 16000, decode_profile: Optional[str] = None,
+                          compact: Optional[bool] = None) -> Iterator[dict]:
+        """
+        Yield từng segment {start, end, text, avg_logprob, no_speech_prob} ngay khi faster-whisper decode xong
+        (generator của model.transcribe), không chờ hết file, không caption/phân tích/tóm tắt.
+        Timestamp luôn theo audio gốc (kể cả khi nén vùng không có tiếng nói).
+        """
+        if sr != 16000:
+            raise ValueError(f"transcribe_stream yêu cầu audio 16kHz, nhận sr={sr}")
+        profile = self.set_decode_profile(decode_profile)
+        audio = np.asarray(audio, dtype=np.float32)
+        offset_map = None
+        if compact if compact is not None else settings.WHISPER_COMPACTION_ENABLED:
+            compacted = compact_speech(audio, sr)
+            if len(compacted.audio):
+                audio, offset_map = compacted.audio, compacted.offset_map
+        segments, info = self.model.transcribe(
+            audio,
+            language="vi",
+            beam_size=self.beam_size,
+            patience=profile.patience,
+            vad_filter=True,
+            vad_parameters=profile.vad_parameters
+        )
+        for s in segments:
+            text = s.text.strip() if s.text else ""
+            if not text:
+                continue
+            start, end = float(s.start), float(s.end)
+            if offset_map is not None:
+                start, end = (float(t) for t in offset_map.to_original([start, end]))
+            yield {
+                "start": round(start, 2),
+                "end": round(end, 2),
+                "text": text,
+                "avg_logprob": float(s.avg_logprob),
+                "no_speech_prob": float(s.no_speech_prob),
+            }
+
+    def transcribe_pcm(self, audio: np.ndarray, sr: int = 16000, source: Optional[str] = None, caption_mode: Optional[str] = None,
+                       decode_profile: Optional[str] = None, compact: Optional[bool] = None,
+                       precomputed_segments: Optional[List[dict]] = None, precomputed_caption: Optional[str] = None,
+                       triage: Optional[dict] = None) -> dict:
+        """
+        Transcribe PCM đã decode sẵn (mono float32) với parallel processing và context analysis.
+        Service layer decode file một lần rồi truyền buffer qua các bước, không decode lại.
+
+        Args:
+            audio: PCM mono float32
+            sr: Sample rate của audio (phải là 16000 như Whisper yêu cầu)
+            source: Tên/đường dẫn file gốc, chỉ dùng để log
+            caption_mode: "off" (không sinh caption), "eager" (sinh caption cùng lúc transcribe, decode translate
+                trên cùng encoder output với transcript ở mọi inference mode), "lazy" (để trống, sinh khi được yêu cầu). Mặc định theo decode profile,
+                rồi WHISPER_CAPTION_MODE.
+            decode_profile: "fast" | "balanced" | "accurate" (xem decode_profiles.py), None = WHISPER_DECODE_PROFILE.
+                Chỉ đổi tùy chọn decode trên model đang load.
+            compact: Cắt vùng không có tiếng nói trước khi decode rồi remap timestamp về audio gốc,
+                None = WHISPER_COMPACTION_ENABLED.
+            precomputed_segments: Segment {start, end, text} đã decode trước (ingest pipelined trong lúc upload),
+                có thì bỏ qua inference/compaction, chỉ chạy caption (eager), phân tích và tóm tắt.
+            precomputed_caption: Caption đã sinh cùng precomputed_segments (batch clip ngắn, chunk ingest), None = tự sinh nếu eager.
+            triage: Kết quả triage_audio (as_dict) service đã tính cho audio này, None = tự triage (TRIAGE_ENABLED).
+        """
+        profile = self.set_decode_profile(decode_profile)
+        caption_mode = caption_mode or profile.caption_mode or self.caption_mode
+        if caption_mode not in CAPTION_MODES:
+            logger.warning(f"[TRANSCRIBER] caption_mode không hợp lệ: {caption_mode}, dùng {self.caption_mode}")
+            caption_mode = self.caption_mode
+        logger.info(f"[TRANSCRIBER] Bắt đầu transcribe | source={source} | samples={len(audio)} | sr={sr} | caption_mode={caption_mode} | decode_profile={profile.name}")
+        if sr != 16000:
+            raise ValueError(f"transcribe_pcm yêu cầu audio 16kHz, nhận sr={sr}")
         try:
             start_time = time.time()
-            # Load audio và nhận diện
-            audio, sr = self._load_audio(audio_path)
-            logger.info(f"[TRANSCRIBER] Đã load audio | path={audio_path} | shape={audio.shape if hasattr(audio, 'shape') else 'N/A'} | sr={sr}")
+            audio = np.asarray(audio, dtype=np.float32)
+            if triage is None and settings.TRIAGE_ENABLED:
+                triage = triage_audio(audio, sr).as_dict()
+            if triage:
+                # File rỗng/im lặng: không decode, không gửi Ollama
+                if triage.get("is_empty"):
+                    logger.warning(f"[TRANSCRIBER] Triage: bỏ qua ASR | source={source} | {triage.get('reason')}")
+                    return {
+                        "transcription": "",
+                        "transcript": "",
+                        "caption": "",
+                        "caption_mode": caption_mode,
+                        "decode_profile": profile.name,
+                        "segments": [],
+                        "cascade": None,
+                        "compaction": None,
+                        "analysis": {},
+                        "summary": "",
+                        "confidence": 0.0,
+                        "duration": triage.get("duration"),
+                        "language": "vi",
+                        "quality_score": 0.0,
+                        "processing_time": time.time() - start_time,
+                        "triage": triage,
+                    }
             # --- Bổ sung bước làm sạch ---
             # audio = self.audio_processor.normalize_audio(audio)
             # audio = self.audio_processor.remove_silence(audio, top_db=20)
@@ -637,37 +805,51 @@ class Transcriber:
                     logger.info(f"[GPU] VRAM used before: {torch.cuda.memory_allocated() // (1024**2)} MB")
                 except Exception as e:
                     pass
-            # Segment audio
-            segments = self._segment_audio(audio, sr)
-            logger.info(f"[TRANSCRIBER] Đã segment audio | num_segments={len(segments)}")
-            # --- Tối ưu ThreadPoolExecutor cho batch lớn ---
-            max_workers = min(self.batch_size, 8)
-            try:
-                import torch
-                vram = torch.cuda.get_device_properties(0).total_memory // (1024 ** 3)
-                if self.device == "cuda" and self.batch_size > 8 and vram >= 8:
-                    max_workers = min(self.batch_size, 16)
-                if self.device == "cuda" and self.batch_size > 12 and vram >= 12:
-                    max_workers = min(self.batch_size, 32)
-            except Exception as e:
-                pass
-            segment_times = []
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-                for segment in segments:
-                    t0 = time.time()
-                    future = executor.submit(self._process_segment, segment)
-                    futures.append((future, t0))
-            results = []
-            for idx, (future, t0) in enumerate(futures):
-                result = future.result()
-                t1 = time.time()
-                segment_times.append(t1 - t0)
-                logger.info(f"[TRANSCRIBER] Segment {idx+1}/{len(futures)} processed in {t1-t0:.2f}s | result_len={len(result) if result else 0}")
-                if result:
-                    results.append(result)
-            if len(segment_times) > 0:
-                logger.info(f"[TRANSCRIBE] Thời gian xử lý từng segment: {segment_times}")
+            timed_segments = []
+            caption = ""
+            cascade_stats = None
+            compaction_stats = None
+            offset_map = None
+            asr_audio = audio
+            if precomputed_segments is None and (compact if compact is not None else settings.WHISPER_COMPACTION_ENABLED):
+                # Decode trên buffer chỉ còn vùng tiếng nói, thời gian decode giảm theo tỉ lệ im lặng
+                compacted = compact_speech(audio, sr)
+                if len(compacted.audio):
+                    asr_audio, offset_map = compacted.audio, compacted.offset_map
+                    compaction_stats = compacted.stats()
+                    logger.info(f"[COMPACTION] {compaction_stats}")
+                else:
+                    logger.warning("[COMPACTION] VAD không tìm thấy vùng tiếng nói, decode trên audio gốc")
+            t0 = time.time()
+            # Eager: caption decode trên cùng encoder output của mode inference đang chạy, không encode lại audio
+            captions = [] if caption_mode == "eager" and precomputed_segments is None else None
+            if precomputed_segments is not None:
+                timed_segments = list(precomputed_segments)
+                results = [seg["text"] for seg in timed_segments]
+                segments = timed_segments
+                if caption_mode == "eager":
+                    if precomputed_caption is None:
+                        logger.warning("[TRANSCRIBER] Segment precomputed không kèm caption, sinh caption riêng (encode thêm một lần)")
+                    caption = precomputed_caption if precomputed_caption is not None else self._generate_caption(audio, sr)
+            elif self.inference_mode == "batched":
+                timed_segments = self._transcribe_batched(asr_audio, captions=captions)
+                results = [seg["text"] for seg in timed_segments]
+                segments = timed_segments
+            elif self.inference_mode == "cascade":
+                timed_segments, cascade_stats = self._transcribe_cascade(asr_audio, sr, captions=captions)
+                results = [seg["text"] for seg in timed_segments]
+                segments = timed_segments
+            else:
+                segments = self._segment_audio(asr_audio, sr)
+                logger.info(f"[TRANSCRIBER] Đã segment audio | num_segments={len(segments)}")
+                timed_segments = self._transcribe_segments(segments, captions=captions)
+                results = [seg["text"] for seg in timed_segments]
+            if captions is not None:
+                caption = " ".join(captions)
+            if offset_map is not None:
+                timed_segments = remap_segments(timed_segments, offset_map)
+                compaction_stats["decode_time"] = round(time.time() - t0, 2)
+            logger.info(f"[TRANSCRIBER] Inference mode={'precomputed' if precomputed_segments is not None else self.inference_mode} | batch_size={self.batch_size} | num_segments={len(segments)} | time={time.time()-t0:.2f}s")
             # Log VRAM sau khi transcribe
             if self.device == "cuda":
                 try:
@@ -687,8 +869,6 @@ class Transcriber:
             if len(text) < min_length or char_ratio < (1 - max_invalid_ratio):
                 logger.warning(f"[TRANSCRIBE] Transcript không đạt chuẩn: length={len(text)}, char_ratio={char_ratio:.2f}")
                 text = "[CẢNH BÁO] Transcript không đạt chuẩn chất lượng, vui lòng kiểm tra lại file audio."
-            # --- Sinh caption mô tả audio ---
-            caption = self._generate_caption(audio, sr)
             # Phân tích ngữ cảnh bằng Ollama
             context_analysis = self.llm_processor.analyze_context(text)
             # --- Chuẩn hóa context_analysis ---
@@ -735,6 +915,11 @@ class Transcriber:
                 "transcription": text,
                 "transcript": text,
                 "caption": caption,
+                "caption_mode": caption_mode,
+                "decode_profile": profile.name,
+                "segments": timed_segments,
+                "cascade": cascade_stats,
+                "compaction": compaction_stats,
                 "analysis": context_analysis,
                 "summary": summary,
                 "confidence": confidence,
@@ -743,7 +928,7 @@ class Transcriber:
                 "quality_score": quality_score,
                 "processing_time": time.time() - start_time
             }
-            logger.info(f"[TRANSCRIBER] Kết quả transcribe | audio_path={audio_path} | result_keys={list(result.keys())}")
+            logger.info(f"[TRANSCRIBER] Kết quả transcribe | source={source} | result_keys={list(result.keys())}")
             return result
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}", exc_info=True)
@@ -0,0 +1,125 @@
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+
+
+def is_no_speech(result: dict) -> bool:
+    """Cùng ngưỡng no_speech/logprob với faster-whisper để bỏ cửa sổ không có tiếng nói."""
+    return result["no_speech_prob"] > 0.6 and result["avg_logprob"] < -1.0
+
+def window_segments(windows: Sequence[Tuple[float, float, np.ndarray]], transcripts: Sequence[dict]) -> List[dict]:
+    """Segment {start, end, text, avg_logprob, no_speech_prob} từ kết quả transcribe của từng cửa sổ (start, end, data)."""
+    segments = []
+    for (start, end, _), tr in zip(windows, transcripts):
+        if tr["text"] and not is_no_speech(tr):
+            segments.append({
+                "start": round(start, 2),
+                "end": round(end, 2),
+                "text": tr["text"],
+                "avg_logprob": float(tr["avg_logprob"]),
+                "no_speech_prob": float(tr["no_speech_prob"]),
+            })
+    return segments
+
+class WindowDecoder:
+    """
+    Decode trực tiếp trên encoder output của CTranslate2 cho các cửa sổ audio <= 30s.
+    Cho phép encode một lần rồi decode nhiều task (transcribe, translate) trên cùng encoder output,
+    và gộp nhiều cửa sổ (kể cả từ nhiều file khác nhau) vào một batch.
+    """
+
+    def __init__(self, model: WhisperModel, language: str = "vi"):
+        self.model = model
+        self.language = language
+        self._tokenizers: Dict[str, Tokenizer] = {}
+
+    def tokenizer(self, task: str) -> Tokenizer:
+        if task not in self._tokenizers:
+            self._tokenizers[task] = Tokenizer(
+                self.model.hf_tokenizer,
+                self.model.model.is_multilingual,
+                task=task,
+                language=self.language,
+            )
+        return self._tokenizers[task]
+
+    def features(self, windows: Sequence[np.ndarray]) -> np.ndarray:
+        """Mel features (batch, n_mels, 3000) cho các cửa sổ audio 16kHz, mỗi cửa sổ tối đa 30s."""
+        return np.stack([
+            pad_or_trim(self.model.feature_extractor(window)[..., :-1])
+            for window in windows
+        ])
+
+    def encode(self, windows: Sequence[np.ndarray]):
+        """Tính mel features và chạy encoder một lần cho cả batch cửa sổ."""
+        return self.model.encode(self.features(windows))
+
+    def generate(self, encoder_output, task: str = "transcribe", beam_size: int = 5,
+                 batch_size: int = None, **kwargs) -> List[dict]:
+        """
+        Decode trên encoder output đã có. Trả về mỗi cửa sổ một dict
+        {text, tokens, avg_logprob, no_speech_prob}.
+        """
+        tokenizer = self.tokenizer(task)
+        prompt = self.model.get_prompt(tokenizer, previous_tokens=[], without_timestamps=True)
+        batch_size = batch_size or encoder_output.shape[0]
+        results = self.model.model.generate(
+            encoder_output,
+            [list(prompt) for _ in range(batch_size)],
+            beam_size=beam_size,
+            max_length=self.model.max_length,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            **kwargs,
+        )
+        outputs = []
+        for result in results:
+            tokens = result.sequences_ids[0]
+            seq_len = len(tokens)
+            outputs.append({
+                "text": tokenizer.decode(tokens).strip(),
+                "tokens": tokens,
+                # Cùng công thức avg_logprob với faster-whisper (length_penalty=1)
+                "avg_logprob": result.scores[0] * seq_len / (seq_len + 1),
+                "no_speech_prob": result.no_speech_prob,
+            })
+        return outputs
+
+class CaptioningPipeline(BatchedInferencePipeline):
+    """
+    BatchedInferencePipeline decode thêm caption (task translate) trên chính encoder output của mỗi batch chunk VAD,
+    nên transcript (giữ nguyên timestamp theo segment của faster-whisper) và caption chỉ tốn một lần encode.
+    Caption chỉ được sinh khi transcribe chạy bên trong collect_captions() của thread hiện tại.
+    """
+
+    def __init__(self, model: WhisperModel, language: str = "vi"):
+        super().__init__(model=model)
+        self.window_decoder = WindowDecoder(model, language=language)
+        self._local = threading.local()
+
+    @contextmanager
+    def collect_captions(self, beam_size: int = 5, patience: float = 1.0) -> Iterator[List[str]]:
+        """Trong khối with, mọi batch được encode cũng được decode translate; caption theo thứ tự chunk."""
+        captions: List[str] = []
+        self._local.sink = (captions, beam_size, patience)
+        try:
+            yield captions
+        finally:
+            self._local.sink = None
+
+    def generate_segment_batched(self, features, tokenizer, options):
+        encoder_output, outputs = super().generate_segment_batched(features, tokenizer, options)
+        sink = getattr(self._local, "sink", None)
+        if sink is not None:
+            captions, beam_size, patience = sink
+            translations = self.window_decoder.generate(encoder_output, task="translate", beam_size=beam_size,
+                                                        patience=patience)
+            captions.extend(cap["text"] for out, cap in zip(outputs, translations)
+                            if cap["text"] and not is_no_speech(out))
+        return encoder_output, outputs
@@ -0,0 +1,121 @@
+import re
+import math
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tách câu tại dấu kết câu hoặc xuống dòng (ranh giới segment/transcript khi ghép nhiều file)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+# Ghi chú từng phần: giữ đủ chi tiết để bước reduce và các prompt tóm tắt/phân tích sau đó không mất thông tin
+MAP_PROMPT = """Đây là một phần liên tiếp của một hội thoại dài. Hãy ghi chú lại đầy đủ nhưng súc tích nội dung phần này:
+các bên tham gia (tên, vai trò), thực thể (người, địa điểm, thời gian, số điện thoại, email, số giấy tờ, số tiền),
+sự kiện, hành động, quyết định, cam kết, cảm xúc, dấu hiệu bất thường, tiếng lóng/ẩn ý. Giữ nguyên tên riêng và con số.
+Chỉ trả về ghi chú, không thêm lời dẫn.
+
+Nội dung:
+{text}"""
+
+REDUCE_PROMPT = """Dưới đây là các ghi chú tóm tắt liên tiếp của một hội thoại dài. Hãy gộp chúng thành một bản ghi chú duy nhất theo
+trình tự thời gian, loại bỏ trùng lặp nhưng không bỏ sót thực thể, con số, quyết định, hành động và dấu hiệu bất thường.
+Chỉ trả về ghi chú, không thêm lời dẫn.
+
+{text}"""
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token theo số ký tự (tiếng Việt có dấu tốn nhiều token hơn tiếng Anh), không cần tokenizer."""
+    return math.ceil(len(text) / settings.SUMMARY_CHARS_PER_TOKEN)
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+def split_into_chunks(units: List[str], max_tokens: int, count_tokens: Callable[[str], int] = estimate_tokens) -> List[str]:
+    """
+    Gộp tuần tự các đơn vị (câu, segment) thành chunk không quá max_tokens, chỉ cắt tại ranh giới đơn vị.
+    Đơn vị dài hơn budget (câu không có dấu chấm) mới bị cắt theo từ.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for unit in units:
+        cost = count_tokens(unit) + 1
+        if cost > max_tokens:
+            words = unit.split()
+            per_piece = max(1, len(words) * max_tokens // cost)
+            pieces = [" ".join(words[i:i + per_piece]) for i in range(0, len(words), per_piece)]
+        else:
+            pieces = [unit]
+        for piece in pieces:
+            cost = count_tokens(piece) + 1
+            if current and used + cost > max_tokens:
+                chunks.append(" ".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def map_reduce(text: str, summarize: Callable[[str, int], str], max_tokens: int,
+               count_tokens: Callable[[str], int] = estimate_tokens, max_workers: int = 1,
+               max_passes: Optional[int] = None) -> str:
+    """
+    Tóm tắt phân cấp: cắt text thành chunk <= max_tokens tại ranh giới câu, tóm tắt các chunk song song
+    (summarize(chunk, level), level 0 = transcript gốc), rồi gộp các bản tóm tắt liền kề thành
+    chunk mới và tóm tắt tiếp cho tới khi vừa một chunk. Text đã vừa budget thì trả về nguyên văn.
+    """
+    max_passes = max_passes or settings.SUMMARY_MAX_REDUCE_PASSES
+    if count_tokens(text) <= max_tokens:
+        return text
+    units = split_sentences(text)
+    level = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while True:
+            chunks = split_into_chunks(units, max_tokens, count_tokens)
+            if len(chunks) <= 1 and level > 0:
+                return chunks[0] if chunks else ""
+            if level >= max_passes:
+                # Hết số lượt: ghép toàn bộ chunk còn lại theo thứ tự (có thể vượt budget) thay vì bỏ phần sau
+                logger.warning(f"[MAP_REDUCE] Dừng sau {level} lượt, còn {len(chunks)} chunk "
+                               f"({sum(count_tokens(c) for c in chunks)} token > {max_tokens}); ghép nguyên các chunk")
+                return "\n".join(chunks)
+            t0 = time.time()
+            summaries = list(executor.map(lambda chunk: summarize(chunk, level), chunks))
+            logger.info(f"[MAP_REDUCE] Lượt {level}: {len(chunks)} chunk -> {sum(count_tokens(s) for s in summaries)} token "
+                        f"| {time.time() - t0:.2f}s")
+            # Mỗi bản tóm tắt là một đơn vị của lượt reduce kế tiếp, giữ nguyên thứ tự thời gian
+            units = [s.strip() for s in summaries if s and s.strip()]
+            level += 1
+
+def condense_transcript(transcript: str, model: str, use_cache: bool = True, max_tokens: Optional[int] = None) -> str:
+    """
+    Transcript vừa SUMMARY_CHUNK_TOKENS thì trả về nguyên văn; dài hơn thì map-reduce qua Ollama thành bản ghi chú
+    vừa một prompt. Ghi chú từng chunk nằm trong LLM cache (key theo nội dung chunk), nên tóm tắt và phân tích
+    ngữ cảnh cùng transcript, hay tóm tắt lại, không sinh lại các chunk đã có.
+    """
+    if not settings.SUMMARY_MAP_REDUCE_ENABLED:
+        return transcript
+    from src.services.llm_client import ollama_client, OllamaError
+    max_tokens = max_tokens or settings.SUMMARY_CHUNK_TOKENS
+    options = {"temperature": 0.2, "top_p": 0.9, "top_k": 40, "num_ctx": settings.SUMMARY_NUM_CTX,
+               "num_predict": settings.SUMMARY_CHUNK_SUMMARY_TOKENS}
+
+    def summarize(chunk: str, level: int) -> str:
+        # Prompt chỉ phụ thuộc nội dung chunk: key LLM cache chính là hash nội dung chunk
+        prompt = (MAP_PROMPT if level == 0 else REDUCE_PROMPT).format(text=chunk)
+        return ollama_client.generate(model, prompt, options=options, use_cache=use_cache)
+
+    t0 = time.time()
+    try:
+        notes = map_reduce(transcript, summarize, max_tokens, max_workers=ollama_client.max_concurrency)
+    except OllamaError as e:
+        logger.error(f"[MAP_REDUCE] Ollama lỗi khi tóm tắt theo chunk, dùng transcript gốc: {e}")
+        return transcript
+    if notes is not transcript:
+        logger.info(f"[MAP_REDUCE] Transcript {estimate_tokens(transcript)} token -> ghi chú {estimate_tokens(notes)} token "
+                    f"| model={model} | {time.time() - t0:.2f}s")
+    return notes
@@ -7,6 +7,12 @@ from transformers import T5ForConditionalGeneration, T5Tokenizer
 import re
 import unicodedata
 import json
+from src.core.config import settings
+from src.core.model_registry import model_registry, estimate_path_size
+from src.summarization.map_reduce import map_reduce
+
+# Giới hạn input của T5/BART
+MAX_INPUT_TOKENS = 1024
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,12 +27,7 @@ class Summarizer:
         self.model_name = model_name
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         # Chọn model path đúng
-        if "bart" in model_name:
-            model_path = Path("models") / "bart-large-cnn"
-        elif "t5" in model_name or "mt5" in model_name:
-            model_path = Path("models") / "t5-base"
-        else:
-            model_path = None
+        model_path = _summarizer_model_path(model_name)
         # Ưu tiên load local, không được phép tải về online
         if model_path and model_path.exists():
             logger.info(f"Loading model from {model_path}")
@@ -158,35 +159,16 @@ class Summarizer:
                     prompt += f"\nThực thể: {json.dumps(context['entities'], ensure_ascii=False)}"
                 if 'privacy_summary' in context:
                     prompt += f"\nThông tin nhạy cảm: {context['privacy_summary']}"
-                prompt += f"\nNội dung hội thoại: {text}"
-                input_text = prompt
+                prompt += "\nNội dung hội thoại: "
             else:
-                input_text = f"summarize: {text}"
-            inputs = self.tokenizer.encode(
-                input_text,
-                max_length=1024,
-                truncation=True,
-                return_tensors="pt"
-            ).to(self.device)
-            
-            # Generate summary
-            summary_ids = self.model.generate(
-                inputs,
-                max_length=max_length,
-                min_length=min_length,
-                num_beams=4,
-                length_penalty=2.0,
-                early_stopping=True,
-                no_repeat_ngram_size=3
-            )
-            
-            # Decode summary
-            summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+                prompt = "summarize: "
+            # Phần hội thoại vượt giới hạn input được tóm tắt phân cấp thay vì bị cắt
+            budget = max(MAX_INPUT_TOKENS // 4, MAX_INPUT_TOKENS - self.count_tokens(prompt) - 8)
+            input_text = prompt + self.condense(text, budget)
+
+            summary = self._generate(input_text, max_length=max_length, min_length=min_length)
             logger.info(f"[SUMMARIZER] Đã sinh summary | summary_len={len(summary)}")
             
-            # Remove <extra_id_*> tokens if present
-            summary = re.sub(r'<extra_id_\d+>', '', summary)
-            
             # Apply post-processing
             summary = self.normalize_text(summary)
             summary = self.improve_structure(summary)
@@ -210,6 +192,43 @@ class Summarizer:
             logger.error(f"Error generating summary: {str(e)}", exc_info=True)
             return text  # Return original text if summarization fails
     
+    def _generate(self, input_text: str, max_length: int, min_length: int) -> str:
+        """Sinh text từ input (cắt ở MAX_INPUT_TOKENS), bỏ các token <extra_id_*>."""
+        inputs = self.tokenizer.encode(
+            input_text,
+            max_length=MAX_INPUT_TOKENS,
+            truncation=True,
+            return_tensors="pt"
+        ).to(self.device)
+        summary_ids = self.model.generate(
+            inputs,
+            max_length=max_length,
+            min_length=min_length,
+            num_beams=4,
+            length_penalty=2.0,
+            early_stopping=True,
+            no_repeat_ngram_size=3
+        )
+        summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+        return re.sub(r'<extra_id_\d+>', '', summary)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def condense(self, text: str, max_tokens: int) -> str:
+        """
+        Text dài hơn max_tokens: tóm tắt từng chunk (cắt tại ranh giới câu) rồi gộp dần (map-reduce)
+        cho tới khi vừa max_tokens. Text ngắn trả về nguyên văn.
+        """
+        if not settings.SUMMARY_MAP_REDUCE_ENABLED:
+            return text
+        return map_reduce(
+            text,
+            lambda chunk, level: self._generate(f"summarize: {chunk}", max_length=200, min_length=40),
+            max_tokens,
+            count_tokens=self.count_tokens,
+        )
+
     def summarize_segments(self,
                           segments: List[str],
                           max_length: Optional[int] = None,
@@ -285,4 +304,21 @@ class Summarizer:
         # Loại bỏ thẻ HTML, giữ lại nội dung
         summary = re.sub(r'<[^>]+>', '', summary)
         summary = summary.replace('*', '')
-        return summary.strip() 
\ No newline at end of file
+        return summary.strip()
+
+def _summarizer_model_path(model_name: str) -> Optional[Path]:
+    if "bart" in model_name:
+        return Path("models") / "bart-large-cnn"
+    if "t5" in model_name or "mt5" in model_name:
+        return Path("models") / "t5-base"
+    return None
+
+def get_summarizer(model_name: str = "google/mt5-base") -> Summarizer:
+    """Lấy Summarizer dùng chung từ model registry, chỉ load weights lần đầu trong process."""
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model_path = _summarizer_model_path(model_name)
+    return model_registry.get(
+        (model_name, device, "default"),
+        lambda: Summarizer(model_name=model_name),
+        size_bytes=estimate_path_size(str(model_path)) if model_path else 0,
+    )
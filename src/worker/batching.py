@@ -0,0 +1,218 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+from src.core.config import settings
+from src.core.logging import logger
+from src.speech_to_text.decode_profiles import DecodeProfile
+from src.speech_to_text.window_decoder import WindowDecoder, is_no_speech, window_segments
+
+Window = Tuple[float, float, np.ndarray]
+
+@dataclass
+class _ClipRequest:
+    windows: List[Window]
+    with_caption: bool
+    future: Future = field(default_factory=Future)
+    transcripts: List[Optional[dict]] = field(default_factory=list)
+    captions: List[Optional[dict]] = field(default_factory=list)
+    remaining: int = 0
+
+    def __post_init__(self):
+        self.transcripts = [None] * len(self.windows)
+        self.captions = [None] * len(self.windows)
+        self.remaining = len(self.windows)
+
+    def result(self) -> Tuple[List[dict], str]:
+        segments = window_segments(self.windows, self.transcripts)
+        caption = " ".join(cap["text"] for tr, cap in zip(self.transcripts, self.captions)
+                           if cap and cap["text"] and not is_no_speech(tr))
+        return segments, caption
+
+class ShortClipBatcher:
+    """
+    Gom các cửa sổ audio (<= 30s) của nhiều clip ngắn từ nhiều task đang chạy song song vào một lời gọi
+    encode + generate theo batch trên WindowDecoder, rồi trả kết quả về từng task qua Future.
+    Một batch chờ tối đa max_wait_ms kể từ cửa sổ cũ nhất, chỉ gom các cửa sổ cùng decode profile, và chỉ chờ khi
+    còn task đang chạy (short_clip_task) chưa gửi clip: một producer duy nhất (child của prefork pool) được decode ngay.
+    """
+
+    def __init__(self, window_decoder: WindowDecoder, batch_size: Optional[int] = None, max_wait_ms: Optional[int] = None):
+        self.window_decoder = window_decoder
+        self.batch_size = max(1, batch_size or settings.SHORT_CLIP_BATCH_SIZE or settings.WHISPER_BATCH_SIZE)
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.SHORT_CLIP_MAX_WAIT_MS) / 1000
+        self._cond = threading.Condition()
+        # Mỗi decode profile một hàng đợi (request, chỉ số cửa sổ, thời điểm vào hàng)
+        self._pending: Dict[DecodeProfile, Deque[Tuple[_ClipRequest, int, float]]] = {}
+        # Số clip đã gửi nhưng chưa có kết quả: task của các clip này không gửi thêm cửa sổ nào nữa
+        self._in_flight = 0
+        self.clips = 0
+        self.batches = 0
+        self.windows = 0
+        self._thread = threading.Thread(target=self._run, name="short-clip-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, windows: List[Window], profile: DecodeProfile, with_caption: bool = False) -> Future:
+        """Đưa các cửa sổ của một clip vào hàng đợi; Future trả về (segments, caption)."""
+        request = _ClipRequest(list(windows), with_caption)
+        if not request.windows:
+            request.future.set_result(([], ""))
+            return request.future
+        now = time.monotonic()
+        with self._cond:
+            queue = self._pending.setdefault(profile, deque())
+            queue.extend((request, i, now) for i in range(len(request.windows)))
+            self.clips += 1
+            self._in_flight += 1
+            self._cond.notify()
+        request.future.add_done_callback(self._on_clip_done)
+        return request.future
+
+    def _on_clip_done(self, future: Future):
+        with self._cond:
+            self._in_flight -= 1
+
+    def notify(self):
+        """Đánh thức batch đang chờ (vd khi số task đang chạy thay đổi)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _expect_more(self) -> bool:
+        # Còn task đang chạy chưa gửi clip thì đáng chờ; gọi khi đang giữ self._cond
+        return active_short_clip_tasks() > self._in_flight
+
+    def transcribe(self, windows: List[Window], profile: DecodeProfile, with_caption: bool = False) -> Tuple[List[dict], str]:
+        return self.submit(windows, profile, with_caption).result()
+
+    def _take_batch(self) -> Tuple[DecodeProfile, List[Tuple[_ClipRequest, int, float]]]:
+        with self._cond:
+            while not any(self._pending.values()):
+                self._cond.wait()
+            # Phục vụ hàng đợi có cửa sổ chờ lâu nhất trước
+            profile = min((p for p, q in self._pending.items() if q), key=lambda p: self._pending[p][0][2])
+            queue = self._pending[profile]
+            deadline = queue[0][2] + self.max_wait
+            while len(queue) < self.batch_size and self._expect_more():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return profile, [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+
+    def _run(self):
+        while True:
+            profile, batch = self._take_batch()
+            try:
+                self._decode(profile, batch)
+            except Exception as e:
+                logger.error(f"[BATCHER] Lỗi decode batch {len(batch)} cửa sổ: {e}", exc_info=True)
+                for request in {id(r): r for r, _, _ in batch}.values():
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _decode(self, profile: DecodeProfile, batch: List[Tuple[_ClipRequest, int, float]]):
+        t0 = time.time()
+        encoder_output = self.window_decoder.encode([request.windows[i][2] for request, i, _ in batch])
+        transcripts = self.window_decoder.generate(encoder_output, task="transcribe", beam_size=profile.beam_size,
+                                                   patience=profile.patience)
+        # Caption dùng chung encoder output, chỉ generate khi có clip trong batch cần
+        translations = [None] * len(batch)
+        if any(request.with_caption for request, _, _ in batch):
+            translations = self.window_decoder.generate(encoder_output, task="translate", beam_size=profile.beam_size,
+                                                        patience=profile.patience)
+        for (request, i, _), tr, cap in zip(batch, transcripts, translations):
+            if request.future.done():
+                continue
+            request.transcripts[i] = tr
+            request.captions[i] = cap if request.with_caption else None
+            request.remaining -= 1
+            if request.remaining == 0:
+                request.future.set_result(request.result())
+        self.batches += 1
+        self.windows += len(batch)
+        logger.info(f"[BATCHER] Batch {len(batch)} cửa sổ ({len({id(r) for r, _, _ in batch})} clip) | profile={profile.name} "
+                    f"| chờ tối đa {time.monotonic() - min(t for _, _, t in batch):.2f}s | decode {time.time() - t0:.2f}s")
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = sum(len(q) for q in self._pending.values())
+        return {
+            "batch_size": self.batch_size,
+            "max_wait_ms": int(self.max_wait * 1000),
+            "clips": self.clips,
+            "batches": self.batches,
+            "windows": self.windows,
+            "avg_batch": round(self.windows / self.batches, 2) if self.batches else 0.0,
+            "pending_windows": pending,
+        }
+
+_batcher: Optional[ShortClipBatcher] = None
+_batcher_lock = threading.Lock()
+_active_tasks = 0
+# Thread hiện tại có đang được đếm trong _active_tasks không
+_task_local = threading.local()
+
+def active_short_clip_tasks() -> int:
+    return _active_tasks
+
+def short_clip_concurrent() -> bool:
+    """Có task khác chạy song song trong process (threads pool, process_task_batch) để gom batch cùng không."""
+    return active_short_clip_tasks() > 1
+
+@contextmanager
+def short_clip_task():
+    """
+    Đánh dấu một task đang chạy trong process và có thể gửi clip vào batcher. Batcher chỉ chờ gom batch khi
+    số task đang chạy lớn hơn số clip đã gửi, nên dưới prefork pool (một task mỗi process) clip được decode ngay.
+    """
+    global _active_tasks
+    with _batcher_lock:
+        _active_tasks += 1
+    _task_local.active = True
+    try:
+        yield
+    finally:
+        release_short_clip_task()
+
+def release_short_clip_task():
+    """
+    Bỏ đánh dấu task của thread hiện tại ngay khi nó không còn gửi clip (đã nhận kết quả hoặc đi pipeline thường),
+    để batcher không chờ gom batch với task này. Gọi nhiều lần không sao.
+    """
+    global _active_tasks
+    if not getattr(_task_local, "active", False):
+        return
+    _task_local.active = False
+    with _batcher_lock:
+        _active_tasks -= 1
+        batcher = _batcher
+    if batcher is not None:
+        batcher.notify()
+
+def get_short_clip_batcher(window_decoder: WindowDecoder) -> ShortClipBatcher:
+    """Batcher dùng chung cho mọi task trong process (mọi Transcriber cùng WhisperModel từ model registry)."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None or _batcher.window_decoder.model is not window_decoder.model:
+            _batcher = ShortClipBatcher(window_decoder)
+        return _batcher
+
+def transcribe_short_clip(transcriber, audio: np.ndarray, sr: int = 16000,
+                          with_caption: bool = False) -> Tuple[List[dict], Optional[str]]:
+    """
+    Transcribe clip ngắn qua batcher dùng chung với decode profile hiện tại của transcriber. Trả về (segments, caption).
+    Clip được cắt cửa sổ tại khoảng lặng và decode trực tiếp trên WindowDecoder (without_timestamps), nên không đi qua
+    WHISPER_INFERENCE_MODE, compaction hay vad_filter của faster-whisper và timestamp chỉ theo cửa sổ; clip rỗng đã bị
+    triage loại từ trước. Chỉ đáng dùng khi short_clip_concurrent(), một task đơn lẻ nên đi pipeline thường.
+    """
+    windows = transcriber._caption_windows(audio, sr)
+    batcher = get_short_clip_batcher(transcriber.window_decoder)
+    segments, caption = batcher.transcribe(windows, transcriber.decode_profile, with_caption)
+    return segments, caption if with_caption else None
+
+def short_clip_batcher_stats() -> Optional[dict]:
+    return _batcher.stats() if _batcher is not None else None
@@ -0,0 +1,179 @@
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+import numpy as np
+from src.core.config import settings
+from src.core.logging import logger
+
+def _decode_into_shared_memory(file_path: str, sample_rate: int) -> Tuple[str, int]:
+    """Chạy trong process decode: decode file (qua PCM cache) rồi ghi PCM float32 vào một SharedMemory mới."""
+    from src.audio_processing.processor import AudioProcessor
+    audio, _ = AudioProcessor(sample_rate).load_audio(file_path)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(audio) * 4))
+    np.ndarray((len(audio),), dtype=np.float32, buffer=shm.buf)[:] = audio
+    name = shm.name
+    # Process consumer sẽ unlink sau khi dùng xong
+    shm.close()
+    return name, len(audio)
+
+def _unlink_segment(name: str):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"[PREFETCH] Không unlink được shared memory {name}: {e}")
+
+class PrefetchedAudio:
+    """PCM nằm trong shared memory do process decode ghi; audio là view trực tiếp lên vùng nhớ đó (không copy)."""
+
+    def __init__(self, name: str, length: int, on_release=None):
+        self._shm = shared_memory.SharedMemory(name=name)
+        try:
+            self.audio: Optional[np.ndarray] = np.ndarray((length,), dtype=np.float32, buffer=self._shm.buf)
+        except Exception:
+            self._shm.close()
+            raise
+        self._on_release = on_release
+
+    def release(self):
+        if self._shm is None:
+            return
+        self.audio = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Còn view trỏ vào buffer (vd trong kết quả trung gian): mapping được giải phóng khi view bị thu hồi
+            pass
+        self._shm.unlink()
+        self._shm = None
+        if self._on_release:
+            self._on_release()
+
+class LocalAudio:
+    """PCM decode bằng thread trong chính process (không dùng shared memory), cùng giao diện với PrefetchedAudio."""
+
+    def __init__(self, audio: np.ndarray, on_release=None):
+        self.audio: Optional[np.ndarray] = audio
+        self._on_release = on_release
+
+    def release(self):
+        if self._on_release is None:
+            return
+        self.audio = None
+        on_release, self._on_release = self._on_release, None
+        on_release()
+
+class AudioPrefetcher:
+    """
+    Producer/consumer cho nhiều task: process pool decode trước PCM của các task kế tiếp vào shared memory
+    trong lúc các task trước đang inference/gọi LLM. Tối đa lookahead buffer (đang decode hoặc đã decode
+    nhưng chưa dùng) tồn tại cùng lúc để giới hạn RAM.
+    Trong process daemon (child của Celery prefork pool) không được tạo process con, nên decode bằng thread:
+    phần nặng là ffmpeg chạy ở subprocess riêng, thread chỉ đọc pipe.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, lookahead: Optional[int] = None, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.lookahead = max(1, lookahead or settings.PREFETCH_LOOKAHEAD)
+        workers = max(1, max_workers or settings.PREFETCH_DECODE_WORKERS)
+        self._pool = None
+        self._threads = None
+        if multiprocessing.current_process().daemon:
+            logger.info("[PREFETCH] Process daemon (Celery prefork child): decode trước bằng thread")
+            self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-decode")
+        else:
+            # spawn: không fork process đang giữ CUDA context / thread của model
+            self._pool = multiprocessing.get_context("spawn").Pool(processes=workers)
+        self._slots = threading.Semaphore(self.lookahead)
+        self._futures: Dict[Hashable, Future] = {}
+        self._closed = False
+
+    def schedule(self, items: List[Tuple[Hashable, str]]):
+        """Đưa danh sách (key, file_path) vào hàng decode theo thứ tự; lấy kết quả bằng take(key)."""
+        jobs = []
+        for key, file_path in items:
+            self._futures[key] = Future()
+            jobs.append((self._futures[key], file_path))
+        threading.Thread(target=self._produce, args=(jobs,), name="audio-prefetch", daemon=True).start()
+
+    def _produce(self, jobs: List[Tuple[Future, str]]):
+        for target, file_path in jobs:
+            self._slots.acquire()
+            if self._closed:
+                return
+            if self._threads is not None:
+                self._threads.submit(self._decode_local, str(file_path)).add_done_callback(
+                    partial(self._on_local_decoded, target))
+                continue
+            self._pool.apply_async(_decode_into_shared_memory, (str(file_path), self.sample_rate),
+                                   callback=partial(self._on_decoded, target),
+                                   error_callback=partial(self._on_error, target))
+
+    def _on_decoded(self, target: Future, decoded: Tuple[str, int]):
+        try:
+            prefetched = PrefetchedAudio(*decoded, on_release=self._slots.release)
+        except Exception as e:
+            # Không attach được: process decode đã close segment, unlink theo tên để không rò shared memory
+            _unlink_segment(decoded[0])
+            self._on_error(target, e)
+            return
+        if not target.set_running_or_notify_cancel():
+            # Prefetcher đã đóng trước khi decode xong
+            prefetched.release()
+            return
+        target.set_result(prefetched)
+
+    def _decode_local(self, file_path: str) -> np.ndarray:
+        from src.audio_processing.processor import AudioProcessor
+        audio, _ = AudioProcessor(self.sample_rate).load_audio(file_path)
+        return np.asarray(audio, dtype=np.float32)
+
+    def _on_local_decoded(self, target: Future, decoded: Future):
+        if decoded.cancelled():
+            # Prefetcher đã đóng trước khi bắt đầu decode
+            return
+        if decoded.exception() is not None:
+            self._on_error(target, decoded.exception())
+            return
+        prefetched = LocalAudio(decoded.result(), on_release=self._slots.release)
+        if not target.set_running_or_notify_cancel():
+            prefetched.release()
+            return
+        target.set_result(prefetched)
+
+    def _on_error(self, target: Future, error: BaseException):
+        logger.warning(f"[PREFETCH] Không decode trước được audio: {error}")
+        self._slots.release()
+        if target.set_running_or_notify_cancel():
+            target.set_exception(error)
+
+    def take(self, key: Hashable, timeout: Optional[float] = None) -> Union[PrefetchedAudio, LocalAudio]:
+        """Chờ PCM của key decode xong; gọi release() khi dùng xong để trả slot cho task kế tiếp."""
+        return self._futures.pop(key).result(timeout)
+
+    def close(self):
+        self._closed = True
+        # Mở khóa producer đang chờ slot để thread kết thúc
+        self._slots.release()
+        for future in list(self._futures.values()):
+            if future.done() and future.exception() is None:
+                future.result().release()
+            else:
+                future.cancel()
+        self._futures.clear()
+        if self._pool is not None:
+            self._pool.terminate()
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,12 +1,51 @@
 from src.worker.worker import celery_app
-from src.services.audio_service import process_task
+from src.services.audio_service import process_task, process_task_batch
 
 @celery_app.task(bind=True)
-def process_task_async(self, task_id, model_name, db_url=None):
+def process_task_async(self, task_id, model_name, db_url=None, caption_mode=None, decode_profile=None, segments=None,
+                       caption=None):
     """
     Celery task để xử lý process_task ở chế độ nền.
     db_url: nếu cần, truyền vào để tạo session mới (tránh dùng session cũ).
+    caption_mode: "off" | "eager" | "lazy", None = theo WHISPER_CAPTION_MODE.
+    decode_profile: "fast" | "balanced" | "accurate", None = theo WHISPER_DECODE_PROFILE.
+    segments: transcript đã decode trong lúc upload (POST /audio/ingest), None = transcribe từ đầu.
+    caption: caption đã decode cùng segments lúc ingest (eager), None = chưa có.
     """
     from src.database.config.database import get_db
     db = next(get_db())
-    return process_task(task_id, model_name, db)
+    return process_task(task_id, model_name, db, caption_mode=caption_mode, decode_profile=decode_profile, segments=segments,
+                        caption=caption)
+
+@celery_app.task(bind=True)
+def process_tasks_async(self, task_ids, model_name, caption_mode=None, decode_profile=None):
+    """
+    Xử lý một lô task trong cùng worker: audio của các task kế tiếp được decode trước (thread decode khi chạy
+    trong child của prefork pool, process pool + shared memory khi chạy dưới threads pool) trong lúc task trước
+    đang inference, nên model không phải chờ decode.
+    """
+    from src.database.config.database import get_db
+    db = next(get_db())
+    return process_task_batch(task_ids, model_name, db, caption_mode=caption_mode, decode_profile=decode_profile)
+
+@celery_app.task(bind=True)
+def transcribe_chunk_async(self, chunk_path, start, end, core_start, core_end, decode_profile=None, with_caption=False):
+    """
+    Decode một chunk của upload pipelined (POST /audio/ingest): API cắt chunk trong lúc nhận byte, ghi PCM float32
+    ra chunk_path (.npy trong INGEST_CHUNK_DIR) và chờ kết quả; Whisper chỉ chạy trong worker.
+    with_caption: decode thêm caption (translate) trên cùng encoder output của chunk.
+    Trả về (core_start, core_end, segments, caption) để API merge vùng overlap.
+    """
+    from pathlib import Path
+    import numpy as np
+    from src.speech_to_text.transcriber import Transcriber, AudioSegment
+    path = Path(chunk_path)
+    data = np.load(path)
+    path.unlink(missing_ok=True)
+    transcriber = Transcriber()
+    transcriber.set_decode_profile(decode_profile)
+    segment = AudioSegment(data=data, start_time=start, end_time=end, context=None,
+                           core_start=core_start, core_end=core_end)
+    captions = [] if with_caption else None
+    core_start, core_end, segments = transcriber._decode_chunk(segment, captions)
+    return core_start, core_end, segments, " ".join(captions) if with_caption else None
@@ -0,0 +1,59 @@
+import os
+import time
+import logging
+import numpy as np
+from pathlib import Path
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def warmup_whisper(model, seconds: float = None, sr: int = 16000) -> float:
+    """Chạy một lần decode ngắn trên audio tổng hợp để khởi tạo kernel/allocator trước khi nhận task."""
+    seconds = seconds if seconds is not None else settings.WORKER_WARMUP_SECONDS
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(seconds * sr)) * 0.01).astype(np.float32)
+    t0 = time.time()
+    segments, _ = model.transcribe(audio, language="vi", beam_size=1, vad_filter=False)
+    # faster-whisper trả về generator, phải duyệt hết thì decode mới thực sự chạy
+    for _ in segments:
+        pass
+    elapsed = time.time() - t0
+    logger.info(f"[WARMUP] Whisper warm-up decode {seconds:.1f}s audio trong {elapsed:.2f}s")
+    return elapsed
+
+def preload_models() -> dict:
+    """
+    Load Whisper và summarizer vào model registry rồi chạy warm-up decode.
+    Gọi trong process cha của worker để các child prefork dùng chung page copy-on-write.
+    """
+    from src.speech_to_text.transcriber import Transcriber
+    t0 = time.time()
+    timings = {}
+    transcriber = Transcriber()
+    timings["whisper_load"] = time.time() - t0
+    timings["whisper_warmup"] = warmup_whisper(transcriber.model)
+    if settings.WORKER_PRELOAD_SUMMARIZER_MODEL:
+        try:
+            from src.summarization.summarizer import get_summarizer
+            t1 = time.time()
+            summarizer = get_summarizer(settings.WORKER_PRELOAD_SUMMARIZER_MODEL)
+            summarizer.summarize("Xin chào.", max_length=8, min_length=1)
+            timings["summarizer"] = time.time() - t1
+        except Exception as e:
+            # Summarizer local là tùy chọn (pipeline mặc định dùng Ollama), không chặn worker
+            logger.warning(f"[WARMUP] Không preload được summarizer {settings.WORKER_PRELOAD_SUMMARIZER_MODEL}: {e}")
+    timings["total"] = time.time() - t0
+    logger.info(f"[WARMUP] Preload models hoàn tất | timings={timings}")
+    return timings
+
+def mark_ready():
+    """Ghi file readiness (dùng cho healthcheck) sau khi worker đã warm-up xong"""
+    if not settings.WORKER_READY_FILE:
+        return
+    path = Path(settings.WORKER_READY_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(str(os.getpid()), encoding="utf-8")
+
+def clear_ready():
+    if settings.WORKER_READY_FILE and os.path.exists(settings.WORKER_READY_FILE):
+        os.remove(settings.WORKER_READY_FILE)
@@ -1,5 +1,8 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_ready, worker_shutdown
+from kombu import Queue
 from src.core.config import settings
+from src.core.logging import logger
 
 # Create Celery app
 celery_app = Celery(
@@ -9,8 +12,15 @@ celery_app = Celery(
     include=["src.worker.tasks"],
 )
 
+# Queue mặc định + các queue ASR do triage/ingest route tới. Worker chạy không có -Q sẽ nhận tất cả,
+# docker-compose tách asr_short sang worker threads pool riêng bằng -Q
+ASR_QUEUES = list(dict.fromkeys(["celery", settings.TRIAGE_SHORT_QUEUE, settings.TRIAGE_LONG_QUEUE,
+                                 settings.INGEST_CHUNK_QUEUE]))
+
 # Configure Celery
 celery_app.conf.update(
+    task_default_queue="celery",
+    task_queues=[Queue(name) for name in ASR_QUEUES],
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
@@ -20,6 +30,7 @@ celery_app.conf.update(
     task_time_limit=3600,  # 1 hour
     worker_max_tasks_per_child=100,
     worker_prefetch_multiplier=1,
+    worker_concurrency=settings.WORKER_CONCURRENCY or None,
     broker_transport_options={
         "visibility_timeout": 3600,
         "max_retries": 20,
@@ -32,5 +43,48 @@ celery_app.conf.update(
     },
 )
 
+def _is_prefork_pool(worker) -> bool:
+    pool_cls = getattr(worker, "pool_cls", None)
+    name = pool_cls if isinstance(pool_cls, str) else getattr(pool_cls, "__module__", "")
+    # Không xác định được pool thì coi như prefork (mặc định của Celery)
+    return not name or "prefork" in str(name)
+
+@worker_init.connect
+def preload_models_before_fork(sender=None, **kwargs):
+    """
+    Preload + warm-up model trong process cha, trước khi fork pool và trước khi worker báo ready.
+    CUDA context không an toàn khi fork nên với GPU + prefork thì preload trong từng child.
+    """
+    from src.core.hardware import resolve_execution_profile, set_worker_concurrency
+    from src.worker.warmup import clear_ready, preload_models
+    clear_ready()
+    # Ghi nhận concurrency thực tế (kể cả khi truyền --concurrency) để chia core CPU cho Whisper.
+    # Threads pool: mọi thread dùng chung một model (và ShortClipBatcher) nên không chia core theo số thread
+    set_worker_concurrency(getattr(sender, "concurrency", None) if _is_prefork_pool(sender) else 1)
+    if not settings.WORKER_PRELOAD_MODELS:
+        return
+    if resolve_execution_profile().device == "cuda" and _is_prefork_pool(sender):
+        logger.info("[WORKER] WHISPER_DEVICE=cuda với prefork pool: preload model trong từng child process")
+        return
+    preload_models()
+
+@worker_process_init.connect
+def preload_models_in_child(**kwargs):
+    from src.core.hardware import resolve_execution_profile
+    if settings.WORKER_PRELOAD_MODELS and resolve_execution_profile().device == "cuda":
+        from src.worker.warmup import preload_models
+        preload_models()
+
+@worker_ready.connect
+def on_worker_ready(**kwargs):
+    from src.worker.warmup import mark_ready
+    mark_ready()
+    logger.info("[WORKER] Worker ready, bắt đầu nhận task")
+
+@worker_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    from src.worker.warmup import clear_ready
+    clear_ready()
+
 # Import tasks
 from src.worker.tasks import *  # noqa 
\ No newline at end of file
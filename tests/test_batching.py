@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+from src.speech_to_text.decode_profiles import get_decode_profile
+import time
+from src.worker.batching import ShortClipBatcher, release_short_clip_task, short_clip_concurrent, short_clip_task
+
+class FakeWindowDecoder:
+    model = object()
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode(self, windows):
+        self.batch_sizes.append(len(windows))
+        return [len(w) for w in windows]
+
+    def generate(self, encoder_output, task="transcribe", **kwargs):
+        return [{"text": f"{task}:{n}", "avg_logprob": -0.1, "no_speech_prob": 0.0} for n in encoder_output]
+
+def test_clips_from_concurrent_tasks_share_one_batch():
+    decoder = FakeWindowDecoder()
+    batcher = ShortClipBatcher(decoder, batch_size=8, max_wait_ms=500)
+    profile = get_decode_profile("fast")
+    results = {}
+    started = threading.Barrier(8)
+
+    def task(n):
+        windows = [(0.0, n / 100, np.zeros(n, dtype=np.float32))]
+        with short_clip_task():
+            started.wait()
+            results[n] = batcher.transcribe(windows, profile, with_caption=(n % 2 == 0))
+
+    threads = [threading.Thread(target=task, args=(n,)) for n in range(100, 108)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert decoder.batch_sizes == [8]
+    for n, (segments, caption) in results.items():
+        assert segments[0]["text"] == f"transcribe:{n}"
+        assert caption == (f"translate:{n}" if n % 2 == 0 else "")
+
+def test_single_producer_is_not_delayed():
+    decoder = FakeWindowDecoder()
+    batcher = ShortClipBatcher(decoder, batch_size=8, max_wait_ms=2000)
+    t0 = time.monotonic()
+    with short_clip_task():
+        segments, _ = batcher.transcribe([(0.0, 1.0, np.zeros(100, dtype=np.float32))], get_decode_profile("fast"))
+    assert segments[0]["text"] == "transcribe:100"
+    assert time.monotonic() - t0 < 1.0
+
+def test_single_task_is_not_concurrent_and_release_is_idempotent():
+    with short_clip_task():
+        assert not short_clip_concurrent()
+        with_other = threading.Event()
+        done = threading.Event()
+
+        def other():
+            with short_clip_task():
+                with_other.set()
+                done.wait()
+
+        t = threading.Thread(target=other)
+        t.start()
+        with_other.wait()
+        assert short_clip_concurrent()
+        release_short_clip_task()
+        release_short_clip_task()
+        assert not short_clip_concurrent()
+        done.set()
+        t.join()
+    assert not short_clip_concurrent()
@@ -0,0 +1,21 @@
+from src.speech_to_text.cascade import escalation_spans, replace_spans
+
+def _seg(start, end, text, logprob=-0.2, no_speech=0.05):
+    return {"start": start, "end": end, "text": text, "avg_logprob": logprob, "no_speech_prob": no_speech}
+
+def test_escalation_spans_selects_low_confidence_and_merges_neighbours():
+    draft = [
+        _seg(0.0, 4.0, "ổn"),
+        _seg(4.0, 8.0, "kém", logprob=-1.2),
+        _seg(8.5, 12.0, "nhiễu", no_speech=0.8),
+        _seg(20.0, 25.0, "ổn"),
+        _seg(30.0, 33.0, "kém", logprob=-0.9),
+    ]
+    spans = escalation_spans(draft, logprob_threshold=-0.6, no_speech_threshold=0.5, duration=33.1, pad=0.2, merge_gap=1.0)
+    assert spans == [(3.8, 12.2), (29.8, 33.1)]
+
+def test_replace_spans_keeps_confident_draft_segments():
+    draft = [_seg(0.0, 4.0, "a"), _seg(4.0, 8.0, "b nháp", logprob=-1.5), _seg(8.0, 12.0, "c")]
+    redecoded = [(3.8, 8.2, [_seg(4.1, 7.9, "b chuẩn")])]
+    merged = replace_spans(draft, redecoded)
+    assert [seg["text"] for seg in merged] == ["a", "b chuẩn", "c"]
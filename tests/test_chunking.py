@@ -0,0 +1,26 @@
+from src.audio_processing.chunking import plan_chunks, merge_chunk_segments
+
+def _words(*items):
+    return [{"start": s, "end": e, "word": f" {w}"} for s, e, w in items]
+
+def test_plan_chunks_cuts_at_longest_silence_in_window():
+    silences = [(5.0, 5.5), (22.0, 22.4), (26.0, 27.0), (70.0, 70.2)]
+    chunks = plan_chunks(80.0, silences, min_len=20, max_len=30)
+    assert chunks[0] == (0.0, 26.5)
+    assert chunks[-1][1] == 80.0
+    for start, end in chunks:
+        assert end - start <= 30
+    # Các chunk phải liên tục, không hở
+    for (_, prev_end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert prev_end == next_start
+
+def test_plan_chunks_hard_cut_without_silence():
+    assert plan_chunks(65.0, [], min_len=20, max_len=30) == [(0.0, 30.0), (30.0, 60.0), (60.0, 65.0)]
+
+def test_merge_drops_words_decoded_twice_in_overlap():
+    first = (0.0, 10.0, [{"words": _words((8.0, 8.5, "xin"), (9.0, 9.6, "chào"), (10.2, 10.6, "anh"))}])
+    second = (10.0, 20.0, [{"words": _words((9.1, 9.7, "chào"), (10.2, 10.6, "anh"), (11.0, 11.5, "ạ"))}])
+    merged = merge_chunk_segments([second, first], context_window=5)
+    text = " ".join(seg["text"] for seg in merged)
+    assert text == "xin chào anh ạ"
+    assert merged[0]["start"] == 8.0
@@ -0,0 +1,22 @@
+import numpy as np
+from src.audio_processing.compaction import compact_speech, remap_segments, speech_regions
+
+SR = 16000
+
+def test_compaction_drops_silence_and_remaps_timestamps():
+    rng = np.random.default_rng(0)
+    speech = lambda s: rng.normal(0, 0.1, int(s * SR)).astype(np.float32)
+    silence = lambda s: np.zeros(int(s * SR), dtype=np.float32)
+    audio = np.concatenate([silence(5), speech(3), silence(10), speech(2), silence(4)])
+    regions = speech_regions(audio, SR, method="energy", min_silence_ms=1000, pad_ms=0)
+    assert len(regions) == 2
+    result = compact_speech(audio, SR, regions=regions, gap_ms=200)
+    assert result.stats()["saved_ratio"] > 0.7
+    # Segment thứ hai bắt đầu sau vùng 1 (~3s) + gap 0.2s trên audio nén, tức ~18s trên audio gốc
+    second_start = result.offset_map.compact_starts[1]
+    segments = [{"start": 0.5, "end": 2.5, "text": "a"}, {"start": second_start + 0.5, "end": second_start + 1.5, "text": "b",
+                 "words": [{"start": second_start + 0.5, "end": second_start + 1.0, "word": " b"}]}]
+    remapped = remap_segments(segments, result.offset_map)
+    assert abs(remapped[0]["start"] - (regions[0][0] + 0.5)) < 0.01
+    assert abs(remapped[1]["start"] - (regions[1][0] + 0.5)) < 0.01
+    assert abs(remapped[1]["words"][0]["end"] - (regions[1][0] + 1.0)) < 0.01
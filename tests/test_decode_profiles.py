@@ -0,0 +1,13 @@
+import pytest
+from src.speech_to_text.decode_profiles import DECODE_PROFILES, get_decode_profile
+
+def test_profiles_trade_speed_for_accuracy():
+    fast, balanced, accurate = (get_decode_profile(n) for n in ("fast", "balanced", "accurate"))
+    assert fast.beam_size < balanced.beam_size <= accurate.beam_size
+    assert fast.caption_mode == "off"
+    assert accurate.vad_parameters["speech_pad_ms"] > balanced.vad_parameters["speech_pad_ms"]
+
+def test_default_and_unknown_profile():
+    assert get_decode_profile(None).name in DECODE_PROFILES
+    with pytest.raises(ValueError):
+        get_decode_profile("turbo")
@@ -0,0 +1,48 @@
+from src.core import hardware
+
+def test_cpu_profile_does_not_oversubscribe_cores(monkeypatch):
+    monkeypatch.setattr(hardware, "usable_cores", lambda: 16)
+    hardware.set_worker_concurrency(4)
+    try:
+        profile = hardware.resolve_execution_profile("cpu")
+    finally:
+        hardware.set_worker_concurrency(None)
+    assert profile.device == "cpu"
+    assert profile.compute_type == hardware.settings.WHISPER_CPU_COMPUTE_TYPE
+    assert profile.cpu_threads * profile.num_workers * profile.concurrency <= 16
+    assert profile.cpu_threads * profile.num_workers == 4
+
+def test_cpu_profile_with_more_slots_than_cores(monkeypatch):
+    monkeypatch.setattr(hardware, "usable_cores", lambda: 2)
+    hardware.set_worker_concurrency(8)
+    try:
+        profile = hardware.resolve_execution_profile("cpu")
+    finally:
+        hardware.set_worker_concurrency(None)
+    assert profile.cpu_threads == 1 and profile.num_workers == 1
+
+def test_settings_load_autotune_profile_below_env(tmp_path, monkeypatch):
+    import json
+    from src.core.config import Settings
+    profile = tmp_path / "whisper_profile.json"
+    profile.write_text(json.dumps({"rtf": 0.1, "settings": {"WHISPER_BATCH_SIZE": 12, "WHISPER_CPU_THREADS": 3}}))
+    monkeypatch.setenv("WHISPER_PROFILE_PATH", str(profile))
+    monkeypatch.delenv("WHISPER_BATCH_SIZE", raising=False)
+    tuned = Settings()
+    assert tuned.WHISPER_BATCH_SIZE == 12 and tuned.WHISPER_CPU_THREADS == 3
+    # Biến môi trường vẫn ghi đè profile
+    monkeypatch.setenv("WHISPER_BATCH_SIZE", "4")
+    assert Settings().WHISPER_BATCH_SIZE == 4
+
+def test_settings_read_profile_path_from_dotenv(tmp_path, monkeypatch):
+    import json
+    from src.core.config import Settings
+    profile = tmp_path / "whisper_profile.json"
+    profile.write_text(json.dumps({"settings": {"WHISPER_BATCH_SIZE": 12}}))
+    env_file = tmp_path / ".env"
+    env_file.write_text(f"WHISPER_PROFILE_PATH={profile}\n")
+    monkeypatch.delenv("WHISPER_PROFILE_PATH", raising=False)
+    monkeypatch.delenv("WHISPER_BATCH_SIZE", raising=False)
+    tuned = Settings(_env_file=str(env_file))
+    assert tuned.WHISPER_PROFILE_PATH == str(profile)
+    assert tuned.WHISPER_BATCH_SIZE == 12
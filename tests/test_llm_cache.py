@@ -0,0 +1,27 @@
+from src.services.llm_cache import LLMCache
+
+def test_llm_cache_key_and_hit_miss(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite3")
+    key = LLMCache.make_key("gemma2:9b", "prompt", {"temperature": 0.2, "top_k": 40})
+    assert key == LLMCache.make_key("gemma2:9b", "prompt", {"top_k": 40, "temperature": 0.2})
+    assert key != LLMCache.make_key("gemma2:9b", "prompt", {"temperature": 0.3, "top_k": 40})
+    assert cache.get(key) is None
+    cache.put(key, "gemma2:9b", "kết quả")
+    assert LLMCache(tmp_path / "llm.sqlite3").get(key) == "kết quả"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (0, 1, 1)
+
+def test_llm_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite3", max_bytes=3 * 100 + 50)
+    for i in range(3):
+        cache.put(f"k{i}", "m", "x" * 100)
+    assert cache.get("k0") is not None
+    cache.put("k3", "m", "x" * 100)
+    assert cache.get("k1") is None
+    assert cache.get("k0") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_llm_cache_disabled(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite3", enabled=False)
+    cache.put("k", "m", "x")
+    assert cache.get("k") is None
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.services.llm_cache import LLMCache
+from src.services.llm_client import OllamaClient, OllamaError
+
+@pytest.fixture(autouse=True)
+def isolated_llm_cache(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite3")
+    monkeypatch.setattr("src.services.llm_client.llm_cache", cache)
+    return cache
+
+@pytest.fixture
+def ollama_server():
+    """Ollama giả lập: /api/tags đếm số lần gọi, /api/generate trả lỗi 503 theo hàng đợi rồi trả text."""
+    state = {"tags": 0, "generate": 0, "fail": [], "delay": 0.0, "active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            state["tags"] += 1
+            self._reply(200, {"models": [{"name": "llama3.2:3b"}, {"name": "mistral:7b-instruct"}]})
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                state["generate"] += 1
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                status = state["fail"].pop(0) if state["fail"] else 200
+            time.sleep(state["delay"])
+            with lock:
+                state["active"] -= 1
+            self._reply(status, {"response": f"ok:{payload['model']}"})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+
+def test_models_cached_and_priority(ollama_server):
+    url, state = ollama_server
+    client = OllamaClient(base_url=url, models_ttl=60)
+    assert client.pick_model() == "mistral:7b-instruct"
+    assert client.pick_model() == "mistral:7b-instruct"
+    assert state["tags"] == 1
+
+def test_generate_retries_then_gives_up(ollama_server, monkeypatch):
+    url, state = ollama_server
+    monkeypatch.setattr("src.services.llm_client.time.sleep", lambda s: None)
+    client = OllamaClient(base_url=url, max_retries=2)
+    state["fail"] = [503]
+    assert client.generate("llama3.2:3b", "xin chào") == "ok:llama3.2:3b"
+    assert client.retries == 1
+    state["fail"] = [503, 503, 503]
+    with pytest.raises(OllamaError):
+        client.generate("llama3.2:3b", "xin chào", use_cache=False)
+    state["fail"] = [404]
+    with pytest.raises(OllamaError):
+        client.generate("llama3.2:3b", "xin chào", use_cache=False)
+    assert state["generate"] == 6
+
+def test_generate_served_from_cache(ollama_server, isolated_llm_cache):
+    url, state = ollama_server
+    client = OllamaClient(base_url=url)
+    options = {"temperature": 0.2}
+    assert client.generate("llama3.2:3b", "tóm tắt", options=options) == "ok:llama3.2:3b"
+    assert client.generate("llama3.2:3b", "tóm tắt", options=options) == "ok:llama3.2:3b"
+    client.generate("llama3.2:3b", "tóm tắt", options={"temperature": 0.3})
+    client.generate("llama3.2:3b", "tóm tắt", options=options, use_cache=False)
+    assert state["generate"] == 3
+    assert isolated_llm_cache.stats()["hits"] == 1
+
+def test_generate_timeout_and_concurrency_limit(ollama_server):
+    url, state = ollama_server
+    state["delay"] = 0.3
+    client = OllamaClient(base_url=url, max_concurrency=2, max_retries=0)
+    threads = [threading.Thread(target=client.generate, args=("llama3.2:3b", f"x{i}")) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state["peak"] == 2
+    with pytest.raises(OllamaError):
+        client.generate("llama3.2:3b", "x", timeout=0.05)
+
+def test_submit_runs_independent_prompts_concurrently(ollama_server):
+    url, state = ollama_server
+    state["delay"] = 0.3
+    client = OllamaClient(base_url=url, max_concurrency=2)
+    t0 = time.time()
+    futures = [client.submit("llama3.2:3b", prompt) for prompt in ("chi tiết", "tổng quan")]
+    assert [f.result() for f in futures] == ["ok:llama3.2:3b"] * 2
+    assert state["peak"] == 2
+    assert time.time() - t0 < 0.55
@@ -0,0 +1,51 @@
+import re
+import threading
+import time
+from src.summarization.map_reduce import map_reduce, split_into_chunks, split_sentences
+
+def count_words(text):
+    return len(text.split())
+
+def test_chunks_respect_budget_and_sentence_boundaries():
+    sentences = [f"Câu số {i} có năm từ." for i in range(20)]
+    chunks = split_into_chunks(split_sentences(" ".join(sentences)), 24, count_tokens=count_words)
+    assert all(count_words(c) <= 24 for c in chunks)
+    assert " ".join(chunks) == " ".join(sentences)
+    assert all(c.endswith(".") for c in chunks)
+    # Câu dài hơn budget mới bị cắt theo từ
+    long = split_into_chunks(["một " * 50], 10, count_tokens=count_words)
+    assert all(count_words(c) <= 10 for c in long) and count_words(" ".join(long)) == 50
+
+def test_map_reduce_summarizes_in_parallel_until_it_fits():
+    text = " ".join(f"Câu {i} nói về sự kiện {i}." for i in range(200))
+    levels = []
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def summarize(chunk, level):
+        with lock:
+            levels.append(level)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        first = re.search(r"\d+", chunk).group()
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        # Tóm tắt giữ lại số thứ tự câu đầu tiên của chunk
+        return f"tóm tắt {first}."
+
+    result = map_reduce(text, summarize, max_tokens=60, count_tokens=count_words, max_workers=4)
+    assert count_words(result) <= 60
+    assert levels.count(0) == len(split_into_chunks(split_sentences(text), 60, count_words))
+    assert max(levels) >= 1 and peak[0] > 1
+    assert result.startswith("tóm tắt 0.")
+
+def test_map_reduce_keeps_short_text():
+    assert map_reduce("Ngắn thôi.", lambda chunk, level: "x", max_tokens=10, count_tokens=count_words) == "Ngắn thôi."
+
+def test_map_reduce_keeps_every_chunk_when_passes_run_out():
+    text = " ".join(f"Câu {i} nói về sự kiện {i}." for i in range(40))
+    # Tóm tắt không thu gọn được: sau max_passes lượt vẫn còn nhiều chunk
+    result = map_reduce(text, lambda chunk, level: chunk, max_tokens=30, count_tokens=count_words, max_passes=1)
+    assert count_words(result) == count_words(text)
+    assert result.split() == text.split()
@@ -0,0 +1,29 @@
+from src.core.model_registry import ModelRegistry
+
+def test_registry_loads_once_and_counts_hits():
+    registry = ModelRegistry(max_bytes=0)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return object()
+
+    first = registry.get(("large-v2", "cpu", "int8"), loader, size_bytes=10)
+    second = registry.get(("large-v2", "cpu", "int8"), loader, size_bytes=10)
+    assert first is second
+    assert len(calls) == 1
+    stats = registry.stats()
+    assert stats["loads"] == 1
+    assert stats["hits"] == 1
+
+def test_registry_evicts_lru_over_budget():
+    registry = ModelRegistry(max_bytes=25)
+    registry.get("a", lambda: "A", size_bytes=10)
+    registry.get("b", lambda: "B", size_bytes=10)
+    # Truy cập lại "a" để "b" thành least-recently-used
+    registry.get("a", lambda: "A", size_bytes=10)
+    registry.get("c", lambda: "C", size_bytes=10)
+    assert registry.peek("b") is None
+    assert registry.peek("a") == "A"
+    assert registry.peek("c") == "C"
+    assert registry.stats()["evictions"] == 1
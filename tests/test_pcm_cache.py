@@ -0,0 +1,38 @@
+import numpy as np
+from src.audio_processing.pcm_cache import PCMCache
+
+def test_pcm_cache_decodes_once_and_reads_memmap(tmp_path):
+    audio_file = tmp_path / "call.wav"
+    audio_file.write_bytes(b"fake audio bytes")
+    calls = []
+
+    def decode(path):
+        calls.append(path)
+        return np.linspace(-0.5, 0.5, 1600, dtype=np.float32)
+
+    cache = PCMCache(tmp_path / "cache", max_bytes=0)
+    first = cache.load(audio_file, 16000, decode)
+    second = cache.load(audio_file, 16000, decode)
+    assert len(calls) == 1
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, second)
+    assert cache.stats()["hits"] == 1
+
+def test_pcm_cache_evicts_least_recently_used(tmp_path):
+    cache = PCMCache(tmp_path, max_bytes=3 * 4000 + 500)
+    for i in range(4):
+        cache.put(f"digest{i}", 16000, np.zeros(1000, dtype=np.float32))
+    assert cache.get("digest0", 16000) is None
+    assert cache.get("digest3", 16000) is not None
+
+def test_pcm_cache_int16_round_trip_and_bounded_digests(tmp_path):
+    cache = PCMCache(tmp_path / "cache", dtype="int16", max_digests=2)
+    audio = np.array([-1.0, -0.5, 0.0, 0.5, 1.0], dtype=np.float32)
+    cache.put("digest", 16000, audio)
+    np.testing.assert_allclose(cache.get("digest", 16000), audio, atol=1 / 32767)
+    assert cache.get("digest", 16000)[-1] == 1.0
+    for i in range(3):
+        path = tmp_path / f"call{i}.wav"
+        path.write_bytes(bytes([i]))
+        cache.file_digest(path)
+    assert len(cache._digests) == 2
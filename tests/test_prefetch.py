@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+
+from src.worker.prefetch import AudioPrefetcher
+
+def test_prefetched_buffers_match_files_and_are_zero_copy(tmp_path, monkeypatch):
+    # Process decode (spawn) đọc cấu hình từ biến môi trường
+    monkeypatch.setenv("PCM_CACHE_ENABLED", "false")
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"{i}.wav"
+        sf.write(path, np.full(8000 * (i + 1), 0.1 * i, dtype=np.float32), 16000)
+        paths.append((i, str(path)))
+    with AudioPrefetcher(max_workers=2, lookahead=2) as prefetcher:
+        prefetcher.schedule(paths)
+        for i, _ in paths:
+            prefetched = prefetcher.take(i, timeout=60)
+            assert len(prefetched.audio) == 8000 * (i + 1)
+            assert abs(float(prefetched.audio[0]) - 0.1 * i) < 1e-3
+            # View lên shared memory, không phải bản copy
+            assert not prefetched.audio.flags.owndata
+            prefetched.release()
+
+def test_daemon_process_decodes_with_threads(tmp_path, monkeypatch):
+    # Child của Celery prefork pool là process daemon, không được tạo process con
+    monkeypatch.setattr("src.worker.prefetch.multiprocessing.current_process", lambda: type("P", (), {"daemon": True})())
+    path = tmp_path / "a.wav"
+    sf.write(path, np.full(16000, 0.2, dtype=np.float32), 16000)
+    with AudioPrefetcher(max_workers=1, lookahead=1) as prefetcher:
+        assert prefetcher._pool is None
+        prefetcher.schedule([("a", str(path))])
+        prefetched = prefetcher.take("a", timeout=60)
+        assert len(prefetched.audio) == 16000
+        prefetched.release()
+
+def test_segment_unlinked_when_attach_fails():
+    shm = shared_memory.SharedMemory(create=True, size=16)
+    name = shm.name
+    shm.close()
+    prefetcher = AudioPrefetcher.__new__(AudioPrefetcher)
+    prefetcher._slots = threading.Semaphore(0)
+    target = Future()
+    # Độ dài lớn hơn segment: tạo view thất bại
+    prefetcher._on_decoded(target, (name, 1000))
+    assert target.exception() is not None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
@@ -0,0 +1,41 @@
+import numpy as np
+from src.speech_to_text.realtime import RealtimeRecognizer
+
+SR = 16000
+
+def _speech(seconds):
+    rng = np.random.default_rng(0)
+    return rng.normal(0, 0.1, int(seconds * SR)).astype(np.float32)
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+def _run(recognizer, audio, frame=320):
+    events = []
+    for i in range(0, len(audio), frame):
+        events += recognizer.feed(audio[i:i + frame])
+    return events + recognizer.flush()
+
+def test_final_emitted_after_endpoint_silence():
+    decoded = []
+    def decode(audio):
+        decoded.append(len(audio) / SR)
+        return {"text": "xin chào", "avg_logprob": -0.2, "no_speech_prob": 0.01}
+    recognizer = RealtimeRecognizer(decode, SR, silence_thresh=-40.0, endpoint_silence_ms=500,
+                                    partial_interval_ms=1000, preroll_ms=300)
+    audio = np.concatenate([_silence(1), _speech(2.5), _silence(1), _speech(1), _silence(1)])
+    events = _run(recognizer, audio)
+    finals = [e for e in events if e["type"] == "final"]
+    assert len(finals) == 2
+    assert abs(finals[0]["start"] - 0.7) < 0.1 and abs(finals[0]["end"] - 3.5) < 0.2
+    assert abs(finals[1]["end"] - 5.5) < 0.2
+    # Câu đầu 2.5s: có kết quả tạm trước khi hết câu
+    assert any(e["type"] == "partial" and e["end"] < finals[0]["end"] for e in events)
+    # Cửa sổ decode của câu chỉ gồm pre-roll + tiếng nói + ít đệm, không gồm im lặng trước đó
+    assert max(decoded) < 3.5
+
+def test_long_utterance_is_cut_at_max_length():
+    recognizer = RealtimeRecognizer(lambda a: {"text": "x", "no_speech_prob": 0.0}, SR, silence_thresh=-40.0,
+                                    partial_interval_ms=100000, max_utterance_seconds=4)
+    events = _run(recognizer, _speech(10))
+    assert [e["type"] for e in events] == ["final"] * 3
@@ -0,0 +1,20 @@
+import numpy as np
+from src.audio_processing.triage import triage_audio
+from src.core.config import settings
+
+SR = 16000
+
+def test_silent_file_is_failed_without_queue():
+    result = triage_audio(np.zeros(5 * SR, dtype=np.float32), SR)
+    assert result.is_empty and result.queue is None
+    assert result.duration == 5.0 and result.speech_ratio == 0.0
+
+def test_speech_ratio_and_queue_by_duration():
+    rng = np.random.default_rng(0)
+    audio = np.concatenate([rng.normal(0, 0.1, 6 * SR), np.zeros(4 * SR)]).astype(np.float32)
+    result = triage_audio(audio, SR)
+    assert not result.is_empty
+    assert abs(result.speech_ratio - 0.6) < 0.05
+    assert result.queue == settings.TRIAGE_SHORT_QUEUE
+    long_audio = np.tile(audio, int(settings.TRIAGE_SHORT_MAX_SECONDS // 10) + 1)
+    assert triage_audio(long_audio, SR).queue == settings.TRIAGE_LONG_QUEUE
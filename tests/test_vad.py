@@ -0,0 +1,33 @@
+import numpy as np
+from src.audio_processing.vad import detect_silence, frame_rms, StreamingSilenceDetector
+
+SR = 16000
+
+def _signal():
+    rng = np.random.default_rng(0)
+    loud = lambda s: rng.normal(0, 0.1, int(s * SR)).astype(np.float32)
+    quiet = lambda s: np.zeros(int(s * SR), dtype=np.float32)
+    return np.concatenate([loud(2), quiet(1.5), loud(1), quiet(0.2), loud(2), quiet(1)])
+
+def test_frame_rms_matches_librosa():
+    librosa = __import__("pytest").importorskip("librosa")
+    audio = _signal()
+    expected = librosa.feature.rms(y=audio)[0]
+    np.testing.assert_allclose(frame_rms(audio), expected, rtol=1e-4, atol=1e-6)
+
+def test_detect_silence_filters_short_and_trailing_runs():
+    silences = detect_silence(_signal(), SR, silence_thresh=-40.0, min_silence_len=1000)
+    # Chỉ khoảng lặng 1.5s ở giữa; 0.2s quá ngắn, đoạn cuối chưa kết thúc
+    assert len(silences) == 1
+    start, end = silences[0]
+    assert abs(start - 2.0) < 0.1 and abs(end - 3.5) < 0.1
+
+def test_streaming_detector_matches_offline_across_blocks():
+    audio = _signal()
+    detector = StreamingSilenceDetector(SR, silence_thresh=-40.0, min_silence_len=1000)
+    found = []
+    for i in range(0, len(audio), 3000):
+        found += detector.feed(audio[i:i + 3000])
+    assert len(found) == 1
+    assert abs(found[0][0] - 2.0) < 0.1 and abs(found[0][1] - 3.5) < 0.1
+    assert detector.trailing_silence > 0.8